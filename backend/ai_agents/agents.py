@@ -1,22 +1,62 @@
 # Extensible AI agents with LangChain and MCP support
 
-from typing import Dict, Any, Optional, List
+from typing import TYPE_CHECKING, Dict, Any, Optional, List, Tuple
+import asyncio
+import functools
+import json
 import os
 import logging
+import time
 from dataclasses import dataclass
 from pathlib import Path
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from pydantic import BaseModel
 
-# Load environment variables
+from .deadlines import bounded, retry
+from .profiles import GenerationProfile, load_profiles
+from .response_cache import ResponseCache, response_key
+from .usage import CallUsage, UsageRecorder, current_scope, estimate_cost, load_prices
+
+# LangChain and MCP are imported on first use, they dominate process start-up time
+if TYPE_CHECKING:
+    from langchain_mcp_adapters.client import MultiServerMCPClient
+
 ROOT_DIR = Path(__file__).parent.parent
-load_dotenv(ROOT_DIR / '.env')
 
 logger = logging.getLogger(__name__)
 
+# Modules preloaded by warmup() so the first request doesn't pay for them
+HEAVY_MODULES = (
+    "langchain_openai",
+    "langchain_core.messages",
+    "langchain_mcp_adapters.client",
+)
+
+
+@functools.lru_cache(maxsize=None)
+def load_env():
+    # Load environment variables once, whoever gets here first
+    load_dotenv(ROOT_DIR / '.env')
+
+
+@functools.lru_cache(maxsize=None)
+def get_response_cache() -> ResponseCache:
+    # One response cache per process, its disk tier shared through the file (empty path = memory only)
+    load_env()
+    path = os.getenv("AGENT_RESPONSE_CACHE_PATH", str(ROOT_DIR / "llm_cache" / "responses.sqlite3"))
+    return ResponseCache(
+        Path(path) if path else None,
+        max_entries=int(os.getenv("AGENT_RESPONSE_CACHE_ENTRIES", "1000")),
+        max_disk_entries=int(os.getenv("AGENT_RESPONSE_CACHE_DISK_ENTRIES", "50000"))
+    )
+
+
+def warmup():
+    # Import heavy dependencies ahead of the first agent call
+    import importlib
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
+
 
 @dataclass
 class AgentConfig:
@@ -24,8 +64,18 @@ class AgentConfig:
     api_base_url: str = None
     model_name: str = None
     api_key: str = None
+    max_tool_steps: int = None
+    tool_timeout_seconds: float = None
+    llm_timeout_seconds: float = None
+    max_retries: int = None
+    response_cache_ttls: Dict[str, float] = None
+    profiles: Dict[str, GenerationProfile] = None
+    model_prices: Dict[str, Tuple[float, float]] = None
+    # Where each execute() call's usage is written, None keeps it in the response metadata only
+    usage_recorder: Optional[UsageRecorder] = None
     
     def __post_init__(self):
+        load_env()
         # Load from env if not provided
         if self.api_base_url is None:
             self.api_base_url = os.getenv("LITELLM_BASE_URL", "https://litellm-docker-545630944929.us-central1.run.app")
@@ -34,6 +84,29 @@ class AgentConfig:
         if self.api_key is None:
             # LITELLM_AUTH_TOKEN for AI API
             self.api_key = os.getenv("LITELLM_AUTH_TOKEN", "dummy-key")
+        if self.max_tool_steps is None:
+            # Model turns that may request tools before it has to answer
+            self.max_tool_steps = int(os.getenv("AGENT_MAX_TOOL_STEPS", "5"))
+        if self.tool_timeout_seconds is None:
+            self.tool_timeout_seconds = float(os.getenv("AGENT_TOOL_TIMEOUT_SECONDS", "30"))
+        if self.llm_timeout_seconds is None:
+            self.llm_timeout_seconds = float(os.getenv("AGENT_LLM_TIMEOUT_SECONDS", "60"))
+        if self.max_retries is None:
+            # Retries of failed model calls, within the request's deadline
+            self.max_retries = int(os.getenv("AGENT_MAX_RETRIES", "2"))
+        if self.response_cache_ttls is None:
+            # Opt-in per agent, e.g. "chat=3600,search=300" ("*" for any other agent), unset = no caching
+            ttls = os.getenv("AGENT_RESPONSE_CACHE_TTLS", "")
+            self.response_cache_ttls = {
+                name.strip(): float(seconds) for name, seconds in
+                (item.split("=", 1) for item in ttls.split(",") if "=" in item)
+            }
+        if self.profiles is None:
+            # Model and limits per agent and endpoint, GENERATION_PROFILES overrides the defaults
+            self.profiles = load_profiles()
+        if self.model_prices is None:
+            # USD per million prompt/completion tokens, MODEL_PRICES overrides the defaults
+            self.model_prices = load_prices()
 
 
 class AgentResponse(BaseModel):
@@ -51,15 +124,12 @@ class BaseAgent:
         self.config = config
         self.system_prompt = system_prompt
         
-        # LangChain ChatOpenAI setup
-        self.llm = ChatOpenAI(
-            base_url=config.api_base_url,
-            api_key=config.api_key,
-            model=config.model_name
-        )
+        # LangChain ChatOpenAI setup, with the agent's own generation profile
+        self._profile_llms: Dict[str, Any] = {}
+        self.llm = self._build_llm(self.profile(self.agent_name))
         
         # MCP client lazy init
-        self.mcp_client: Optional[MultiServerMCPClient] = None
+        self.mcp_client: Optional["MultiServerMCPClient"] = None
         self.mcp_tools = []
         
         logger.info(f"Initialized {self.__class__.__name__} with model {config.model_name}")
@@ -67,47 +137,244 @@ class BaseAgent:
     def setup_mcp(self, server_configs: List[Dict[str, str]]):
         # Setup MCP servers
         try:
-            self.mcp_client = MultiServerMCPClient(server_configs)
-            # Tools bound when needed
+            from langchain_mcp_adapters.client import MultiServerMCPClient
+            # The adapter wants named connections with an explicit transport
+            connections = {
+                f"server_{index}": {
+                    "transport": "streamable_http" if config.get("type") == "http" else config.get("type"),
+                    **{key: value for key, value in config.items() if key != "type"}
+                }
+                for index, config in enumerate(server_configs)
+            }
+            self.mcp_client = MultiServerMCPClient(connections)
+            # Tools loaded on first use by load_tools()
             self.mcp_tools = []
             logger.info(f"MCP setup complete")
         except Exception as e:
             logger.error(f"Failed to setup MCP: {e}")
             self.mcp_client = None
+
+    async def load_tools(self) -> list:
+        # Fetch tool definitions from the MCP servers once
+        if self.mcp_client and not self.mcp_tools:
+            try:
+                self.mcp_tools = await bounded(self.mcp_client.get_tools(), self.config.tool_timeout_seconds)
+                logger.info(f"Loaded {len(self.mcp_tools)} MCP tools: {[tool.name for tool in self.mcp_tools]}")
+            except Exception as e:
+                logger.error(f"Failed to load MCP tools: {e}")
+        return self.mcp_tools
     
-    async def execute(self, prompt: str, use_tools: bool = True) -> AgentResponse:
-        # Execute agent with prompt
+    @property
+    def agent_name(self) -> str:
+        # "chat" for ChatAgent, the name used for per-agent settings
+        return self.__class__.__name__.lower().removesuffix("agent") or "base"
+
+    def profile(self, name: str) -> GenerationProfile:
+        profiles = self.config.profiles
+        return profiles.get(name) or profiles.get("default") or GenerationProfile()
+
+    def _llm_for(self, profile: str):
+        # The agent's own profile is self.llm; others are built once per agent
+        if profile == self.agent_name:
+            return self.llm
+        if profile not in self._profile_llms:
+            self._profile_llms[profile] = self._build_llm(self.profile(profile))
+        return self._profile_llms[profile]
+
+    def _build_llm(self, profile: GenerationProfile):
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
+            base_url=self.config.api_base_url,
+            api_key=self.config.api_key,
+            model=profile.model or self.config.model_name,
+            max_tokens=profile.max_tokens,
+            temperature=profile.temperature,
+            stop=list(profile.stop) if profile.stop else None,
+            model_kwargs={"response_format": {"type": "json_object"}} if profile.json_mode else {},
+            # Retries happen in _invoke, where they can respect the request's deadline
+            max_retries=0
+        )
+
+    @property
+    def cache_ttl_seconds(self) -> float:
+        ttls = self.config.response_cache_ttls
+        return ttls.get(self.agent_name, ttls.get("*", 0))
+
+    async def execute(
+        self, prompt: str, use_tools: bool = True, history: Optional[List[Dict[str, str]]] = None,
+        cache: bool = True, profile: Optional[str] = None
+    ) -> AgentResponse:
+        # Execute agent with prompt, after any earlier {"role", "content"} messages
+        # cache=False bypasses the response cache, for calls that should come out different every time
+        # profile picks the model and limits (see profiles.py), the agent's own by default
+        from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+        message_types = {"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
+        usage = CallUsage()
+        profile = profile or self.agent_name
+        model_name = self.profile(profile).model or self.config.model_name
         try:
-            messages = [
-                SystemMessage(content=self.system_prompt),
-                HumanMessage(content=prompt)
-            ]
+            # System prompt first and history in order, so repeat calls share a cacheable prefix
+            conversation = [{"role": "system", "content": self.system_prompt}]
+            conversation += [{"role": message["role"], "content": message["content"]} for message in history or []]
+            conversation.append({"role": "user", "content": prompt})
+            messages = [message_types[message["role"]](content=message["content"]) for message in conversation]
             
+            settings = self.profile(profile)
+            llm = self._llm_for(profile)
+
             # Use MCP tools if available
-            if use_tools and self.mcp_client and self.mcp_tools:
+            tools = await self.load_tools() if use_tools and self.mcp_client else []
+
+            response_cache = get_response_cache() if self.cache_ttl_seconds > 0 else None
+            if response_cache is not None and not cache:
+                response_cache.bypass()
+                response_cache = None
+            if response_cache is not None:
+                cache_key = response_key(model_name, conversation, self._generation_params(settings, tools))
+                cached = await response_cache.get(cache_key)
+                if cached is not None:
+                    payload, tier = cached
+                    self._record_usage(profile, model_name, usage, success=True, cached=True)
+                    return AgentResponse(success=True, content=payload["content"], metadata={
+                        **payload["metadata"], "cached": tier, "usage": usage.to_dict(0.0)
+                    })
+
+            if tools:
                 # Agent with tools
-                agent_executor = self.llm.bind_tools(self.mcp_tools)
-                response = await agent_executor.ainvoke(messages)
+                response, tool_calls, steps = await self._run_tool_loop(llm, messages, tools, usage)
             else:
                 # LLM without tools
-                response = await self.llm.ainvoke(messages)
+                response, tool_calls, steps = await self._invoke(llm, messages, usage), [], 1
             
-            return AgentResponse(
+            result = AgentResponse(
                 success=True,
                 content=response.content,
                 metadata={
-                    "model": self.config.model_name,
-                    "tools_used": len(self.mcp_tools) if use_tools else 0
+                    "model": model_name,
+                    "profile": profile,
+                    "tools_used": len(tool_calls),
+                    "tool_calls": tool_calls,
+                    "steps": steps,
+                    "usage": self._record_usage(profile, model_name, usage, success=True)
                 }
             )
+            if response_cache is not None:
+                # Answers built on side effects or failed tool calls aren't worth replaying
+                tools_by_name = {tool.name: tool for tool in tools}
+                if all(call["error"] is None and call["name"] in tools_by_name and self._is_idempotent(tools_by_name[call["name"]])
+                       for call in tool_calls):
+                    await response_cache.put(cache_key, self.agent_name, {
+                        "content": result.content,
+                        "metadata": {key: value for key, value in result.metadata.items() if key != "usage"}
+                    }, self.cache_ttl_seconds)
+                else:
+                    response_cache.bypass()
+            return result
             
         except Exception as e:
             logger.error(f"Error executing agent: {e}")
             return AgentResponse(
                 success=False,
                 content="",
+                metadata={"model": model_name, "profile": profile, "usage": self._record_usage(profile, model_name, usage, success=False)},
                 error=str(e)
             )
+
+    def _record_usage(self, profile: str, model: str, usage: CallUsage, success: bool, cached: bool = False) -> Dict[str, Any]:
+        # Usage for the response metadata, also queued for the recorder with who it's charged to
+        cost = 0.0 if cached else estimate_cost(self.config.model_prices, model, usage.prompt_tokens, usage.completion_tokens)
+        summary = usage.to_dict(cost)
+        if self.config.usage_recorder is not None:
+            endpoint, client = current_scope()
+            self.config.usage_recorder.record({
+                "endpoint": endpoint, "client": client, "agent": self.agent_name, "profile": profile,
+                "model": model, "success": success, "cached": cached, **summary
+            })
+        return summary
+    
+    async def _run_tool_loop(self, llm, messages: list, tools: list, usage: Optional[CallUsage] = None):
+        # Let the model call tools until it answers, running each step's calls concurrently
+        from langchain_core.messages import ToolMessage
+        tools_by_name = {tool.name: tool for tool in tools}
+        llm_with_tools = llm.bind_tools(tools)
+        # Read-only/idempotent tool calls, shared within this request (even while in flight)
+        results: Dict[str, asyncio.Task] = {}
+        tool_calls: List[Dict[str, Any]] = []
+
+        async def run_call(call: dict) -> ToolMessage:
+            started = time.perf_counter()
+            tool = tools_by_name.get(call["name"])
+            key = f"{call['name']}:{json.dumps(call['args'], sort_keys=True, default=str)}"
+            record = {"name": call["name"], "cached": False, "error": None}
+            try:
+                if tool is None:
+                    raise ValueError(f"Unknown tool {call['name']}")
+                task = results.get(key)
+                record["cached"] = task is not None
+                if task is None:
+                    task = asyncio.ensure_future(bounded(tool.ainvoke(call), self.config.tool_timeout_seconds))
+                    if self._is_idempotent(tool):
+                        results[key] = task
+                try:
+                    content = (await asyncio.shield(task)).content
+                except Exception:
+                    # Let a later step retry a failed call
+                    results.pop(key, None)
+                    raise
+            except asyncio.TimeoutError:
+                record["error"] = f"timed out after {(time.perf_counter() - started):.1f}s"
+                content = f"Error: {call['name']} {record['error']}"
+            except Exception as e:
+                record["error"] = str(e)
+                content = f"Error: {e}"
+            record["ms"] = (time.perf_counter() - started) * 1000
+            tool_calls.append(record)
+            return ToolMessage(content=content, tool_call_id=call["id"], name=call["name"])
+
+        for step in range(1, self.config.max_tool_steps + 1):
+            response = await self._invoke(llm_with_tools, messages, usage)
+            if not response.tool_calls:
+                return response, tool_calls, step
+            messages = messages + [response] + list(await asyncio.gather(*(run_call(call) for call in response.tool_calls)))
+
+        # Out of steps: answer with what has been gathered. The tools stay declared, since
+        # OpenAI-compatible backends reject tool messages without them, but can't be called
+        response = await self._invoke(llm.bind_tools(tools, tool_choice="none"), messages, usage)
+        return response, tool_calls, self.config.max_tool_steps + 1
+
+    async def _invoke(self, llm, messages: list, usage: Optional[CallUsage] = None):
+        # One model call, retried with backoff on transient errors within the request's deadline
+        async def attempt():
+            started = time.perf_counter()
+            try:
+                return await llm.ainvoke(messages)
+            finally:
+                if usage is not None:
+                    usage.add_call(time.perf_counter() - started)
+
+        response = await retry(
+            attempt,
+            name=f"{self.__class__.__name__} model call",
+            attempts=self.config.max_retries + 1,
+            timeout=self.config.llm_timeout_seconds
+        )
+        if usage is not None:
+            usage.add_reply(response)
+        return response
+
+    def _generation_params(self, settings: GenerationProfile, tools: list) -> Dict[str, Any]:
+        # Everything besides the model and messages that changes what the model may answer
+        return {
+            **{key: value for key, value in settings.to_dict().items() if key != "model"},
+            "tools": sorted(tool.name for tool in tools),
+            "max_tool_steps": self.config.max_tool_steps if tools else None,
+        }
+
+    @staticmethod
+    def _is_idempotent(tool) -> bool:
+        # MCP annotations when the server provides them; searches are read-only either way
+        hints = tool.metadata or {}
+        return bool(hints.get("readOnlyHint") or hints.get("idempotentHint")) or "search" in tool.name.lower()
     
     def get_capabilities(self) -> List[str]:
         # Get agent capabilities
@@ -142,6 +409,30 @@ class SearchAgent(BaseAgent):
         else:
             logger.warning("CODEXHUB_MCP_AUTH_TOKEN not found, web search disabled")
 
+    async def search_tool(self):
+        # The MCP tool that runs a web search, if the server offers one
+        tools = await self.load_tools()
+        return next((tool for tool in tools if "search" in tool.name.lower()), None)
+
+    async def web_search(self, query: str, max_results: int = 5) -> str:
+        # Run one web search through MCP directly, without an LLM turn; returns the raw tool output
+        tool = await self.search_tool()
+        if tool is None:
+            raise RuntimeError("Web search not available")
+
+        properties = list(tool.args)
+        query_arg = next((name for name in ("query", "q", "search_query") if name in properties), properties[0])
+        args = {query_arg: query}
+        count_arg = next((name for name in ("max_results", "num_results", "count", "limit") if name in properties), None)
+        if count_arg:
+            args[count_arg] = max_results
+
+        output = await tool.ainvoke(args)
+        if isinstance(output, list):
+            # Content blocks
+            output = "\n".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in output)
+        return str(output)
+
 
 class ChatAgent(BaseAgent):
     # General chat and assistance agent
@@ -189,7 +480,8 @@ class ImageAgent(BaseAgent):
         try:
             # Use the MCP image generation tool
             generation_prompt = f"Generate an image with this description: {prompt}"
-            result = await self.execute(generation_prompt, use_tools=True)
+            # Every call should make a new image
+            result = await self.execute(generation_prompt, use_tools=True, cache=False)
             return result
         except Exception as e:
             logger.error(f"Error generating image: {e}")
@@ -0,0 +1,120 @@
+# Batched Mongo writes: documents queue in memory and are inserted by a background task
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from .deadlines import bounded
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    # Inserts queued documents with insert_many, off the request path. Documents are stamped with
+    # ts and created_at and expire retention_days later; subclasses add indexes in _create_indexes
+
+    def __init__(
+        self,
+        collection: Callable[[], Any],
+        name: str,
+        flush_seconds: float = 5,
+        max_batch: int = 500,
+        max_queue: int = 10000,
+        retention_days: float = 30,
+        timeout: float = 5.0,
+    ):
+        self.collection = collection
+        # What the documents are, for log messages
+        self.name = name
+        self.flush_seconds = flush_seconds
+        self.max_batch = max_batch
+        # Oldest documents are dropped past this while Mongo is unreachable
+        self.max_queue = max_queue
+        self.retention_days = retention_days
+        self.timeout = timeout
+        self._queue: deque = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._indexes_ready = False
+        self._stats = {"recorded": 0, "written": 0, "dropped": 0, "failed_flushes": 0}
+
+    def add(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        # Never blocks or fails the caller; returns the queued document
+        now = time.time()
+        document = {**document, "ts": now, "created_at": datetime.fromtimestamp(now, timezone.utc)}
+        self._queue.append(document)
+        self._stats["recorded"] += 1
+        while len(self._queue) > self.max_queue:
+            self._queue.popleft()
+            self._stats["dropped"] += 1
+        if len(self._queue) >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+        return document
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Stop the writer and flush what's left
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.drain()
+
+    async def drain(self):
+        # Flush until the queue is empty or Mongo fails
+        while self._queue and await self.flush():
+            pass
+
+    async def flush(self) -> int:
+        # Insert up to max_batch queued documents; they go back on the queue if Mongo fails
+        if not self._queue:
+            return 0
+        batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+        try:
+            collection = self.collection()
+            await self._ensure_indexes(collection)
+            await bounded(collection.insert_many(batch, ordered=False), self.timeout)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} {self.name}: {e}")
+            self._stats["failed_flushes"] += 1
+            self._queue.extendleft(reversed(batch))
+            while len(self._queue) > self.max_queue:
+                self._queue.pop()
+                self._stats["dropped"] += 1
+            return 0
+        self._stats["written"] += len(batch)
+        return len(batch)
+
+    def stats(self) -> dict:
+        return {**self._stats, "queued": len(self._queue)}
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while await self.flush() == self.max_batch:
+                pass
+
+    async def _ensure_indexes(self, collection):
+        if not self._indexes_ready:
+            await bounded(collection.create_index(
+                "created_at", expireAfterSeconds=int(timedelta(days=self.retention_days).total_seconds())
+            ), self.timeout)
+            await self._create_indexes(collection)
+            self._indexes_ready = True
+
+    async def _create_indexes(self, collection):
+        pass
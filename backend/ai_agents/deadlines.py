@@ -0,0 +1,140 @@
+# Request-scoped deadlines and retries with jittered backoff for outbound calls
+
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Monotonic time by which the current request must be answered, None if unbounded
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+# Status codes worth another attempt: timeouts, rate limits and server errors. Not 409: a
+# conflict is an answer, and retrying it would hide idempotency and version conflicts
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError", "ServiceUnavailableError"}
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    # The request's deadline passed before the call could finish
+    pass
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    # Bound everything awaited inside to `seconds` from now (never extends an outer deadline)
+    deadline = time.monotonic() + seconds if seconds is not None else None
+    outer = _deadline.get()
+    if outer is not None and (deadline is None or outer < deadline):
+        deadline = outer
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def clear_deadline():
+    # For background work that intentionally outlives the request that started it
+    _deadline.set(None)
+
+
+def remaining() -> Optional[float]:
+    # Seconds left before the deadline, None without one
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def timeout_for(default: Optional[float]) -> Optional[float]:
+    # A call's own timeout, shortened to what's left of the deadline
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left if default is None else min(default, left)
+
+
+async def bounded(awaitable: Awaitable, default: Optional[float] = None) -> Any:
+    # Await with the call's timeout, or less if the deadline is closer
+    try:
+        timeout = timeout_for(default)
+    except DeadlineExceeded:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+    try:
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    except asyncio.TimeoutError:
+        left = remaining()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded("Request deadline exceeded") from None
+        raise
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+class RetryBudget:
+    # Token bucket limiting retries to a fraction of calls, so an outage doesn't multiply load
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 20):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def record_call(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+retry_budget = RetryBudget()
+
+
+async def retry(
+    call: Callable[[], Awaitable[Any]],
+    *,
+    name: str = "call",
+    attempts: int = 3,
+    timeout: Optional[float] = None,
+    base_delay: float = 0.5,
+    max_delay: float = 8.0,
+    retryable: Callable[[BaseException], bool] = is_retryable,
+    budget: Optional[RetryBudget] = None,
+) -> Any:
+    # Call with up to `attempts` tries, backing off exponentially with full jitter.
+    # Gives up early when the next attempt couldn't finish before the deadline.
+    budget = budget or retry_budget
+    budget.record_call()
+    for attempt in range(1, attempts + 1):
+        try:
+            return await bounded(call(), timeout)
+        except Exception as e:
+            if attempt == attempts or isinstance(e, DeadlineExceeded) or not retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+            left = remaining()
+            if left is not None and left <= delay:
+                raise
+            if not budget.try_spend():
+                logger.warning(f"{name} failed, retry budget exhausted: {e}")
+                raise
+            logger.warning(f"{name} failed (attempt {attempt}/{attempts}), retrying in {delay:.2f}s: {e}")
+            await asyncio.sleep(delay)
@@ -0,0 +1,66 @@
+# Generation profiles: which model, and with what limits, each kind of call uses
+
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, fields, replace
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    # None means the provider default (the configured model for `model`)
+    model: Optional[str] = None
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    stop: Optional[Tuple[str, ...]] = None
+    # Ask the provider for a JSON object instead of free text
+    json_mode: bool = False
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def default_profiles() -> Dict[str, GenerationProfile]:
+    # Agents use the profile named after them ("chat", "search", "image"), endpoints pick their own
+    fast_model = os.getenv("AI_FAST_MODEL_NAME", "gemini-2.5-flash")
+    return {
+        "default": GenerationProfile(),
+        "chat": GenerationProfile(max_tokens=2048, temperature=0.7),
+        "chat_summary": GenerationProfile(model=fast_model, max_tokens=512, temperature=0.2),
+        "search": GenerationProfile(max_tokens=2048, temperature=0.3),
+        "search_expand": GenerationProfile(model=fast_model, max_tokens=256, temperature=0.5),
+        "search_notes": GenerationProfile(model=fast_model, max_tokens=768, temperature=0.2),
+        "image": GenerationProfile(max_tokens=1024, temperature=0.0),
+        # Five names and a sentence or two: the highest-volume call, kept small and fast
+        "names": GenerationProfile(model=fast_model, max_tokens=512, temperature=0.9, json_mode=True),
+        "names_batch": GenerationProfile(model=fast_model, max_tokens=3072, temperature=0.9, json_mode=True),
+        "names_rerank": GenerationProfile(model=fast_model, max_tokens=512, temperature=0.3, json_mode=True),
+    }
+
+
+def load_profiles(overrides: Optional[str] = None) -> Dict[str, GenerationProfile]:
+    # Defaults, with fields overridden by GENERATION_PROFILES: inline JSON or a path to a JSON file,
+    # e.g. {"names": {"model": "gpt-4o-mini", "max_tokens": 300}, "chat": {"temperature": 0.5}}
+    profiles = default_profiles()
+    overrides = os.getenv("GENERATION_PROFILES", "") if overrides is None else overrides
+    if not overrides.strip():
+        return profiles
+    try:
+        text = overrides if overrides.lstrip().startswith("{") else Path(overrides).read_text()
+        known = {field.name for field in fields(GenerationProfile)}
+        for name, values in json.loads(text).items():
+            unknown = set(values) - known
+            if unknown:
+                logger.warning(f"Ignoring unknown generation profile settings for {name}: {sorted(unknown)}")
+            values = {key: value for key, value in values.items() if key in known}
+            if values.get("stop") is not None:
+                values["stop"] = tuple(values["stop"])
+            profiles[name] = replace(profiles.get(name, profiles["default"]), **values)
+    except Exception as e:
+        logger.error(f"Invalid GENERATION_PROFILES, using the defaults: {e}")
+        return default_profiles()
+    return profiles
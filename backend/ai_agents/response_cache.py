@@ -0,0 +1,142 @@
+# Exact-match cache of model responses: an in-memory LRU in front of a SQLite file
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Trim the disk tier every this many writes
+_PRUNE_EVERY = 100
+
+
+def response_key(model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+    # Same model, same conversation (system prompt included) and same generation parameters
+    payload = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    # Shared by every agent in the process; the disk tier is shared by every process using the file
+
+    def __init__(self, path: Optional[Path], max_entries: int = 1000, max_disk_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        # key -> (expires_at, payload), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._inherited: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "bypassed": 0}
+
+    async def get(self, key: str) -> Optional[Tuple[dict, str]]:
+        # (payload, tier) for a live entry
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return entry[1], "memory"
+            del self._entries[key]
+
+        row = await self._disk(self._read, key) if self.path else None
+        if row is not None and row[0] > time.time():
+            self._remember(key, row[0], row[1])
+            self._stats["disk_hits"] += 1
+            return row[1], "disk"
+        self._stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, agent: str, payload: dict, ttl_seconds: float):
+        expires_at = time.time() + ttl_seconds
+        self._remember(key, expires_at, payload)
+        self._stats["stores"] += 1
+        if self.path:
+            await self._disk(self._write, key, agent, expires_at, payload)
+
+    def bypass(self):
+        # A call that was not eligible for caching
+        self._stats["bypassed"] += 1
+
+    def stats(self) -> dict:
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "path": str(self.path) if self.path else None,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def reset_after_fork(self):
+        # SQLite connections must not cross a fork; the child opens its own (the parent's stays open)
+        self._inherited = self._db
+        self._db = None
+        self._db_lock = threading.Lock()
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, expires_at: float, payload: dict):
+        self._entries[key] = (expires_at, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _disk(self, operation, *args):
+        # SQLite is local and fast, but keep it off the event loop; a broken file only costs hits
+        try:
+            return await asyncio.to_thread(operation, *args)
+        except Exception as e:
+            logger.error(f"Response cache disk tier failed: {e}")
+            return None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            # Several workers read and write the same file
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, agent TEXT, expires_at REAL, created_at REAL, payload TEXT)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _read(self, key: str) -> Optional[Tuple[float, dict]]:
+        with self._db_lock:
+            row = self._connect().execute("SELECT expires_at, payload FROM responses WHERE key = ?", (key,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def _write(self, key: str, agent: str, expires_at: float, payload: dict):
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, agent, expires_at, created_at, payload) VALUES (?, ?, ?, ?, ?)",
+                (key, agent, expires_at, time.time(), json.dumps(payload))
+            )
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                # Expired rows first, then the oldest past the size limit
+                db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+                db.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+            db.commit()
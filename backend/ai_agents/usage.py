@@ -0,0 +1,205 @@
+# Token, latency and cost accounting for model calls, written to Mongo in batches (see batch_writer)
+
+import contextvars
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .batch_writer import BatchWriter
+from .deadlines import bounded
+
+logger = logging.getLogger(__name__)
+
+# (endpoint, client) the current request's model calls are charged to
+_scope: contextvars.ContextVar[Tuple[str, str]] = contextvars.ContextVar("usage_scope", default=("", ""))
+
+# USD per million (prompt, completion) tokens; MODEL_PRICES overrides or adds models
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "gemini-2.5-pro": (1.25, 10.0),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gpt-4o": (2.50, 10.0),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+# Fields a summary can be grouped by
+GROUP_FIELDS = ("endpoint", "client", "model", "profile", "agent")
+
+
+@contextmanager
+def usage_scope(endpoint: str, client: str):
+    # Charge model calls made inside to this endpoint and client
+    token = _scope.set((endpoint, client))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def current_scope() -> Tuple[str, str]:
+    return _scope.get()
+
+
+def load_prices(overrides: Optional[str] = None) -> Dict[str, Tuple[float, float]]:
+    # Defaults plus MODEL_PRICES, e.g. {"gpt-4.1": [2.0, 8.0]}
+    prices = dict(DEFAULT_PRICES)
+    overrides = os.getenv("MODEL_PRICES", "") if overrides is None else overrides
+    if overrides.strip():
+        try:
+            prices.update({model: (float(price[0]), float(price[1])) for model, price in json.loads(overrides).items()})
+        except Exception as e:
+            logger.error(f"Invalid MODEL_PRICES, using the defaults: {e}")
+    return prices
+
+
+def estimate_cost(prices: Dict[str, Tuple[float, float]], model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    # None for a model without a price, rather than a misleading zero
+    price = prices.get(model)
+    if price is None:
+        # Provider-prefixed names ("gemini/gemini-2.5-pro") cost the same as the bare model
+        price = prices.get(model.rsplit("/", 1)[-1])
+    if price is None:
+        return None
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+
+def token_counts(message) -> Tuple[int, int]:
+    # (prompt, completion) tokens the provider reported for one reply, zeros if it didn't
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage:
+        return int(usage.get("input_tokens") or 0), int(usage.get("output_tokens") or 0)
+    usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    return int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0)
+
+
+class CallUsage:
+    # Accumulates every model call (tool steps and retries included) behind one execute()
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_ms = 0.0
+        self.model_calls = 0
+
+    def add_reply(self, message):
+        prompt_tokens, completion_tokens = token_counts(message)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+    def add_call(self, seconds: float):
+        # Time spent waiting on the provider, failed attempts included
+        self.model_calls += 1
+        self.latency_ms += seconds * 1000
+
+    def to_dict(self, cost_usd: Optional[float]) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "latency_ms": round(self.latency_ms, 1),
+            "model_calls": self.model_calls,
+            "cost_usd": cost_usd,
+        }
+
+
+class UsageRecorder(BatchWriter):
+    # Buffers one event per execute() and inserts them in batches off the request path
+
+    def __init__(
+        self,
+        collection: Callable[[], Any],
+        flush_seconds: float = 5,
+        max_batch: int = 500,
+        max_queue: int = 10000,
+        retention_days: float = 30,
+        timeout: float = 5.0,
+    ):
+        super().__init__(collection, "usage events", flush_seconds, max_batch, max_queue, retention_days, timeout)
+
+    def record(self, event: Dict[str, Any]):
+        # Never blocks or fails the model call it describes
+        self.add(event)
+
+    async def summary(
+        self, since: float, until: float, bucket_seconds: int = 3600, group_by: str = "endpoint",
+        filters: Optional[Dict[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        # Totals per time bucket and group_by value, oldest bucket first
+        collection = self.collection()
+        rows = await bounded(
+            collection.aggregate(summary_pipeline(since, until, bucket_seconds, group_by, filters)).to_list(None),
+            self.timeout
+        )
+        return [summary_row(row) for row in rows]
+
+    async def _create_indexes(self, collection):
+        # Summaries scan by time
+        await bounded(collection.create_index("ts"), self.timeout)
+
+
+def summary_pipeline(
+    since: float, until: float, bucket_seconds: int, group_by: str, filters: Optional[Dict[str, str]] = None
+) -> List[dict]:
+    if group_by not in GROUP_FIELDS:
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_FIELDS)}")
+    match = {"ts": {"$gte": since, "$lt": until}}
+    match.update({field: value for field, value in (filters or {}).items() if field in GROUP_FIELDS and value})
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "bucket": {"$subtract": ["$ts", {"$mod": ["$ts", bucket_seconds]}]},
+                "key": f"${group_by}",
+            },
+            "calls": {"$sum": 1},
+            "cached": {"$sum": {"$cond": ["$cached", 1, 0]}},
+            "errors": {"$sum": {"$cond": ["$success", 0, 1]}},
+            "model_calls": {"$sum": "$model_calls"},
+            "prompt_tokens": {"$sum": "$prompt_tokens"},
+            "completion_tokens": {"$sum": "$completion_tokens"},
+            "cost_usd": {"$sum": {"$ifNull": ["$cost_usd", 0]}},
+            "unpriced": {"$sum": {"$cond": [{"$eq": [{"$ifNull": ["$cost_usd", None]}, None]}, 1, 0]}},
+            "latency_ms": {"$sum": "$latency_ms"},
+            "max_latency_ms": {"$max": "$latency_ms"},
+        }},
+        {"$sort": {"_id.bucket": 1, "cost_usd": -1}},
+    ]
+
+
+def summary_row(row: dict) -> Dict[str, Any]:
+    # Flatten one aggregation result, with averages per call that reached the provider
+    uncached = row["calls"] - row["cached"]
+    return {
+        "bucket_start": datetime.fromtimestamp(row["_id"]["bucket"], timezone.utc).isoformat(),
+        "key": row["_id"].get("key") or "",
+        "calls": row["calls"],
+        "cached": row["cached"],
+        "errors": row["errors"],
+        "model_calls": row["model_calls"],
+        "prompt_tokens": row["prompt_tokens"],
+        "completion_tokens": row["completion_tokens"],
+        "total_tokens": row["prompt_tokens"] + row["completion_tokens"],
+        "cost_usd": round(row["cost_usd"], 6),
+        "unpriced_calls": row["unpriced"],
+        "avg_prompt_tokens": row["prompt_tokens"] / uncached if uncached else 0.0,
+        "avg_completion_tokens": row["completion_tokens"] / uncached if uncached else 0.0,
+        "avg_latency_ms": row["latency_ms"] / uncached if uncached else 0.0,
+        "max_latency_ms": row["max_latency_ms"],
+    }
+
+
+def totals_by_key(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # summary() rows folded across buckets, most expensive first
+    totals: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        total = totals.setdefault(row["key"], {
+            "key": row["key"], "calls": 0, "cached": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0
+        })
+        for field in ("calls", "cached", "errors", "prompt_tokens", "completion_tokens", "cost_usd"):
+            total[field] += row[field]
+    for total in totals.values():
+        total["total_tokens"] = total["prompt_tokens"] + total["completion_tokens"]
+        total["cost_usd"] = round(total["cost_usd"], 6)
+    return sorted(totals.values(), key=lambda total: (-total["cost_usd"], -total["total_tokens"]))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Serialization micro-benchmark
+Compares CPU per request of FastAPI's default response path (response_model validation +
+jsonable_encoder + json) against the orjson fast path, with and without compression
+"""
+
+import time
+import uuid
+from datetime import datetime
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware
+from fast_json import FastJSONResponse, fast_response
+from server import SearchResponse, StatusCheck
+
+ITERATIONS = 200
+
+STATUS_DOCS = [
+    {"id": str(uuid.uuid4()), "client_name": f"client-{i}", "timestamp": datetime.utcnow()}
+    for i in range(1000)
+]
+SEARCH_RESULTS = {
+    "model": "gemini-2.5-pro",
+    "results": [
+        {"title": f"Result {i}", "url": f"https://example.com/{i}", "snippet": "Lorem ipsum dolor sit amet. " * 20}
+        for i in range(50)
+    ],
+}
+
+
+def build_app(fast: bool) -> FastAPI:
+    app = FastAPI()
+
+    if fast:
+        @app.get("/status", response_model=List[StatusCheck])
+        async def status_fast():
+            return FastJSONResponse(STATUS_DOCS)
+
+        @app.get("/search", response_model=SearchResponse)
+        async def search_fast():
+            return fast_response(SearchResponse(
+                success=True, query="q", summary="s" * 2000,
+                search_results=SEARCH_RESULTS, sources_count=50
+            ))
+    else:
+        @app.get("/status", response_model=List[StatusCheck])
+        async def status_default():
+            return [StatusCheck(**doc) for doc in STATUS_DOCS]
+
+        @app.get("/search", response_model=SearchResponse)
+        async def search_default():
+            return SearchResponse(
+                success=True, query="q", summary="s" * 2000,
+                search_results=SEARCH_RESULTS, sources_count=50
+            )
+
+    return app
+
+
+def measure(client: TestClient, path: str, headers: dict) -> tuple:
+    # Warm up, then measure process CPU time (client overhead is identical across variants)
+    for _ in range(10):
+        client.get(path, headers=headers)
+    start = time.process_time()
+    for _ in range(ITERATIONS):
+        response = client.get(path, headers=headers)
+    cpu_ms = (time.process_time() - start) / ITERATIONS * 1000
+    return cpu_ms, response.num_bytes_downloaded, response.headers.get("content-encoding", "identity")
+
+
+def main():
+    variants = [
+        ("default", build_app(fast=False), {"accept-encoding": "identity"}),
+        ("orjson", build_app(fast=True), {"accept-encoding": "identity"}),
+        ("orjson+gzip", CompressionMiddleware(build_app(fast=True)), {"accept-encoding": "gzip"}),
+        ("orjson+br", CompressionMiddleware(build_app(fast=True)), {"accept-encoding": "br"}),
+    ]
+
+    print(f"{'route':<10}{'variant':<14}{'cpu ms/req':>12}{'wire bytes':>12}  encoding")
+    for path in ("/status", "/search"):
+        for name, app, headers in variants:
+            with TestClient(app) as client:
+                cpu_ms, size, encoding = measure(client, path, headers)
+            print(f"{path:<10}{name:<14}{cpu_ms:>12.3f}{size:>12}  {encoding}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Cache Snapshot - Carry the shared cache across deploys
+Live entries are streamed to a gzip'd snapshot file on an interval and at shutdown, and
+streamed back in a background thread on startup so requests are served while it loads.
+Workers share one cache, so only the first to start restores a given snapshot; the rest
+find its marker in the cache and skip it. Entries keep their original expiry; anything
+that expired in between is dropped.
+"""
+
+import asyncio
+import fcntl
+import gzip
+import logging
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from shared_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"FFSNAP1\n"
+# key digest, expires at, value length; the value follows
+_RECORD = struct.Struct("<16sdI")
+# Set in the cache once a snapshot is restored into it, to the snapshot's mtime and size
+RESTORED_KEY = "cache_snapshot:restored"
+RESTORED_TTL_SECONDS = 30 * 86400
+
+
+def write_snapshot(cache: SharedCache, path: Path) -> int:
+    """Write every live entry to path atomically, returns the number written"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    count = 0
+    try:
+        with gzip.open(tmp, "wb", compresslevel=6) as f:
+            f.write(_MAGIC)
+            for digest, expires_at, value in cache.entries():
+                f.write(_RECORD.pack(digest, expires_at, len(value)))
+                f.write(value)
+                count += 1
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return count
+
+
+def read_snapshot(path: Path) -> Iterator[Tuple[bytes, float, bytes]]:
+    """Stream (digest, expires_at, value) records; a truncated tail ends the stream"""
+    with gzip.open(path, "rb") as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"{path} is not a cache snapshot")
+        try:
+            while True:
+                header = f.read(_RECORD.size)
+                if len(header) < _RECORD.size:
+                    return
+                digest, expires_at, length = _RECORD.unpack(header)
+                value = f.read(length)
+                if len(value) < length:
+                    return
+                yield digest, expires_at, value
+        except (EOFError, zlib.error) as e:
+            logger.warning(f"Cache snapshot {path} is truncated, restored what was readable: {e}")
+
+
+def restore_snapshot(cache: SharedCache, path: Path) -> dict:
+    """Load a snapshot into cache, skipping expired entries and keys that are already set"""
+    counts = {"restored": 0, "expired": 0, "skipped": 0}
+    now = time.time()
+    for digest, expires_at, value in read_snapshot(path):
+        if expires_at <= now:
+            counts["expired"] += 1
+        elif cache.restore(digest, value, expires_at):
+            counts["restored"] += 1
+        else:
+            counts["skipped"] += 1
+    return counts
+
+
+class CacheSnapshotter:
+    """Restores a SharedCache on startup and snapshots it periodically and on shutdown"""
+
+    def __init__(self, cache: SharedCache, path: Path, interval_seconds: float = 300):
+        self.cache = cache
+        self.path = Path(path)
+        self.interval_seconds = interval_seconds
+        self.last_restore: Optional[dict] = None
+        self.last_snapshot: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Begin restoring in the background; call from the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the periodic loop and write a final snapshot"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.snapshot)
+
+    def restore(self) -> Optional[dict]:
+        """Load the snapshot unless another worker already loaded it into the shared cache"""
+        if not self.path.exists():
+            return None
+        # Held while restoring, so workers starting together wait for the first one's restore
+        # instead of repeating it
+        with self._lock() as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                stat = self.path.stat()
+                marker = f"{stat.st_mtime_ns}:{stat.st_size}".encode()
+                if self.cache.get(RESTORED_KEY) == marker:
+                    logger.info(f"Cache snapshot {self.path} was already restored by another worker")
+                    return None
+                started = time.perf_counter()
+                counts = restore_snapshot(self.cache, self.path)
+                self.cache.set(RESTORED_KEY, marker, RESTORED_TTL_SECONDS)
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to restore cache snapshot {self.path}: {e}")
+                return None
+        counts["duration_ms"] = (time.perf_counter() - started) * 1000
+        self.last_restore = counts
+        logger.info(
+            f"Restored {counts['restored']} cache entries from {self.path} "
+            f"({counts['expired']} expired, {counts['skipped']} already set) in {counts['duration_ms']:.0f}ms"
+        )
+        return counts
+
+    def snapshot(self) -> Optional[dict]:
+        """Write a snapshot unless another worker is already writing one"""
+        with self._lock() as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            started = time.perf_counter()
+            try:
+                entries = write_snapshot(self.cache, self.path)
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to write cache snapshot {self.path}: {e}")
+                return None
+        self.last_snapshot = {
+            "entries": entries,
+            "bytes": self.path.stat().st_size,
+            "duration_ms": (time.perf_counter() - started) * 1000,
+            "written_at": time.time(),
+        }
+        return self.last_snapshot
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self.path),
+            "interval_seconds": self.interval_seconds,
+            "last_restore": self.last_restore,
+            "last_snapshot": self.last_snapshot,
+        }
+
+    def _lock(self):
+        # Serializes snapshot writes and restores across workers; flock it once open
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return open(self.path.with_name(f".{self.path.name}.lock"), "w")
+
+    async def _run(self):
+        await asyncio.to_thread(self.restore)
+        if self.interval_seconds <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await asyncio.to_thread(self.snapshot)
+            except Exception as e:
+                logger.error(f"Periodic cache snapshot failed: {e}")
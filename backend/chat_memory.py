@@ -0,0 +1,235 @@
+"""
+Chat Memory - Server-side conversation history for /api/chat
+Sessions live in Mongo with an in-process LRU hot tier; a hot copy is only used after checking
+its version against Mongo, so a turn another worker handled is never missing from the prompt.
+Exchanges that couldn't be written while Mongo was down stay in the hot copy and are
+replayed onto the stored session once it's reachable again. Once a session's history goes over
+its token budget, the oldest turns are folded into a running summary in one step, so the
+prompt prefix (system prompt + summary) stays the same from turn to turn and provider
+prompt caching keeps applying until the next fold.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ai_agents.deadlines import bounded
+
+logger = logging.getLogger(__name__)
+
+# Returns the Mongo collection, or None to keep sessions in memory only
+CollectionGetter = Callable[[], Any]
+# (previous summary, turns to fold in) -> new summary
+Summarizer = Callable[[str, List[Dict[str, str]]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English; close enough for budgeting
+    return len(text) // 4 + 1
+
+
+@dataclass
+class ChatSession:
+    """History of one conversation: a running summary plus the recent turns verbatim"""
+    session_id: str
+    summary: str = ""
+    turns: List[Dict[str, str]] = field(default_factory=list)
+    summarized_turns: int = 0
+    version: int = 0
+    updated_at: float = field(default_factory=time.time)
+    # Turns not yet written to Mongo, replayed onto the stored copy if it moved on meanwhile
+    unsaved_turns: List[Dict[str, str]] = field(default_factory=list)
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(turn["content"]) for turn in self.turns)
+
+    def history(self) -> List[Dict[str, str]]:
+        """Messages to send between the system prompt and the new user message"""
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        return messages + self.turns
+
+    def to_document(self) -> dict:
+        return {
+            "_id": self.session_id,
+            "summary": self.summary,
+            "turns": self.turns,
+            "summarized_turns": self.summarized_turns,
+            "version": self.version,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_document(cls, document: dict) -> "ChatSession":
+        return cls(
+            session_id=document["_id"],
+            summary=document.get("summary", ""),
+            turns=document.get("turns", []),
+            summarized_turns=document.get("summarized_turns", 0),
+            version=document.get("version", 0),
+            updated_at=document.get("updated_at", time.time()),
+        )
+
+
+class ChatMemory:
+    """Loads, appends to and compacts chat sessions"""
+
+    def __init__(
+        self,
+        collection: CollectionGetter,
+        summarize: Summarizer,
+        token_budget: int = 2000,
+        keep_recent_turns: int = 4,
+        max_hot_sessions: int = 1000,
+        timeout: float = 5.0,
+    ):
+        self.collection = collection
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.max_hot_sessions = max_hot_sessions
+        # Per Mongo operation, shortened by the request's deadline
+        self.timeout = timeout
+        self._hot: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def load(self, session_id: str) -> ChatSession:
+        hot = self._hot.get(session_id)
+        if hot is not None and await self._is_current(hot):
+            self._hot.move_to_end(session_id)
+            return hot
+        session = await self._load_stored(session_id) or ChatSession(session_id=session_id)
+        if hot is not None and hot.unsaved_turns:
+            # Written elsewhere while this worker couldn't write: keep its turns on top
+            session.turns.extend(hot.unsaved_turns)
+            session.unsaved_turns = list(hot.unsaved_turns)
+            await self._compact(session)
+        self._remember(session)
+        return session
+
+    async def append(self, session_id: str, user_message: str, assistant_message: str) -> ChatSession:
+        """Record a completed exchange, folding old turns into the summary if over budget"""
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            session = await self.load(session_id)
+            turns = [
+                {"role": "user", "content": user_message},
+                {"role": "assistant", "content": assistant_message},
+            ]
+            session.turns.extend(turns)
+            session.unsaved_turns.extend(turns)
+            await self._compact(session)
+            if not await self._store(session):
+                # Another worker wrote this session since we loaded it: redo on top of theirs
+                session = await self.load(session_id)
+                await self._store(session)
+        return session
+
+    async def delete(self, session_id: str):
+        self._hot.pop(session_id, None)
+        collection = self._collection()
+        if collection is not None:
+            try:
+                await bounded(collection.delete_one({"_id": session_id}), self.timeout)
+            except Exception as e:
+                logger.error(f"Failed to delete chat session {session_id}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "hot_sessions": len(self._hot),
+            "token_budget": self.token_budget,
+        }
+
+    async def _compact(self, session: ChatSession):
+        if session.tokens() <= self.token_budget or len(session.turns) <= self.keep_recent_turns:
+            return
+        # Fold everything but the most recent turns at once, not a turn at a time,
+        # so the summary (and the cached prompt prefix) changes as rarely as possible
+        fold = len(session.turns) - self.keep_recent_turns
+        fold -= fold % 2  # keep user/assistant pairs together
+        if fold <= 0:
+            return
+        folded, remaining = session.turns[:fold], session.turns[fold:]
+        try:
+            session.summary = (await self.summarize(session.summary, folded)).strip()
+        except Exception as e:
+            # Drop the old turns rather than blow the budget
+            logger.error(f"Failed to summarize chat session {session.session_id}, dropping old turns: {e}")
+        session.turns = remaining
+        session.summarized_turns += fold
+
+    async def _is_current(self, session: ChatSession) -> bool:
+        # Only the version is read, the hot copy saves transferring the history itself
+        collection = self._collection()
+        if collection is None:
+            return True
+        try:
+            document = await bounded(collection.find_one({"_id": session.session_id}, {"version": 1}), self.timeout)
+        except Exception as e:
+            # Mongo is down: the hot copy is the best there is
+            logger.error(f"Failed to check chat session {session.session_id}: {e}")
+            return True
+        return (document or {}).get("version", 0) == session.version
+
+    async def _load_stored(self, session_id: str) -> Optional[ChatSession]:
+        collection = self._collection()
+        if collection is None:
+            return None
+        try:
+            document = await bounded(collection.find_one({"_id": session_id}), self.timeout)
+        except Exception as e:
+            logger.error(f"Failed to load chat session {session_id}: {e}")
+            return None
+        return ChatSession.from_document(document) if document else None
+
+    async def _store(self, session: ChatSession) -> bool:
+        """Persist with an optimistic version check; False if the stored copy moved on
+
+        The version only moves once the write lands, so after an outage it still matches
+        the stored copy and the unsaved turns go out with the next write.
+        """
+        session.updated_at = time.time()
+        collection = self._collection()
+        if collection is None:
+            session.unsaved_turns = []
+            return True
+        document = {**session.to_document(), "version": session.version + 1}
+        try:
+            if session.version == 0:
+                await bounded(collection.insert_one(document), self.timeout)
+            else:
+                result = await bounded(
+                    collection.replace_one({"_id": session.session_id, "version": session.version}, document),
+                    self.timeout
+                )
+                if not result.matched_count:
+                    return False
+        except Exception as e:
+            if type(e).__name__ == "DuplicateKeyError":
+                return False
+            # Mongo is down: keep the session and its unsaved turns in the hot tier and carry on
+            logger.error(f"Failed to store chat session {session.session_id}: {e}")
+            return True
+        session.version += 1
+        session.unsaved_turns = []
+        return True
+
+    def _remember(self, session: ChatSession):
+        self._hot[session.session_id] = session
+        self._hot.move_to_end(session.session_id)
+        while len(self._hot) > self.max_hot_sessions:
+            evicted, _ = self._hot.popitem(last=False)
+            lock = self._locks.get(evicted)
+            if lock is not None and not lock.locked():
+                del self._locks[evicted]
+
+    def _collection(self):
+        try:
+            return self.collection()
+        except Exception as e:
+            logger.error(f"Chat session store unavailable: {e}")
+            return None
@@ -0,0 +1,22 @@
+"""
+Fast JSON - orjson-backed responses that skip FastAPI's outbound validation
+Routes return these for models they built themselves, so re-validating them is wasted CPU
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (datetimes, UUIDs and numpy values supported natively)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def fast_response(model: BaseModel, status_code: int = 200) -> FastJSONResponse:
+    """Serialize a trusted model directly, bypassing response_model validation"""
+    return FastJSONResponse(model.model_dump(), status_code=status_code)
@@ -0,0 +1,119 @@
+"""
+Generation History - Past generation results per client, so returning users can reload them
+Results are queued in memory and inserted into Mongo in batches by a background task (the
+BatchWriter usage accounting also uses), off the request path. Reads page newest first with an
+opaque cursor over (time, id) instead of an offset, so every page costs one index range scan
+however deep it is, and return only the fields asked for.
+"""
+
+import base64
+import json
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ai_agents.batch_writer import BatchWriter
+from ai_agents.deadlines import bounded
+
+KINDS = ("name", "image", "age_progression")
+# Top-level fields a page may project, "request.description" style paths below them too
+FIELDS = ("kind", "session_id", "created_at", "request", "response")
+# Always returned: what an item is, and what the cursor is built from
+_BASE_PROJECTION = {"_id": 1, "ts": 1, "kind": 1, "created_at": 1}
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(ts: float, record_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([ts, record_id]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """(ts, id) of the last item on the previous page; ValueError if it isn't one of ours"""
+    try:
+        ts, record_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(ts), str(record_id)
+    except Exception:
+        raise ValueError("Invalid history cursor")
+
+
+def projection(fields: Optional[List[str]]) -> Dict[str, int]:
+    """Mongo projection for the requested fields (all of FIELDS when None)"""
+    fields = list(FIELDS) if fields is None else fields
+    for field in fields:
+        if field.split(".", 1)[0] not in FIELDS or not all(field.split(".")):
+            raise ValueError(f"Unknown history field {field!r}, expected one of {', '.join(FIELDS)} or a path below them")
+    # Mongo rejects a path alongside its parent ("request" and "request.description")
+    fields = [field for field in fields if not any(field.startswith(other + ".") for other in fields)]
+    return {**_BASE_PROJECTION, **{field: 1 for field in fields}}
+
+
+class GenerationHistory(BatchWriter):
+    """Batched writer and cursor-paginated reader for the generation history collection"""
+
+    def __init__(
+        self,
+        collection: Callable[[], Any],
+        flush_seconds: float = 1,
+        max_batch: int = 200,
+        max_queue: int = 5000,
+        retention_days: float = 90,
+        timeout: float = 5.0,
+    ):
+        super().__init__(collection, "generation history records", flush_seconds, max_batch, max_queue, retention_days, timeout)
+        self._stats["pages"] = 0
+
+    def record(self, client: str, kind: str, request: dict, response: dict, session_id: Optional[str] = None) -> str:
+        """Queue one result for writing and return its id"""
+        return self.add({
+            "_id": uuid.uuid4().hex,
+            "client": client,
+            "session_id": session_id,
+            "kind": kind,
+            "request": request,
+            "response": response,
+        })["_id"]
+
+    async def page(
+        self,
+        client: str,
+        session_id: Optional[str] = None,
+        kind: Optional[str] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """(items newest first, cursor for the next page or None on the last one)
+
+        Raises ValueError for a bad cursor or field.
+        """
+        query: Dict[str, Any] = {"client": client}
+        if session_id is not None:
+            query["session_id"] = session_id
+        if kind is not None:
+            query["kind"] = kind
+        if cursor:
+            ts, record_id = decode_cursor(cursor)
+            query["$or"] = [{"ts": {"$lt": ts}}, {"ts": ts, "_id": {"$lt": record_id}}]
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        fields_projection = projection(fields)
+
+        # Read your own writes: this client's queued records go out before the read
+        if any(record["client"] == client for record in self._queue):
+            await self.drain()
+
+        self._stats["pages"] += 1
+        documents = await bounded(
+            self.collection().find(query, fields_projection).sort([("ts", -1), ("_id", -1)]).limit(limit + 1).to_list(limit + 1),
+            self.timeout
+        )
+        next_cursor = encode_cursor(documents[limit - 1]["ts"], documents[limit - 1]["_id"]) if len(documents) > limit else None
+        items = []
+        for document in documents[:limit]:
+            document.pop("ts", None)
+            items.append({"id": document.pop("_id"), **document})
+        return items, next_cursor
+
+    async def _create_indexes(self, collection):
+        # Pages are range scans on these
+        await bounded(collection.create_index([("client", 1), ("ts", -1), ("_id", -1)]), self.timeout)
+        await bounded(collection.create_index([("client", 1), ("session_id", 1), ("ts", -1), ("_id", -1)]), self.timeout)
+        await bounded(collection.create_index([("client", 1), ("kind", 1), ("ts", -1), ("_id", -1)]), self.timeout)
@@ -0,0 +1,199 @@
+"""
+Idempotency - Idempotency-Key support for expensive POST endpoints
+The first request with a key claims it in Mongo and does the work; its successful response
+is stored under the key until the TTL runs out. Responses that aren't final (a placeholder
+while work continues elsewhere, or a fallback) release the key instead. A retry with the same key and body gets
+that response, or waits for the first request to finish instead of starting over. A key
+reused with a different body is refused. If the first request dies mid-way its claim
+lapses after lease_seconds and the next retry takes over.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ai_agents.deadlines import bounded, clear_deadline
+
+logger = logging.getLogger(__name__)
+
+# Returns the Mongo collection; raising means work goes ahead without idempotency
+CollectionGetter = Callable[[], Any]
+Handler = Callable[[], Awaitable[dict]]
+# Whether a response may be stored and replayed to retries
+Replayable = Callable[[dict], bool]
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request"""
+
+
+def fingerprint(body: Any) -> str:
+    return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Run each (route, key) once and replay its response to retries"""
+
+    def __init__(
+        self,
+        collection: CollectionGetter,
+        ttl_seconds: float = 86400,
+        lease_seconds: float = 300,
+        poll_seconds: float = 0.5,
+        timeout: float = 5.0,
+    ):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        # How long an in-flight claim holds before another request may take over
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        # Per Mongo operation, shortened by the request's deadline
+        self.timeout = timeout
+        # record id -> (request fingerprint, task) for work running in this process
+        self._inflight: Dict[str, Tuple[str, asyncio.Task]] = {}
+        self._index_ready = False
+        self._stats = {"new": 0, "replayed": 0, "joined": 0, "conflicts": 0, "unprotected": 0}
+
+    async def run(
+        self, route: str, key: str, body: Any, handler: Handler, replayable: Optional[Replayable] = None
+    ) -> Tuple[dict, str]:
+        """(response, outcome) where outcome is "new", "replayed" or "joined"
+
+        Only responses replayable() accepts are stored, by default the successful ones.
+        Raises IdempotencyConflict when the key was used with another body.
+        """
+        replayable = replayable or (lambda response: response.get("success", True))
+        record_id = f"{route}:{key}"
+        request_hash = fingerprint(body)
+
+        inflight = self._inflight.get(record_id)
+        if inflight is not None:
+            if inflight[0] != request_hash:
+                self._stats["conflicts"] += 1
+                raise IdempotencyConflict("Idempotency-Key was already used with a different request body")
+            self._stats["joined"] += 1
+            return await asyncio.shield(inflight[1]), "joined"
+
+        collection = self._collection()
+        owner = uuid.uuid4().hex
+        waited = False
+        while collection is not None:
+            try:
+                claimed, document = await self._claim(collection, record_id, request_hash, owner)
+            except Exception as e:
+                logger.error(f"Idempotency store unavailable, running {route} unprotected: {e}")
+                break
+            if claimed:
+                return await self._execute(collection, record_id, request_hash, owner, handler, replayable), "new"
+            if document["fingerprint"] != request_hash:
+                self._stats["conflicts"] += 1
+                raise IdempotencyConflict("Idempotency-Key was already used with a different request body")
+            if document["state"] == "done":
+                self._stats["joined" if waited else "replayed"] += 1
+                return document["response"], "joined" if waited else "replayed"
+            # Another worker is on it: check back until it finishes or its lease lapses
+            waited = True
+            await asyncio.sleep(self.poll_seconds)
+        return await self._execute(None, record_id, request_hash, owner, handler, replayable), "new"
+
+    def stats(self) -> dict:
+        return {**self._stats, "in_flight": len(self._inflight)}
+
+    async def _execute(
+        self, collection, record_id: str, request_hash: str, owner: str, handler: Handler, replayable: Replayable
+    ) -> dict:
+        self._stats["new" if collection is not None else "unprotected"] += 1
+        # The work outlives a client that disconnects, so its retry can pick up the result
+        task = asyncio.create_task(self._work(collection, record_id, owner, handler, replayable))
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[record_id] = (request_hash, task)
+        return await asyncio.shield(task)
+
+    async def _work(self, collection, record_id: str, owner: str, handler: Handler, replayable: Replayable) -> dict:
+        try:
+            response = await handler()
+        except BaseException:
+            # Out of time or failed: let the next retry start over
+            clear_deadline()
+            await self._release(collection, record_id, owner)
+            raise
+        finally:
+            self._inflight.pop(record_id, None)
+
+        if replayable(response):
+            await self._complete(collection, record_id, owner, response)
+        else:
+            # Failures and placeholders aren't replayed: a retry should get another go
+            await self._release(collection, record_id, owner)
+        return response
+
+    async def _claim(self, collection, record_id: str, request_hash: str, owner: str) -> Tuple[bool, Optional[dict]]:
+        """(True, None) if this request now owns the key, else (False, the stored record)"""
+        await self._ensure_index(collection)
+        now = time.time()
+        lease = {
+            "fingerprint": request_hash,
+            "state": "in_progress",
+            "owner": owner,
+            "lease_until": now + self.lease_seconds,
+            "expires_at": datetime.fromtimestamp(now + self.ttl_seconds, timezone.utc),
+        }
+        try:
+            await bounded(collection.insert_one({"_id": record_id, **lease}), self.timeout)
+            return True, None
+        except Exception as e:
+            if type(e).__name__ != "DuplicateKeyError":
+                raise
+
+        document = await bounded(collection.find_one({"_id": record_id}), self.timeout)
+        if document is None:
+            # Expired between the insert and the read
+            return await self._claim(collection, record_id, request_hash, owner)
+        lapsed = document["state"] == "in_progress" and document.get("lease_until", 0) < now
+        if lapsed and document["fingerprint"] == request_hash:
+            # The first request died without finishing: take over its lease
+            result = await bounded(collection.replace_one(
+                {"_id": record_id, "state": "in_progress", "owner": document.get("owner")},
+                {"_id": record_id, **lease}
+            ), self.timeout)
+            if result.matched_count:
+                return True, None
+        return False, document
+
+    async def _complete(self, collection, record_id: str, owner: str, response: dict):
+        if collection is None:
+            return
+        try:
+            await bounded(collection.update_one(
+                {"_id": record_id, "owner": owner},
+                {"$set": {"state": "done", "response": response}}
+            ), self.timeout)
+        except Exception as e:
+            logger.error(f"Failed to store idempotent response for {record_id}: {e}")
+
+    async def _release(self, collection, record_id: str, owner: str):
+        if collection is None:
+            return
+        try:
+            await bounded(collection.delete_one({"_id": record_id, "owner": owner}), self.timeout)
+        except Exception as e:
+            # The lease runs out on its own
+            logger.error(f"Failed to release idempotency key {record_id}: {e}")
+
+    async def _ensure_index(self, collection):
+        # Mongo drops records once their TTL is up
+        if not self._index_ready:
+            await bounded(collection.create_index("expires_at", expireAfterSeconds=0), self.timeout)
+            self._index_ready = True
+
+    def _collection(self):
+        try:
+            return self.collection()
+        except Exception as e:
+            logger.error(f"Idempotency store unavailable: {e}")
+            return None
@@ -0,0 +1,56 @@
+"""
+Image Grid - Generate several ages as one composite image and slice it into tiles
+"""
+
+import io
+import math
+from typing import List, Tuple
+
+# Trim this fraction off each tile edge so gutters between panels don't show
+TILE_INSET = 0.01
+
+
+def grid_shape(count: int) -> Tuple[int, int]:
+    """Rows and columns for a near-square grid holding count panels"""
+    cols = max(1, math.ceil(math.sqrt(count)))
+    rows = max(1, math.ceil(count / cols))
+    return rows, cols
+
+
+def build_grid_prompt(base_prompt: str, child_name: str, ages: List[int]) -> str:
+    """Prompt asking for all ages in one image, laid out left to right, top to bottom"""
+    rows, cols = grid_shape(len(ages))
+    panels = ", ".join(f"panel {i + 1}: age {age}" for i, age in enumerate(ages))
+    return (
+        f"{base_prompt} A {rows}x{cols} grid of {len(ages)} equally sized square portrait panels "
+        f"showing the same child named {child_name} at different ages, ordered left to right, "
+        f"top to bottom ({panels}). Leave any remaining panels blank. Consistent face, lighting "
+        f"and background across panels, no text or borders. Show appropriate physical development "
+        f"for each age. High quality, professional portrait."
+    )
+
+
+def slice_grid(data: bytes, count: int, fmt: str = "WEBP") -> List[bytes]:
+    """Cut a composite image into its first count panels, encoded as fmt"""
+    from PIL import Image
+
+    rows, cols = grid_shape(count)
+    with Image.open(io.BytesIO(data)) as composite:
+        composite = composite.convert("RGB")
+        width, height = composite.size
+        tile_w, tile_h = width / cols, height / rows
+        inset_w, inset_h = tile_w * TILE_INSET, tile_h * TILE_INSET
+
+        tiles = []
+        for index in range(count):
+            row, col = divmod(index, cols)
+            box = (
+                round(col * tile_w + inset_w),
+                round(row * tile_h + inset_h),
+                round((col + 1) * tile_w - inset_w),
+                round((row + 1) * tile_h - inset_h),
+            )
+            out = io.BytesIO()
+            composite.crop(box).save(out, format=fmt, quality=90)
+            tiles.append(out.getvalue())
+        return tiles
@@ -0,0 +1,134 @@
+"""
+Image Jobs - Background image generation with per-request latency budgets
+Slow generations keep running after the response is sent so the real result isn't lost
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional
+
+from ai_agents.deadlines import clear_deadline
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImageJob:
+    """State of a single background image generation"""
+    token: str
+    prompt: str
+    status: str = "pending"  # "pending", "done" or "failed"
+    image_url: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "token": self.token,
+            "status": self.status,
+            "image_url": self.image_url,
+            "error": self.error,
+        }
+
+
+class ImageJobsFull(RuntimeError):
+    """Raised by ImageJobStore.submit when max_pending generations are already running"""
+
+
+class ImageJobStore:
+    """In-process registry of image generations that outlived their latency budget"""
+
+    def __init__(self, ttl_seconds: float = 900, max_jobs: int = 1000, max_pending: int = 100):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        # Pending jobs can't be evicted, so they're capped separately: a slow image backend
+        # would otherwise grow the store without limit
+        self.max_pending = max_pending
+        self._jobs: Dict[str, ImageJob] = {}
+        self._pending = 0
+
+    @property
+    def full(self) -> bool:
+        return self._pending >= self.max_pending
+
+    def submit(self, prompt: str, generate: Callable[[str], Awaitable[Optional[str]]]) -> ImageJob:
+        """Start generating in the background and return the job handle
+
+        Raises ImageJobsFull when max_pending jobs are already in flight.
+        """
+        self._prune()
+        if self.full:
+            raise ImageJobsFull(f"{self._pending} image jobs already in flight")
+        job = ImageJob(token=uuid.uuid4().hex, prompt=prompt)
+        job.task = asyncio.create_task(self._run(job, generate))
+        job.task.add_done_callback(lambda task: self._finished(job))
+        self._jobs[job.token] = job
+        self._pending += 1
+        return job
+
+    async def wait(self, job: ImageJob, timeout: Optional[float]) -> bool:
+        """Wait up to timeout seconds for the job; the job keeps running if it doesn't finish"""
+        if job.task is None or job.task.done():
+            return job.status != "pending"
+        try:
+            await asyncio.wait_for(asyncio.shield(job.task), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job.status != "pending"
+
+    def get(self, token: str) -> Optional[ImageJob]:
+        self._prune()
+        return self._jobs.get(token)
+
+    async def _run(self, job: ImageJob, generate: Callable[[str], Awaitable[Optional[str]]]):
+        # Jobs outlive the request that submitted them, so they don't inherit its deadline
+        clear_deadline()
+        try:
+            image_url = await generate(job.prompt)
+            if image_url:
+                job.image_url = image_url
+                job.status = "done"
+            else:
+                job.status = "failed"
+                job.error = "Image generation returned no URL"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "Image generation cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Background image job {job.token} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.monotonic()
+
+    def _finished(self, job: ImageJob):
+        # Runs for every task, including one cancelled before it started running
+        self._pending -= 1
+        if job.status == "pending":
+            job.status = "failed"
+            job.error = "Image generation cancelled"
+            job.finished_at = time.monotonic()
+
+    def _prune(self):
+        # Drop finished jobs past their TTL, then the oldest finished ones if still over capacity
+        now = time.monotonic()
+        expired = [
+            token for token, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.ttl_seconds
+        ]
+        for token in expired:
+            del self._jobs[token]
+
+        if len(self._jobs) >= self.max_jobs:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.finished_at is not None),
+                key=lambda job: job.finished_at
+            )
+            for job in finished[:len(self._jobs) - self.max_jobs + 1]:
+                del self._jobs[job.token]
@@ -0,0 +1,83 @@
+"""
+Image Serving - Cacheable file responses for stored images
+Strong ETags, immutable cache headers, conditional GETs and single byte ranges
+"""
+
+import re
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+# Stored images are content-addressed, so a URL never changes meaning
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+_CHUNK_SIZE = 64 * 1024
+
+
+def image_file_response(request: Request, path: Path, media_type: str) -> Response:
+    """Serve a stored image, honouring If-None-Match and Range"""
+    size = path.stat().st_size
+    # Content-addressed file names make the name itself a strong validator
+    etag = f'"{path.stem}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = _parse_range(request.headers.get("range"), size)
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and (if_range is None or if_range.strip() == etag):
+        if byte_range == (-1, -1):
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            _read_range(path, start, end), status_code=206, media_type=media_type, headers=headers
+        )
+
+    # FileResponse hands the path to the server (pathsend) when it supports zero-copy sends
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    # Only single ranges are supported; anything else is served in full
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            return (-1, -1)
+        return (max(size - length, 0), size - 1)
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return (-1, -1)
+    return (start, end)
+
+
+def _read_range(path: Path, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,185 @@
+"""
+Image Store - Content-addressed local storage for images served by the API
+Remote images are fetched once; size and format variants are rendered on demand and cached
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {
+    ".webp": "image/webp",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+}
+
+# Longest edge in pixels, None keeps the original size
+VARIANTS = {
+    "thumbnail": 256,
+    "card": 640,
+    "full": None,
+}
+
+FORMATS = {
+    "webp": "WEBP",
+    "jpeg": "JPEG",
+    "png": "PNG",
+}
+
+_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}\.(webp|png|jpg|jpeg)$")
+_EXTENSIONS_BY_CONTENT_TYPE = {media_type: ext for ext, media_type in MEDIA_TYPES.items()}
+
+
+class ImageStore:
+    """Stores image bytes under their SHA-256 so identical images are kept once"""
+
+    def __init__(self, root: Path, fetch_timeout: float = 30):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.fetch_timeout = fetch_timeout
+        self._http: Optional["httpx.AsyncClient"] = None
+        self._fetching: Dict[str, asyncio.Future] = {}
+
+    def put(self, data: bytes, ext: str) -> str:
+        """Store image bytes and return their key"""
+        key = f"{hashlib.sha256(data).hexdigest()}{ext}"
+        path = self._path_for(key)
+        if not path.exists():
+            self._write(path, data)
+            logger.info(f"Stored image {key} ({len(data)} bytes)")
+        return key
+
+    def path(self, key: str) -> Optional[Path]:
+        """Filesystem path for a key, or None if the key is invalid or unknown"""
+        if not _KEY_PATTERN.match(key):
+            return None
+        path = self._path_for(key)
+        return path if path.exists() else None
+
+    async def fetch(self, url: str) -> str:
+        """Download a remote image into the store once and return its key"""
+        key = self._lookup_url(url)
+        if key is not None:
+            return key
+
+        # Concurrent requests for the same URL share one download
+        pending = self._fetching.get(url)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The request that started the download went away, not this one: fetch for this one
+                if pending.done() and not pending.cancelled() and isinstance(pending.exception(), asyncio.CancelledError):
+                    return await self.fetch(url)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._fetching[url] = future
+        try:
+            response = await self._client().get(url)
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "").split(";")[0].strip()
+            ext = _EXTENSIONS_BY_CONTENT_TYPE.get(content_type) or Path(url.split("?")[0]).suffix.lower()
+            if ext not in MEDIA_TYPES:
+                ext = ".webp"
+            key = await asyncio.to_thread(self._put_url, url, response.content, ext)
+            future.set_result(key)
+            return key
+        except BaseException as e:
+            # Waiters tell the owner's cancellation apart from their own by the exception
+            future.set_exception(e)
+            # Mark retrieved, nobody else may be waiting on it
+            future.exception()
+            raise
+        finally:
+            del self._fetching[url]
+
+    def variant(self, key: str, variant: str, fmt: str) -> Optional[Path]:
+        """Path of a resized/transcoded variant, rendering and caching it on first use"""
+        source = self.path(key)
+        if source is None or variant not in VARIANTS or fmt not in FORMATS:
+            return None
+
+        path = self.root / "variants" / key[:2] / f"{Path(key).stem}-{variant}.{fmt}"
+        if path.exists():
+            return path
+
+        from PIL import Image
+
+        with Image.open(source) as image:
+            max_edge = VARIANTS[variant]
+            if max_edge is not None:
+                image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            if FORMATS[fmt] == "JPEG":
+                image = image.convert("RGB")
+            out = io.BytesIO()
+            image.save(out, format=FORMATS[fmt], quality=82, optimize=True)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._write(path, out.getvalue())
+        return path
+
+    def reset_after_fork(self):
+        # The parent's HTTP pool and in-flight downloads belong to another process
+        self._http = None
+        self._fetching = {}
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    @staticmethod
+    def media_type(name: str) -> str:
+        return MEDIA_TYPES.get(Path(name).suffix, "application/octet-stream")
+
+    def _client(self) -> "httpx.AsyncClient":
+        if self._http is None:
+            import httpx
+            self._http = httpx.AsyncClient(timeout=self.fetch_timeout, follow_redirects=True)
+        return self._http
+
+    def _put_url(self, url: str, data: bytes, ext: str) -> str:
+        key = self.put(data, ext)
+        self._write(self._url_index_path(url), key.encode())
+        return key
+
+    def _lookup_url(self, url: str) -> Optional[str]:
+        index_path = self._url_index_path(url)
+        if not index_path.exists():
+            return None
+        key = index_path.read_text().strip()
+        return key if self.path(key) else None
+
+    def _url_index_path(self, url: str) -> Path:
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return self.root / "urls" / digest[:2] / digest
+
+    def _path_for(self, key: str) -> Path:
+        # Two-level fan-out keeps directories small
+        return self.root / key[:2] / key
+
+    @staticmethod
+    def _write(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
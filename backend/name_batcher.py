@@ -0,0 +1,193 @@
+"""
+Name Batcher - Combine concurrent name-generation requests into one LLM call
+Requests arriving within a short window (or until the batch is full) share a single prompt
+that states the instructions once and asks for a keyed JSON answer per description. Each
+waiter gets its own answer back in the single-request format; any item the combined answer
+got wrong is retried on its own.
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from ai_agents.deadlines import clear_deadline
+
+logger = logging.getLogger(__name__)
+
+# (prompt, use the response cache, number of descriptions) -> model reply, raises on failure
+Complete = Callable[[str, bool, int], Awaitable[str]]
+
+NAME_GUIDELINES = """
+        Please consider:
+        - The style and characteristics requested
+        - Cultural backgrounds if mentioned
+        - Gender preferences if specified
+        - Modern vs traditional preferences
+        - Any specific letters or sounds mentioned
+"""
+
+
+def name_prompt(description: str) -> str:
+    """Prompt for one description, answered as {"names": [...], "explanation": "..."}"""
+    return f"""
+        Generate 5 unique child names based on this description: "{description}"
+{NAME_GUIDELINES}
+        Provide your response as a JSON object with:
+        - "names": array of 5 suggested names
+        - "explanation": brief explanation of why these names fit the description
+
+        Example format:
+        {{
+            "names": ["Emma", "Oliver", "Sophia", "Liam", "Ava"],
+            "explanation": "These are popular modern names that are classic yet contemporary..."
+        }}
+        """
+
+
+def batch_name_prompt(descriptions: List[str]) -> str:
+    """Prompt for several descriptions, answered as one JSON object keyed "1", "2", ..."""
+    listing = "\n".join(f'        {index}: "{description}"' for index, description in enumerate(descriptions, 1))
+    return f"""
+        Generate 5 unique child names for each of these descriptions, independently of each other:
+{listing}
+{NAME_GUIDELINES}
+        Provide your response as a JSON object with one key per description number, each holding:
+        - "names": array of 5 suggested names
+        - "explanation": brief explanation of why these names fit that description
+
+        Example format:
+        {{
+            "1": {{"names": ["Emma", "Oliver", "Sophia", "Liam", "Ava"], "explanation": "Popular modern names..."}},
+            "2": {{"names": ["Aoife", "Niamh", "Saoirse", "Ciara", "Maeve"], "explanation": "Irish names..."}}
+        }}
+        """
+
+
+def parse_batch_answer(content: str) -> Dict[str, dict]:
+    """Well-formed answers by key; anything unusable is left out"""
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(parsed, dict):
+        return {}
+    answers = {}
+    for key, answer in parsed.items():
+        if not isinstance(answer, dict):
+            continue
+        names = answer.get("names")
+        if isinstance(names, list) and names and all(isinstance(name, str) and name.strip() for name in names):
+            answers[str(key)] = {"names": names, "explanation": str(answer.get("explanation", ""))}
+    return answers
+
+
+@dataclass
+class _Item:
+    description: str
+    cache: bool
+    future: asyncio.Future
+
+
+class NameBatcher:
+    """Collects name requests for window_ms, or until max_batch, then makes one call"""
+
+    def __init__(self, complete: Complete, window_ms: float = 20, max_batch: int = 8):
+        self.complete = complete
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        # Normalized description -> waiting item, in arrival order
+        self._pending: Dict[str, _Item] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running = set()
+        self._stats = {"requests": 0, "shared": 0, "batches": 0, "batched_items": 0, "single_calls": 0, "fallbacks": 0}
+
+    async def submit(self, description: str, cache: bool = True) -> str:
+        """Model reply for this description, in the single-request JSON format"""
+        self._stats["requests"] += 1
+        key = " ".join(description.lower().split())
+        item = self._pending.get(key)
+        if item is not None:
+            # The same description is already waiting: one answer for both
+            self._stats["shared"] += 1
+            item.cache = item.cache and cache
+        else:
+            item = _Item(description, cache, asyncio.get_running_loop().create_future())
+            self._pending[key] = item
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window_ms / 1000, self._flush)
+        # A waiter that gives up doesn't cancel the call others are waiting on
+        return await asyncio.shield(item.future)
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "pending": len(self._pending),
+            "average_batch_size": self._stats["batched_items"] / self._stats["batches"] if self._stats["batches"] else 0.0,
+        }
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items = list(self._pending.values())
+        self._pending = {}
+        if items:
+            task = asyncio.create_task(self._run(items))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, items: List[_Item]):
+        # Serves every waiter, so not bound by the deadline of whichever request came first
+        clear_deadline()
+        if len(items) == 1:
+            self._stats["single_calls"] += 1
+            await self._run_single(items[0])
+            return
+
+        self._stats["batches"] += 1
+        self._stats["batched_items"] += len(items)
+        try:
+            content = await self.complete(
+                batch_name_prompt([item.description for item in items]), all(item.cache for item in items), len(items)
+            )
+        except Exception as e:
+            logger.error(f"Batched name generation failed for {len(items)} requests: {e}")
+            for item in items:
+                self._fail(item, e)
+            return
+
+        answers = parse_batch_answer(content)
+        retry = []
+        for index, item in enumerate(items, 1):
+            answer = answers.get(str(index))
+            if answer is None:
+                retry.append(item)
+            elif not item.future.done():
+                item.future.set_result(json.dumps(answer))
+        if retry:
+            logger.warning(f"Batched name answer unusable for {len(retry)} of {len(items)} requests, retrying them alone")
+            self._stats["fallbacks"] += len(retry)
+            await asyncio.gather(*(self._run_single(item) for item in retry))
+
+    async def _run_single(self, item: _Item):
+        try:
+            content = await self.complete(name_prompt(item.description), item.cache, 1)
+        except Exception as e:
+            self._fail(item, e)
+            return
+        if not item.future.done():
+            item.future.set_result(content)
+
+    @staticmethod
+    def _fail(item: _Item, error: Exception):
+        if not item.future.done():
+            item.future.set_exception(error)
+            # Every waiter may have gone; don't log "exception never retrieved"
+            item.future.exception()
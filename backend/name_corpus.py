@@ -0,0 +1,454 @@
+"""
+Name Corpus - Bundled baby-name dataset with attribute indexes for instant suggestions
+Attributes live in NumPy columns (one entry per name) with inverted indexes on gender,
+origin, initial letter and syllable count. A description like "short modern girl names
+starting with A" is parsed into constraints, the indexes narrow the rows, and a vectorized
+scorer ranks what's left.
+"""
+
+import csv
+import functools
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+DATA_PATH = Path(__file__).parent / "data" / "names.csv"
+
+GENDERS = ("F", "M", "U")
+GENDER_LABELS = {"F": "girl", "M": "boy", "U": "unisex"}
+
+_GENDER_WORDS = {
+    "F": {"girl", "girls", "daughter", "female", "feminine", "she", "her", "princess"},
+    "M": {"boy", "boys", "son", "male", "masculine", "he", "him", "prince"},
+    "U": {"unisex", "neutral", "gender-neutral", "androgynous"},
+}
+
+# Words people use for an origin -> origins in the dataset
+_ORIGIN_WORDS = {
+    "english": {"English"}, "british": {"English"},
+    "irish": {"Irish"}, "scottish": {"Scottish"}, "welsh": {"Welsh"},
+    "celtic": {"Irish", "Scottish", "Welsh"}, "gaelic": {"Irish", "Scottish"},
+    "hebrew": {"Hebrew"}, "biblical": {"Hebrew", "Aramaic"}, "aramaic": {"Aramaic"},
+    "greek": {"Greek"}, "latin": {"Latin"}, "roman": {"Latin"},
+    "italian": {"Italian"}, "spanish": {"Spanish"}, "hispanic": {"Spanish"},
+    "latino": {"Spanish"}, "latina": {"Spanish"}, "french": {"French"},
+    "german": {"German"}, "dutch": {"Dutch"},
+    "scandinavian": {"Scandinavian"}, "nordic": {"Scandinavian"}, "norse": {"Scandinavian"},
+    "viking": {"Scandinavian"}, "swedish": {"Scandinavian"}, "norwegian": {"Scandinavian"},
+    "danish": {"Scandinavian"},
+    "russian": {"Russian"}, "slavic": {"Slavic", "Russian"},
+    "arabic": {"Arabic"}, "arab": {"Arabic"}, "persian": {"Persian"}, "iranian": {"Persian"},
+    "turkish": {"Turkish"},
+    "indian": {"Sanskrit"}, "sanskrit": {"Sanskrit"}, "hindi": {"Sanskrit"},
+    "japanese": {"Japanese"}, "chinese": {"Chinese"}, "korean": {"Korean"},
+    "african": {"Igbo", "Yoruba", "Swahili", "Akan", "Kikuyu"},
+    "nigerian": {"Igbo", "Yoruba"}, "igbo": {"Igbo"}, "yoruba": {"Yoruba"},
+    "swahili": {"Swahili"}, "ghanaian": {"Akan"}, "akan": {"Akan"}, "kenyan": {"Swahili", "Kikuyu"},
+    "hawaiian": {"Hawaiian"}, "polynesian": {"Hawaiian"},
+    "native": {"Sioux"},
+}
+
+# Themes people ask for -> words to look for in the name's meaning
+_THEMES = {
+    "nature": {"tree", "flower", "river", "sea", "forest", "meadow", "leaf", "oak", "willow", "ocean", "stream", "woodland"},
+    "flower": {"flower", "rose", "lily", "blossom", "jasmine", "violet", "foxglove"},
+    "floral": {"flower", "rose", "lily", "blossom", "jasmine", "violet"},
+    "botanical": {"flower", "tree", "plant", "vine", "blossom"},
+    "tree": {"tree", "oak", "willow", "ash", "yew", "laurel", "olive", "juniper"},
+    "water": {"sea", "ocean", "river", "stream", "lake", "water"},
+    "ocean": {"sea", "ocean"}, "sea": {"sea", "ocean"},
+    "celestial": {"star", "moon", "sun", "heavens", "heavenly", "dawn", "sky", "pleiades"},
+    "star": {"star"}, "moon": {"moon", "moonlight"}, "sun": {"sun", "sunny"},
+    "sky": {"sky", "heavens", "heavenly"}, "space": {"star", "moon", "sun", "heavens"},
+    "strong": {"strong", "strength", "mighty", "brave", "warrior", "bold", "fierce"},
+    "strength": {"strong", "strength", "mighty"},
+    "brave": {"brave", "bold", "courageous", "fearless", "warrior"},
+    "warrior": {"warrior", "battle", "war", "soldier"},
+    "light": {"light", "bright", "radiant", "shining", "radiance", "sun"},
+    "bright": {"bright", "light", "shining", "radiant"},
+    "royal": {"king", "queen", "princess", "prince", "ruler", "noble"},
+    "regal": {"king", "queen", "princess", "prince", "ruler", "noble"},
+    "noble": {"noble", "nobility"},
+    "happy": {"happy", "joy", "happiness", "blessed", "cheerful"},
+    "joyful": {"joy", "happy", "happiness"},
+    "wise": {"wise", "wisdom", "intelligent", "clever", "scholar"},
+    "smart": {"wise", "wisdom", "intelligent", "clever", "intellect"},
+    "peaceful": {"peace", "peaceful", "calm", "serene", "calmness"},
+    "calm": {"calm", "peace", "peaceful", "serene", "calmness"},
+    "love": {"love", "beloved", "dear"},
+    "loving": {"love", "beloved", "dear"},
+    "gift": {"gift"},
+    "faith": {"faith", "God", "blessed", "trust"},
+    "spiritual": {"God", "divine", "blessed", "heavenly", "goddess"},
+    "golden": {"golden", "gold"},
+    "gem": {"jewel", "gemstone", "pearl", "precious", "stone"},
+}
+
+_POPULAR_WORDS = {"popular", "common", "trendy", "modern", "top", "contemporary", "fashionable", "familiar"}
+_RARE_WORDS = {"unique", "rare", "uncommon", "unusual", "distinctive", "different", "original", "quirky"}
+_SHORT_WORDS = {"short", "simple", "cute", "little"}
+_LONG_WORDS = {"long", "elegant", "elaborate", "sophisticated", "formal"}
+_NUMBER_WORDS = {"one": 1, "single": 1, "two": 2, "three": 3, "four": 4, "1": 1, "2": 2, "3": 3, "4": 4}
+
+# Words that carry no constraint of their own
+_STOPWORDS = {
+    "a", "an", "the", "name", "names", "for", "my", "our", "baby", "babies", "child", "children", "kid",
+    "kids", "that", "with", "and", "or", "is", "are", "of", "like", "something", "some", "want", "wants",
+    "we", "i", "looking", "please", "would", "which", "sounds", "sound", "sounding", "nice", "good",
+    "pretty", "beautiful", "to", "in", "be", "it", "new", "our", "me", "us", "suggest", "ideas", "idea",
+    "letter", "starts", "start", "starting", "begins", "beginning", "begin", "ends", "ending", "end",
+    "syllable", "syllables", "origin", "origins", "meaning", "meanings", "means", "mean", "inspired",
+    "classic", "timeless", "traditional", "cool", "lovely", "sweet", "but", "not", "too", "very",
+    "really", "also", "has", "have", "having", "style", "vibe", "feel", "name's", "themed", "theme",
+    "heritage", "culture", "background", "family", "first", "middle", "option", "options", "any",
+    "letters", "from", "on", "at", "by", "than", "more", "less", "character", "characters",
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-'][a-z]+)?")
+_STARTS_WITH = re.compile(r"\b(?:start(?:s|ing)?|begin(?:s|ning)?)\s+with\s+(?:an?\s+|the\s+letter\s+)?[\"']?([a-z]{1,3})\b")
+_ENDS_WITH = re.compile(r"\bend(?:s|ing)?\s+(?:with|in)\s+(?:an?\s+|the\s+letter\s+)?[\"']?([a-z]{1,3})\b")
+_LETTER_NAMES = re.compile(r"\b([a-z])\s+names?\b")
+_SYLLABLES = re.compile(r"\b(one|single|two|three|four|[1-4])[\s-]+syllables?\b")
+_MAX_LENGTH = re.compile(r"\b(?:under|fewer than|less than|at most|max(?:imum)?)\s+(\d+)\s+(?:letters|characters)\b")
+_VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+
+
+def count_syllables(name: str) -> int:
+    # Vowel-group heuristic with a few common name endings; good enough to filter on
+    total = 0
+    for part in name.lower().split("-"):
+        count = len(_VOWEL_GROUPS.findall(part))
+        if part.endswith("e") and not part.endswith(("ee", "ie", "oe", "ye")) and count > 1 and part[-2] not in "aeiouy":
+            count -= 1  # silent e: Grace, Rose
+        elif part.endswith("es") and count > 1 and part[-3] not in "aeiouysxzc":
+            count -= 1  # James, Charles
+        if part.endswith(("ia", "io", "oe", "ea", "iah", "iam", "ian")) and len(part) > 2:
+            count += 1  # Sophia, Mia, Chloe, Thea, Liam
+        total += max(1, count)
+    return total
+
+
+@dataclass
+class NameQuery:
+    """Constraints parsed from a free-form description"""
+    genders: Set[str] = field(default_factory=set)
+    origins: Set[str] = field(default_factory=set)
+    starts_with: Set[str] = field(default_factory=set)
+    ends_with: Set[str] = field(default_factory=set)
+    min_length: Optional[int] = None
+    max_length: Optional[int] = None
+    syllables: Optional[int] = None
+    popularity: int = 0  # 1 prefer popular, -1 prefer rare
+    themes: Dict[str, Set[str]] = field(default_factory=dict)
+    unrecognized: List[str] = field(default_factory=list)
+
+    def has_constraints(self) -> bool:
+        return bool(
+            self.genders or self.origins or self.starts_with or self.ends_with or self.themes
+            or self.min_length or self.max_length or self.syllables or self.popularity
+        )
+
+    def fully_understood(self) -> bool:
+        """True when every meaningful word of the description became a constraint"""
+        return self.has_constraints() and not self.unrecognized
+
+    def describe(self) -> str:
+        parts = []
+        if self.popularity:
+            parts.append("popular" if self.popularity > 0 else "less common")
+        if self.max_length and not self.min_length:
+            parts.append("short")
+        if self.min_length and not self.max_length:
+            parts.append("longer")
+        if self.syllables:
+            parts.append(f"{self.syllables}-syllable")
+        if self.origins:
+            parts.append("/".join(sorted(self.origins)))
+        parts.append(" or ".join(GENDER_LABELS[gender] for gender in sorted(self.genders)) + " names" if self.genders else "names")
+        if self.starts_with:
+            parts.append("starting with " + " or ".join(sorted(prefix.upper() for prefix in self.starts_with)))
+        if self.ends_with:
+            parts.append("ending in " + " or ".join(sorted(self.ends_with)))
+        if self.themes:
+            parts.append("with meanings around " + ", ".join(sorted(self.themes)))
+        return " ".join(parts)
+
+
+def parse_description(description: str) -> NameQuery:
+    """Turn "short modern girl names starting with A" into a NameQuery"""
+    text = description.lower()
+    query = NameQuery()
+    consumed: Set[str] = set()
+
+    for match in _STARTS_WITH.finditer(text):
+        query.starts_with.add(match.group(1))
+        consumed.add(match.group(1))
+    for match in _ENDS_WITH.finditer(text):
+        query.ends_with.add(match.group(1))
+        consumed.add(match.group(1))
+    for match in _LETTER_NAMES.finditer(text):
+        # "A names"
+        if match.group(1) not in {"a", "i"} or description[match.start(1)].isupper():
+            query.starts_with.add(match.group(1))
+            consumed.add(match.group(1))
+    for match in _SYLLABLES.finditer(text):
+        query.syllables = _NUMBER_WORDS[match.group(1)]
+        consumed.add(match.group(1))
+    for match in _MAX_LENGTH.finditer(text):
+        query.max_length = int(match.group(1)) - 1
+        consumed.update({"under", "fewer", "less", "at", "most", "max", "maximum", match.group(1)})
+
+    for token in _TOKEN.findall(text):
+        if token in consumed:
+            continue
+        matched = False
+        for gender, words in _GENDER_WORDS.items():
+            if token in words:
+                query.genders.add(gender)
+                matched = True
+        if token in _ORIGIN_WORDS:
+            query.origins |= _ORIGIN_WORDS[token]
+            matched = True
+        if token in _THEMES:
+            query.themes[token] = _THEMES[token]
+            matched = True
+        if token in _POPULAR_WORDS:
+            query.popularity = 1
+            matched = True
+        elif token in _RARE_WORDS:
+            query.popularity = -1
+            matched = True
+        if token in _SHORT_WORDS:
+            query.max_length = query.max_length or 4
+            matched = True
+        elif token in _LONG_WORDS:
+            query.min_length = 7
+            matched = True
+        if not matched and token not in _STOPWORDS and token not in _NUMBER_WORDS:
+            query.unrecognized.append(token)
+
+    if query.genders and query.genders != {"U"}:
+        # Unisex names suit a "girl" or "boy" request too; they're ranked a little lower
+        query.genders.add("U")
+    return query
+
+
+@dataclass
+class NameCandidate:
+    name: str
+    gender: str
+    origins: List[str]
+    meaning: str
+    popularity: float
+    syllables: int
+    score: float
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "gender": self.gender,
+            "origins": self.origins,
+            "meaning": self.meaning,
+            "popularity": self.popularity,
+            "syllables": self.syllables,
+        }
+
+
+class NameCorpus:
+    """Column-oriented name dataset with inverted attribute indexes"""
+
+    def __init__(self, rows: List[dict]):
+        self.names = np.array([row["name"] for row in rows])
+        self.lower_names = np.char.lower(self.names)
+        self.meanings = np.array([row["meaning"] for row in rows])
+        self.lower_meanings = np.char.lower(self.meanings)
+        self.origin_lists = [row["origin"].split("/") for row in rows]
+        self.origin_vocab = sorted({origin for origins in self.origin_lists for origin in origins})
+        origin_codes = {origin: code for code, origin in enumerate(self.origin_vocab)}
+
+        self.gender = np.array([GENDERS.index(row["gender"]) for row in rows], dtype=np.int8)
+        self.origin = np.array([origin_codes[origins[0]] for origins in self.origin_lists], dtype=np.int16)
+        self.length = np.array([len(row["name"].replace("-", "")) for row in rows], dtype=np.uint8)
+        self.syllables = np.array([count_syllables(row["name"]) for row in rows], dtype=np.uint8)
+        self.popularity = np.array([float(row["popularity"]) for row in rows], dtype=np.float32) / 100
+
+        # attribute -> value -> sorted row ids
+        self.index: Dict[str, Dict[object, np.ndarray]] = {
+            "gender": {gender: np.flatnonzero(self.gender == code) for code, gender in enumerate(GENDERS)},
+            "initial": self._index_by(name[0] for name in self.lower_names),
+            "syllables": self._index_by(int(count) for count in self.syllables),
+            "origin": self._index_by_many(self.origin_lists),
+        }
+        self._by_name = {name: row for row, name in enumerate(self.lower_names)}
+        # Typeahead: row ids in name order, so a prefix is one contiguous slice
+        self._alphabetical = np.argsort(self.lower_names, kind="stable")
+        self._sorted_names = self.lower_names[self._alphabetical]
+
+    @classmethod
+    def load(cls, path: Path = DATA_PATH) -> "NameCorpus":
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls(list(csv.DictReader(f)))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def lookup(self, name: str) -> Optional[NameCandidate]:
+        row = self._by_name.get(name.strip().lower())
+        return None if row is None else self._candidate(row, 0.0)
+
+    def suggest(
+        self, prefix: str, gender: Optional[str] = None, origin: Optional[str] = None, k: int = 10
+    ) -> List[NameCandidate]:
+        """Most popular names starting with prefix, an exact match first"""
+        prefix = prefix.strip().lower()
+        start = np.searchsorted(self._sorted_names, prefix, side="left")
+        end = np.searchsorted(self._sorted_names, prefix + "\uffff", side="right")
+        rows = self._alphabetical[start:end]
+        if gender:
+            gender = gender.upper()[:1]
+            codes = [GENDERS.index(g) for g in {gender, "U"} if g in GENDERS]
+            rows = rows[np.isin(self.gender[rows], codes)]
+        if origin:
+            origins = _ORIGIN_WORDS.get(origin.lower()) or {o for o in self.origin_vocab if o.lower() == origin.lower()}
+            rows = np.intersect1d(rows, self._union("origin", origins))
+        if len(rows) == 0:
+            return []
+
+        scores = self.popularity[rows] + (self.lower_names[rows] == prefix)
+        if len(rows) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        order = np.lexsort((self.lower_names[rows], -scores))
+        return [self._candidate(int(row), float(scores[i])) for i, row in zip(order, rows[order])]
+
+    def memory_bytes(self) -> int:
+        """Approximate footprint of the columns and indexes"""
+        arrays = [
+            self.names, self.lower_names, self.meanings, self.lower_meanings, self.gender, self.origin,
+            self.length, self.syllables, self.popularity, self._alphabetical, self._sorted_names,
+        ]
+        arrays += [rows for values in self.index.values() for rows in values.values()]
+        return sum(array.nbytes for array in arrays)
+
+    def search(self, query: NameQuery, k: int = 5) -> Tuple[List[NameCandidate], List[str]]:
+        """Top-k names for the query, and the constraints dropped to find at least k"""
+        relaxed: List[str] = []
+        rows = self._filter(query)
+        # Loosen the softest constraints first when the strict set is too small
+        for constraint in ("syllables", "length", "ends_with", "origins"):
+            if len(rows) >= k:
+                break
+            if self._drop(query, constraint):
+                relaxed.append(constraint)
+                rows = self._filter(query)
+        if len(rows) == 0:
+            return [], relaxed
+
+        scores = self._score(rows, query)
+        top = min(k, len(rows))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [self._candidate(int(rows[i]), float(scores[i])) for i in best], relaxed
+
+    def _filter(self, query: NameQuery) -> np.ndarray:
+        rows = np.arange(len(self.names))
+        if query.genders:
+            rows = np.intersect1d(rows, self._union("gender", query.genders), assume_unique=True)
+        if query.origins:
+            rows = np.intersect1d(rows, self._union("origin", query.origins), assume_unique=True)
+        if query.syllables:
+            rows = np.intersect1d(rows, self._union("syllables", {query.syllables}), assume_unique=True)
+        if query.starts_with:
+            rows = np.intersect1d(rows, self._union("initial", {prefix[0] for prefix in query.starts_with}), assume_unique=True)
+            longer = [prefix for prefix in query.starts_with if len(prefix) > 1]
+            if longer:
+                names = self.lower_names[rows]
+                keep = np.zeros(len(rows), dtype=bool)
+                for prefix in query.starts_with:
+                    keep |= np.char.startswith(names, prefix)
+                rows = rows[keep]
+        if query.ends_with:
+            names = self.lower_names[rows]
+            keep = np.zeros(len(rows), dtype=bool)
+            for suffix in query.ends_with:
+                keep |= np.char.endswith(names, suffix)
+            rows = rows[keep]
+        if query.min_length:
+            rows = rows[self.length[rows] >= query.min_length]
+        if query.max_length:
+            rows = rows[self.length[rows] <= query.max_length]
+        return rows
+
+    def _score(self, rows: np.ndarray, query: NameQuery) -> np.ndarray:
+        popularity = self.popularity[rows]
+        if query.popularity > 0:
+            scores = popularity.copy()
+        elif query.popularity < 0:
+            scores = 1 - popularity
+        else:
+            # No preference: lean towards familiar names without burying the rest
+            scores = 0.5 * popularity
+        meanings = self.lower_meanings[rows]
+        for words in query.themes.values():
+            hit = np.zeros(len(rows), dtype=bool)
+            for word in words:
+                hit |= np.char.find(meanings, word.lower()) >= 0
+            scores = scores + hit
+        if "U" in query.genders and query.genders != {"U"}:
+            scores = scores - 0.3 * (self.gender[rows] == GENDERS.index("U"))
+        return scores
+
+    def _union(self, attribute: str, values) -> np.ndarray:
+        arrays = [self.index[attribute][value] for value in values if value in self.index[attribute]]
+        if not arrays:
+            return np.array([], dtype=np.int64)
+        return functools.reduce(np.union1d, arrays)
+
+    @staticmethod
+    def _drop(query: NameQuery, constraint: str) -> bool:
+        if constraint == "syllables" and query.syllables:
+            query.syllables = None
+        elif constraint == "length" and (query.min_length or query.max_length):
+            query.min_length = query.max_length = None
+        elif constraint == "ends_with" and query.ends_with:
+            query.ends_with = set()
+        elif constraint == "origins" and query.origins:
+            query.origins = set()
+        else:
+            return False
+        return True
+
+    @staticmethod
+    def _index_by(values) -> Dict[object, np.ndarray]:
+        rows_by_value: Dict[object, List[int]] = {}
+        for row, value in enumerate(values):
+            rows_by_value.setdefault(value, []).append(row)
+        return {value: np.array(rows, dtype=np.int64) for value, rows in rows_by_value.items()}
+
+    @staticmethod
+    def _index_by_many(value_lists) -> Dict[object, np.ndarray]:
+        rows_by_value: Dict[object, List[int]] = {}
+        for row, values in enumerate(value_lists):
+            for value in values:
+                rows_by_value.setdefault(value, []).append(row)
+        return {value: np.array(rows, dtype=np.int64) for value, rows in rows_by_value.items()}
+
+    def _candidate(self, row: int, score: float) -> NameCandidate:
+        return NameCandidate(
+            name=str(self.names[row]),
+            gender=GENDERS[self.gender[row]],
+            origins=self.origin_lists[row],
+            meaning=str(self.meanings[row]),
+            popularity=round(float(self.popularity[row]) * 100),
+            syllables=int(self.syllables[row]),
+            score=score,
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def get_name_corpus() -> NameCorpus:
+    """The bundled corpus, loaded on first use"""
+    return NameCorpus.load()
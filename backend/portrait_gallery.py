@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Portrait Gallery - Pre-generate portraits and age progressions for popular names off-peak
+Takes a ranked name list (the bundled corpus by popularity, or a file) and generates the
+portrait and every age image for the top N names, through the same prompt templates and
+generation path as /api/generate-image and /api/generate-age-progression. Results land in the
+image store and the shared cache, so requests for those names are answered without a
+generation. Work runs with bounded concurrency and every finished image is appended to a
+checkpoint file: an interrupted or time-boxed run picks up where it left off, and finished
+images are loaded back into the cache on every run.
+
+The shared cache is fixed-size and evicts gallery entries like any other, so the checkpoint
+is also the durable record: on a cache miss the server looks the prompt up in it through
+GalleryIndex and puts the image back in the cache.
+
+Image prompts include the request's description verbatim, so a gallery image is only hit by
+requests for that name whose description is exactly (case and whitespace included) one of
+the --description values. Pass the descriptions the app actually sends, e.g. the most
+frequent ones from generation history.
+
+Usage: python portrait_gallery.py --description "..." [--description "..."] [--top 100]
+                                  [--concurrency 2] [--stop-at 06:00] [--names ranked.txt]
+                                  [--checkpoint path]
+Run it on the serving host (e.g. from cron at night) so it shares the cache and image store.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+DEFAULT_CHECKPOINT_PATH = os.environ.get("GALLERY_CHECKPOINT_PATH", str(ROOT_DIR / "cache_snapshots" / "portrait_gallery.jsonl"))
+DEFAULT_AGES = (3, 6, 10, 15, 18)
+# Gallery images outlive ordinary cache entries: they're the point of the off-peak run
+GALLERY_CACHE_TTL_SECONDS = int(os.environ.get("GALLERY_CACHE_TTL_SECONDS", str(7 * 86400)))
+
+Generate = Callable[[str], Awaitable[Optional[str]]]
+Warm = Callable[[str, str], None]
+Available = Callable[[str], bool]
+
+
+@dataclass(frozen=True)
+class GalleryTask:
+    name: str
+    kind: str  # "portrait" or "age:<years>"
+    prompt: str
+
+
+@dataclass(frozen=True)
+class PromptTemplates:
+    """The serving path's prompt builders, so gallery prompts match request prompts exactly"""
+    portrait: Callable[[str, Optional[str]], str]
+    age_base: Callable[[str, Optional[str]], str]
+    age: Callable[[str, str, int], str]
+
+
+def gallery_tasks(
+    names: Iterable[str], templates: PromptTemplates, descriptions: Iterable[str], ages: Iterable[int] = DEFAULT_AGES
+) -> List[GalleryTask]:
+    """Portrait, then each age, per name and description, most popular name first"""
+    descriptions = list(descriptions)
+    if not descriptions or not all(descriptions):
+        raise ValueError("Gallery prompts need at least one non-empty description")
+    tasks, seen = [], set()
+    for name in names:
+        for description in descriptions:
+            base = templates.age_base(name, description)
+            candidates = [GalleryTask(name, "portrait", templates.portrait(name, description))]
+            candidates += [GalleryTask(name, f"age:{age}", templates.age(base, name, age)) for age in ages]
+            for task in candidates:
+                if task.prompt not in seen:
+                    seen.add(task.prompt)
+                    tasks.append(task)
+    return tasks
+
+
+def ranked_names(top: int, path: Optional[Path] = None) -> List[str]:
+    """Top names from a file (one per line, or a CSV with a name column) in file order, else the corpus by popularity"""
+    if path is None:
+        from name_corpus import get_name_corpus
+
+        corpus = get_name_corpus()
+        order = sorted(range(len(corpus)), key=lambda row: -float(corpus.popularity[row]))
+        return [str(corpus.names[row]) for row in order[:top]]
+
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.suffix == ".csv":
+            names = [row["name"] for row in csv.DictReader(f)]
+        else:
+            names = [line.split("#", 1)[0] for line in f]
+    names = [name.strip() for name in names if name.strip()]
+    return list(dict.fromkeys(names))[:top]
+
+
+def load_checkpoint(path: Path) -> Dict[str, dict]:
+    """prompt -> finished record; a torn last line from an interrupted run is skipped"""
+    done = {}
+    if not path.exists():
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[record["prompt"]] = record
+    return done
+
+
+class GalleryIndex:
+    """Finished gallery images by prompt, read from the checkpoint and reread when it changes"""
+
+    def __init__(self, checkpoint: Path):
+        self.checkpoint = Path(checkpoint)
+        self._images: Dict[str, str] = {}
+        self._loaded_from: Optional[tuple] = None
+
+    def get(self, prompt: str) -> Optional[str]:
+        try:
+            stat = self.checkpoint.stat()
+        except OSError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) != self._loaded_from:
+            self._images = {prompt: record["image_url"] for prompt, record in load_checkpoint(self.checkpoint).items()}
+            self._loaded_from = (stat.st_mtime_ns, stat.st_size)
+        return self._images.get(prompt)
+
+
+class GalleryJob:
+    """Generate gallery tasks with bounded concurrency, checkpointing each finished image"""
+
+    def __init__(
+        self,
+        generate: Generate,
+        warm: Warm,
+        checkpoint: Path,
+        concurrency: int = 2,
+        stop_at: Optional[float] = None,
+        available: Optional[Available] = None,
+    ):
+        self.generate = generate
+        self.warm = warm
+        # Whether a checkpointed image URL still resolves; gone ones are generated again
+        self.available = available or (lambda image_url: True)
+        self.checkpoint = checkpoint
+        self.concurrency = max(1, concurrency)
+        # Wall-clock time after which no new generation starts (the off-peak window closing)
+        self.stop_at = stop_at
+        self._stats = {"tasks": 0, "resumed": 0, "generated": 0, "failed": 0, "skipped": 0}
+
+    async def run(self, tasks: List[GalleryTask]) -> dict:
+        self._stats["tasks"] = len(tasks)
+        done = load_checkpoint(self.checkpoint)
+        pending = []
+        for task in tasks:
+            record = done.get(task.prompt)
+            if record is not None and self.available(record["image_url"]):
+                # Finished on an earlier run: only needs to be back in the cache
+                self.warm(task.prompt, record["image_url"])
+                self._stats["resumed"] += 1
+            else:
+                pending.append(task)
+
+        self.checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        queue: asyncio.Queue = asyncio.Queue()
+        for task in pending:
+            queue.put_nowait(task)
+        started = time.perf_counter()
+        with open(self.checkpoint, "a", encoding="utf-8") as checkpoint:
+            workers = [asyncio.create_task(self._worker(queue, checkpoint)) for _ in range(self.concurrency)]
+            await asyncio.gather(*workers)
+        return {**self._stats, "seconds": round(time.perf_counter() - started, 1)}
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+    async def _worker(self, queue: asyncio.Queue, checkpoint):
+        while not queue.empty():
+            task = queue.get_nowait()
+            if self.stop_at is not None and time.time() >= self.stop_at:
+                self._stats["skipped"] += 1
+                continue
+            try:
+                image_url = await self.generate(task.prompt)
+            except Exception as e:
+                logger.error(f"Gallery {task.kind} for {task.name} failed: {e}")
+                image_url = None
+            if not image_url:
+                # Left out of the checkpoint, so the next run tries again
+                self._stats["failed"] += 1
+                continue
+            self.warm(task.prompt, image_url)
+            checkpoint.write(json.dumps({
+                "name": task.name, "kind": task.kind, "prompt": task.prompt, "image_url": image_url, "created_at": time.time()
+            }) + "\n")
+            checkpoint.flush()
+            self._stats["generated"] += 1
+            logger.info(f"Gallery {task.kind} for {task.name} ready, {queue.qsize()} left")
+
+
+def stop_time(value: Optional[str]) -> Optional[float]:
+    """Next occurrence of a local HH:MM as a timestamp"""
+    if not value:
+        return None
+    hours, minutes = (int(part) for part in value.split(":"))
+    now = datetime.now()
+    at = now.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+    if at <= now:
+        at += timedelta(days=1)
+    return at.timestamp()
+
+
+async def run_gallery(args: argparse.Namespace) -> dict:
+    # The app module carries the prompt templates, generation path, cache and image store
+    import server
+
+    templates = PromptTemplates(server._build_portrait_prompt, server._build_age_base_prompt, server._build_age_prompt)
+    names = ranked_names(args.top, Path(args.names) if args.names else None)
+    tasks = gallery_tasks(names, templates, args.description, args.ages)
+    logger.info(
+        f"Portrait gallery: {len(names)} names x {len(args.description)} descriptions, "
+        f"{len(tasks)} images, concurrency {args.concurrency}"
+    )
+
+    job = GalleryJob(
+        server._generate_real_image,
+        lambda prompt, image_url: server._cache_image(prompt, image_url, args.cache_ttl),
+        Path(args.checkpoint),
+        concurrency=args.concurrency,
+        stop_at=stop_time(args.stop_at),
+        available=server._image_available,
+    )
+    try:
+        return await job.run(tasks)
+    finally:
+        await server.image_store.aclose()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Pre-generate portraits and age progressions for popular names")
+    parser.add_argument("--top", type=int, default=100, help="How many names from the top of the ranking")
+    parser.add_argument("--names", help="Ranked names, one per line or a CSV with a name column (default: bundled corpus by popularity)")
+    parser.add_argument("--description", action="append", required=True,
+                        help="Pre-generate for requests with exactly this description (repeatable)")
+    parser.add_argument("--ages", type=int, nargs="+", default=list(DEFAULT_AGES))
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("GALLERY_CONCURRENCY", "2")),
+                        help="Image generations in flight at once")
+    parser.add_argument("--stop-at", help="Local HH:MM after which no new generation starts, e.g. 06:00")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_PATH,
+                        help="Finished images; the server reads the default path back on cache misses")
+    parser.add_argument("--cache-ttl", type=int, default=GALLERY_CACHE_TTL_SECONDS,
+                        help="Seconds gallery images may stay in the shared cache (it can still evict them sooner)")
+    args = parser.parse_args()
+
+    stats = asyncio.run(run_gallery(args))
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,25 +4,49 @@ Real MCP Client - Direct interface to actual MCP image generation
 This module provides direct access to real MCP image generation services
 """
 
-import subprocess
+import asyncio
 import json
 import tempfile
 import logging
 
+from ai_agents.deadlines import RETRYABLE_STATUS, bounded, retry
+
 logger = logging.getLogger(__name__)
 
+# Per attempt; the request's deadline can shorten it
+GENERATION_TIMEOUT_SECONDS = 60
+
+
+class TransientGenerationError(RuntimeError):
+    """A generation that may succeed if tried again: the generator crashed or the service was overloaded"""
+
+
 class RealMCPImageGenerator:
     """Client for real MCP image generation service"""
 
     @staticmethod
     async def generate_image(prompt: str) -> str:
-        """Generate real AI image using actual MCP service"""
+        """Generate real AI image using actual MCP service, retrying transient failures"""
         try:
             logger.info(f"Calling real MCP image generation for: {prompt[:100]}...")
+            return await retry(
+                lambda: RealMCPImageGenerator._generate_once(prompt),
+                name="MCP image generation",
+                # Anything else (no URL, a rejected prompt) fails the same way every time
+                retryable=lambda e: isinstance(e, (asyncio.TimeoutError, TransientGenerationError))
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error calling real MCP service: {e}")
+            return None
 
-            # Create a Python script that can call the actual MCP service
-            # This will run in a subprocess with access to the MCP tools
-            mcp_script = f'''
+    @staticmethod
+    async def _generate_once(prompt: str) -> str:
+        """One generation attempt; raises on failure so it can be retried"""
+        # Create a Python script that can call the actual MCP service
+        # This will run in a subprocess with access to the MCP tools
+        mcp_script = f'''
 import sys
 import json
 import asyncio
@@ -57,7 +81,8 @@ async def generate_real_image():
         return True
 
     except Exception as e:
-        print(json.dumps({{"error": str(e)}}), file=sys.stderr)
+        # The service's HTTP status, when it has one, tells overload apart from a bad request
+        print(json.dumps({{"error": str(e), "status": getattr(e, "status_code", None)}}), file=sys.stderr)
         return False
 
 # Run the async function
@@ -66,35 +91,52 @@ if __name__ == "__main__":
     sys.exit(0 if result else 1)
 '''
 
-            # Execute the MCP script
-            result = subprocess.run(
-                ['python3', '-c', mcp_script],
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
-
-            if result.returncode == 0 and result.stdout:
-                try:
-                    response_data = json.loads(result.stdout)
-                    if 'url' in response_data:
-                        image_url = response_data['url']
-                        logger.info(f"Real MCP generated image: {image_url}")
-                        return image_url
-                except json.JSONDecodeError:
-                    logger.error("Failed to parse MCP response")
-
-            logger.error(f"MCP generation failed: {result.stderr}")
-            return None
+        # Execute the MCP script without blocking the event loop
+        proc = await asyncio.create_subprocess_exec(
+            'python3', '-c', mcp_script,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await bounded(proc.communicate(), GENERATION_TIMEOUT_SECONDS)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Don't leave orphaned generator processes behind
+            proc.kill()
+            await proc.wait()
+            raise
+        stdout = stdout.decode()
+        stderr = stderr.decode()
+
+        if proc.returncode == 0 and stdout:
+            try:
+                response_data = json.loads(stdout)
+                if 'url' in response_data:
+                    image_url = response_data['url']
+                    logger.info(f"Real MCP generated image: {image_url}")
+                    return image_url
+            except json.JSONDecodeError:
+                logger.error("Failed to parse MCP response")
+
+        raise RealMCPImageGenerator._failure(proc.returncode, stderr)
 
-        except Exception as e:
-            logger.error(f"Error calling real MCP service: {e}")
-            return None
+    @staticmethod
+    def _failure(returncode: int, stderr: str) -> RuntimeError:
+        """The error for a failed attempt, transient only if trying again could help"""
+        message = f"MCP generation failed: {stderr.strip() or 'no image URL returned'}"
+        if returncode < 0:
+            # Killed by a signal rather than exiting with an error
+            return TransientGenerationError(message)
+        try:
+            status = json.loads(stderr.strip().splitlines()[-1]).get("status")
+        except (IndexError, ValueError, AttributeError):
+            status = None
+        if status in RETRYABLE_STATUS:
+            return TransientGenerationError(message)
+        return RuntimeError(message)
 
     @staticmethod
     def generate_image_sync(prompt: str) -> str:
         """Synchronous version of image generation"""
-        import asyncio
         try:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
@@ -111,5 +153,4 @@ async def main():
     print(f"Generated: {url}")
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Request Deadline - Per-request deadlines and cancellation when the client goes away
+Each HTTP request gets a deadline from the X-Request-Timeout header (seconds) or its
+route's default; outbound calls made while handling it are bounded by what's left
+(see ai_agents.deadlines). The handler is cancelled when the deadline passes, answering
+504 if nothing was sent yet, and as soon as the client disconnects.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ai_agents.deadlines import deadline_scope
+from fast_json import FastJSONResponse
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_HEADER = "x-request-timeout"
+
+
+class DeadlineMiddleware:
+    """Bound every HTTP request by a deadline and cancel it if the client disconnects"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        default_seconds: float = 120,
+        route_seconds: Optional[Dict[str, float]] = None,
+        max_seconds: float = 600,
+    ):
+        self.app = app
+        self.default_seconds = default_seconds
+        # Longest matching path prefix wins
+        self.route_seconds = sorted((route_seconds or {}).items(), key=lambda item: -len(item[0]))
+        self.max_seconds = max_seconds
+
+    def seconds_for(self, path: str, header: Optional[str]) -> float:
+        seconds = next((seconds for prefix, seconds in self.route_seconds if path.startswith(prefix)), self.default_seconds)
+        if header:
+            try:
+                seconds = float(header)
+            except ValueError:
+                pass
+        return max(0.0, min(seconds, self.max_seconds))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        seconds = self.seconds_for(scope["path"], Headers(scope=scope).get(DEADLINE_HEADER))
+        state = {"started": False, "finished": False, "disconnected": False, "timed_out": False}
+        messages: asyncio.Queue = asyncio.Queue()
+
+        async def app_receive() -> Message:
+            if state["disconnected"] and messages.empty():
+                return {"type": "http.disconnect"}
+            return await messages.get()
+
+        async def app_send(message: Message):
+            if message["type"] == "http.response.start":
+                state["started"] = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                state["finished"] = True
+            await send(message)
+
+        with deadline_scope(seconds):
+            # The handler task copies the context, deadline included
+            handler = asyncio.create_task(self.app(scope, app_receive, app_send))
+
+        async def watch_client():
+            # Own the receive channel so a disconnect is seen even while the handler is busy
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    state["disconnected"] = True
+                    # After the response is sent this is just the connection closing
+                    if not state["finished"]:
+                        handler.cancel()
+                    return
+
+        def on_deadline():
+            if not state["finished"]:
+                state["timed_out"] = True
+                handler.cancel()
+
+        started = time.monotonic()
+        watcher = asyncio.create_task(watch_client())
+        timer = asyncio.get_running_loop().call_later(seconds, on_deadline)
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if state["disconnected"]:
+                logger.info(f"Client disconnected from {scope['path']} after {time.monotonic() - started:.1f}s, cancelled")
+            elif state["timed_out"]:
+                logger.warning(f"{scope['path']} exceeded its {seconds:.0f}s deadline, cancelled")
+                if not state["started"]:
+                    await FastJSONResponse({"detail": "Request deadline exceeded"}, status_code=504)(scope, receive, send)
+            else:
+                raise
+        finally:
+            timer.cancel()
+            watcher.cancel()
@@ -0,0 +1,36 @@
+"""
+Request Usage - Charge model calls to the endpoint and client that caused them
+Every HTTP request runs inside a usage scope naming its path and client: the X-Client-Id
+header when the caller sends one, else "anonymous" (addresses are never stored). Model calls made while handling it,
+including background work it starts, are recorded against that scope (see ai_agents.usage).
+"""
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ai_agents.usage import usage_scope
+
+CLIENT_HEADER = "x-client-id"
+ANONYMOUS_CLIENT = "anonymous"
+# Keeps a misbehaving client from filling the usage collection with huge ids
+MAX_CLIENT_ID_LENGTH = 64
+
+
+def client_id(scope: Scope) -> str:
+    header = Headers(scope=scope).get(CLIENT_HEADER, "").strip()
+    return header[:MAX_CLIENT_ID_LENGTH] or ANONYMOUS_CLIENT
+
+
+class UsageScopeMiddleware:
+    """Tag each HTTP request's model calls with its endpoint and client"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # Must wrap the deadline middleware: its handler task copies the context when created
+        with usage_scope(scope["path"], client_id(scope)):
+            await self.app(scope, receive, send)
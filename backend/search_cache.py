@@ -0,0 +1,195 @@
+"""
+Search Cache - TTL cache for /api/search with stale-while-revalidate
+Results are keyed by normalized query. A fresh entry is served as is. An entry past its TTL
+but inside the stale window is served immediately and refreshed in the background. Anything
+older is fetched inline, with concurrent requests for the same query sharing one fetch.
+Entries live in an in-process LRU backed by a Mongo collection shared by all workers.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from ai_agents.deadlines import bounded, clear_deadline
+
+logger = logging.getLogger(__name__)
+
+# Returns the Mongo collection, or None to cache in memory only
+CollectionGetter = Callable[[], Any]
+Fetch = Callable[[], Awaitable[dict]]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    # "  What's  new in AI? " and "what's new in ai" are the same search
+    return _WHITESPACE.sub(" ", query).strip().rstrip("?!.").strip().lower()
+
+
+class SearchCache:
+    """Two-tier search result cache; only successful results are stored"""
+
+    def __init__(
+        self,
+        collection: CollectionGetter,
+        ttl_seconds: float = 600,
+        stale_seconds: float = 3600,
+        max_entries: int = 1000,
+        timeout: float = 5.0,
+    ):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        # Per Mongo operation, shortened by the request's deadline
+        self.timeout = timeout
+        # key -> (value, fetched_at as a unix timestamp)
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._revalidating: Set[asyncio.Task] = set()
+        self._index_ready = False
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "shared_hits": 0,
+            "revalidations": 0,
+            "revalidation_failures": 0,
+        }
+
+    async def get(
+        self, query: str, variant: str, fetch: Fetch, max_age_seconds: Optional[float] = None
+    ) -> Tuple[dict, str]:
+        """(result, cache status) where status is "hit", "stale" or "miss"
+
+        max_age_seconds tightens freshness for one request: older entries are refetched
+        inline instead of being served stale (0 always fetches).
+        """
+        key = f"{normalize_query(query)}|{variant}"
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = await self._load_shared(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.time() - fetched_at
+            fresh_for = self.ttl_seconds if max_age_seconds is None else min(self.ttl_seconds, max_age_seconds)
+            if age <= fresh_for:
+                self._stats["hits"] += 1
+                self._entries.move_to_end(key)
+                return value, "hit"
+            if max_age_seconds is None and age <= self.ttl_seconds + self.stale_seconds:
+                self._stats["stale_hits"] += 1
+                self._revalidate(key, fetch)
+                return value, "stale"
+        self._stats["misses"] += 1
+        return await self._fetch(key, fetch), "miss"
+
+    def stats(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["stale_hits"] + self._stats["misses"]
+        served = self._stats["hits"] + self._stats["stale_hits"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "revalidating": len(self._revalidating),
+            "hit_rate": served / lookups if lookups else 0.0,
+        }
+
+    async def _fetch(self, key: str, fetch: Fetch) -> dict:
+        # Concurrent misses for one query share a single upstream call
+        future = self._inflight.get(key)
+        if future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The request that started the fetch went away, not this one: fetch for this one
+                if future.done() and not future.cancelled() and isinstance(future.exception(), asyncio.CancelledError):
+                    return await self._fetch(key, fetch)
+                raise
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+            await self._store(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _revalidate(self, key: str, fetch: Fetch):
+        if key in self._inflight:
+            return
+
+        async def refresh():
+            # Not bound by the deadline of the request that found the entry stale
+            clear_deadline()
+            self._stats["revalidations"] += 1
+            try:
+                await self._fetch(key, fetch)
+            except Exception as e:
+                # Keep serving the stale entry until it ages out
+                self._stats["revalidation_failures"] += 1
+                logger.warning(f"Background refresh of cached search failed: {e}")
+
+        task = asyncio.create_task(refresh())
+        self._revalidating.add(task)
+        task.add_done_callback(self._revalidating.discard)
+
+    def _remember(self, key: str, value: dict, fetched_at: float):
+        self._entries[key] = (value, fetched_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _store(self, key: str, value: dict):
+        fetched_at = time.time()
+        self._remember(key, value, fetched_at)
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            await self._ensure_index(collection)
+            expires_at = datetime.fromtimestamp(fetched_at + self.ttl_seconds + self.stale_seconds, timezone.utc)
+            await bounded(collection.replace_one(
+                {"_id": key},
+                {"_id": key, "value": value, "fetched_at": fetched_at, "expires_at": expires_at},
+                upsert=True
+            ), self.timeout)
+        except Exception as e:
+            logger.error(f"Failed to share cached search: {e}")
+
+    async def _load_shared(self, key: str) -> Optional[Tuple[dict, float]]:
+        collection = self._collection()
+        if collection is None:
+            return None
+        try:
+            document = await bounded(collection.find_one({"_id": key}), self.timeout)
+        except Exception as e:
+            logger.error(f"Failed to read shared search cache: {e}")
+            return None
+        if not document:
+            return None
+        self._stats["shared_hits"] += 1
+        self._remember(key, document["value"], document["fetched_at"])
+        return document["value"], document["fetched_at"]
+
+    async def _ensure_index(self, collection):
+        # Mongo drops entries once they're past the stale window
+        if not self._index_ready:
+            await bounded(collection.create_index("expires_at", expireAfterSeconds=0), self.timeout)
+            self._index_ready = True
+
+    def _collection(self):
+        try:
+            return self.collection()
+        except Exception as e:
+            logger.error(f"Shared search cache unavailable: {e}")
+            return None
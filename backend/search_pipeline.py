@@ -0,0 +1,233 @@
+"""
+Search Pipeline - Fan-out web search with map-reduce summarization for /api/search
+The query is expanded into sub-queries, which are searched concurrently through the MCP
+web-search tool, each call with its own timeout. Results are deduplicated by URL and
+ranked by reciprocal rank fusion, then summarized in parallel chunks that are reduced
+into one cited answer.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from ai_agents.deadlines import bounded
+
+logger = logging.getLogger(__name__)
+
+_URL = re.compile(r"https?://[^\s)\]>\"']+")
+_TRACKING_PARAMS = {"fbclid", "gclid", "ref"}
+# Reciprocal rank fusion constant; larger values flatten the rank weighting
+_RRF_K = 60
+
+
+@dataclass
+class SearchSource:
+    """One deduplicated web result"""
+    url: str
+    title: str = ""
+    snippet: str = ""
+    score: float = 0.0
+    queries: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {"url": self.url, "title": self.title, "snippet": self.snippet, "queries": self.queries}
+
+
+def normalize_url(url: str) -> str:
+    # Same page regardless of scheme, www., trailing slash, fragment or tracking parameters
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = urlencode([
+        (key, value) for key, value in parse_qsl(parts.query)
+        if not key.lower().startswith("utm_") and key.lower() not in _TRACKING_PARAMS
+    ])
+    return f"{host}{parts.path.rstrip('/')}" + (f"?{query}" if query else "")
+
+
+def parse_search_results(raw: str) -> List[Dict[str, str]]:
+    """Results as {"url", "title", "snippet"} from whatever the search tool returned"""
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        data = None
+
+    if isinstance(data, dict):
+        data = next((data[key] for key in ("results", "organic", "items", "data") if isinstance(data.get(key), list)), None)
+    if isinstance(data, list):
+        results = []
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            url = item.get("url") or item.get("link") or item.get("href")
+            if url:
+                results.append({
+                    "url": url,
+                    "title": item.get("title") or item.get("name") or "",
+                    "snippet": item.get("snippet") or item.get("content") or item.get("description") or "",
+                })
+        return results
+
+    # Plain text: one result per URL, with the text around it as the snippet
+    results = []
+    for match in _URL.finditer(raw or ""):
+        start = raw.rfind("\n", 0, match.start()) + 1
+        end = raw.find("\n\n", match.end())
+        snippet = raw[start:end if end != -1 else len(raw)].replace(match.group(), "").strip()
+        results.append({"url": match.group().rstrip(".,;"), "title": "", "snippet": snippet[:500]})
+    return results
+
+
+def rank_sources(results_by_query: Dict[str, List[Dict[str, str]]], max_results: int) -> List[SearchSource]:
+    """Deduplicate by URL and rank by reciprocal rank fusion across sub-queries"""
+    sources: Dict[str, SearchSource] = {}
+    for query, results in results_by_query.items():
+        for rank, result in enumerate(results):
+            key = normalize_url(result["url"])
+            source = sources.get(key)
+            if source is None:
+                source = sources[key] = SearchSource(url=result["url"])
+            source.score += 1 / (_RRF_K + rank + 1)
+            source.queries.append(query)
+            # Keep the most descriptive title and snippet seen for this page
+            if len(result.get("title", "")) > len(source.title):
+                source.title = result["title"]
+            if len(result.get("snippet", "")) > len(source.snippet):
+                source.snippet = result["snippet"]
+    return sorted(sources.values(), key=lambda source: -source.score)[:max_results]
+
+
+class SearchPipeline:
+    """Runs expand -> concurrent search -> rank -> map-reduce summary with a SearchAgent
+
+    The original query is searched while the expansion is still being written.
+    """
+
+    def __init__(self, agent, subqueries: int = 3, call_timeout: float = 10.0, chunk_size: int = 4):
+        self.agent = agent
+        self.subqueries = subqueries
+        self.call_timeout = call_timeout
+        self.chunk_size = chunk_size
+
+    async def run(self, query: str, max_results: int = 5) -> dict:
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+
+        try:
+            tool = await bounded(self.agent.search_tool(), self.call_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out loading the web search tool")
+            tool = None
+        if tool is None:
+            # No web search configured: plain model answer, as before
+            summary = await self.summarize(query, [])
+            timings["total_ms"] = (time.perf_counter() - started) * 1000
+            return {"summary": summary, "search_results": {"queries": [], "sources": [], "timings": timings}, "sources_count": 0}
+
+        # The original query doesn't need to wait for the expansion
+        original = asyncio.ensure_future(self.search_all([query], max_results))
+        queries = await self.expand(query)
+        timings["expand_ms"] = (time.perf_counter() - started) * 1000
+        expanded = await self.search_all(queries[1:], max_results)
+        results_by_query = {**await original, **expanded}
+        timings["search_ms"] = (time.perf_counter() - started) * 1000
+
+        sources = rank_sources(results_by_query, max_results)
+
+        step = time.perf_counter()
+        summary = await self.summarize(query, sources)
+        timings["summarize_ms"] = (time.perf_counter() - step) * 1000
+        timings["total_ms"] = (time.perf_counter() - started) * 1000
+
+        return {
+            "summary": summary,
+            "search_results": {
+                "queries": queries,
+                "sources": [source.to_dict() for source in sources],
+                "timings": timings,
+            },
+            "sources_count": len(sources),
+        }
+
+    async def expand(self, query: str) -> List[str]:
+        """The original query plus up to `subqueries` rephrasings covering other angles"""
+        if self.subqueries <= 0:
+            return [query]
+        prompt = (
+            f"Write {self.subqueries} different web search queries that together cover this question "
+            f"from different angles. One per line, no numbering or commentary.\n\nQuestion: {query}"
+        )
+        result = await self._complete(prompt, profile="search_expand")
+        lines = [line.strip().lstrip("-*0123456789.) ").strip('"') for line in (result or "").splitlines()]
+        queries = [query]
+        for line in lines:
+            if line and line.lower() not in {existing.lower() for existing in queries}:
+                queries.append(line)
+        return queries[:self.subqueries + 1]
+
+    async def search_all(self, queries: List[str], max_results: int) -> Dict[str, List[Dict[str, str]]]:
+        """Search every query concurrently; a failed or slow call just contributes nothing"""
+        async def search(query: str) -> List[Dict[str, str]]:
+            try:
+                raw = await bounded(self.agent.web_search(query, max_results), self.call_timeout)
+                return parse_search_results(raw)
+            except asyncio.TimeoutError:
+                logger.warning(f"Web search timed out after {self.call_timeout}s: {query}")
+            except Exception as e:
+                logger.warning(f"Web search failed for {query!r}: {e}")
+            return []
+
+        results = await asyncio.gather(*(search(query) for query in queries))
+        return dict(zip(queries, results))
+
+    async def summarize(self, query: str, sources: List[SearchSource]) -> str:
+        """Map: notes per chunk of sources in parallel. Reduce: one answer from the notes"""
+        if not sources:
+            # Nothing found; answer from the model alone like the single-prompt path did
+            return await self._complete(
+                f"Search for information about: {query}. Provide a comprehensive summary with key findings.",
+                raise_on_error=True
+            )
+
+        numbered = [f"[{index}] {source.title}\n{source.url}\n{source.snippet}" for index, source in enumerate(sources, 1)]
+        chunks = [numbered[start:start + self.chunk_size] for start in range(0, len(numbered), self.chunk_size)]
+        answer_instructions = (
+            "Cite sources inline with their [number]. Only use information from the sources."
+        )
+        if len(chunks) == 1:
+            return await self._complete(
+                f"Answer the question using these search results. {answer_instructions}\n\n"
+                f"Question: {query}\n\nSearch results:\n\n" + "\n\n".join(chunks[0]),
+                raise_on_error=True
+            )
+
+        notes = await asyncio.gather(*(
+            self._complete(
+                f"Extract the facts relevant to the question from these search results, as short bullet "
+                f"points. {answer_instructions}\n\nQuestion: {query}\n\nSearch results:\n\n" + "\n\n".join(chunk),
+                profile="search_notes"
+            )
+            for chunk in chunks
+        ))
+        notes = [note for note in notes if note]
+        if not notes:
+            raise RuntimeError("Failed to summarize search results")
+        return await self._complete(
+            f"Write a comprehensive answer to the question from these research notes, keeping their [number] "
+            f"citations. Merge duplicates and note disagreements.\n\nQuestion: {query}\n\nNotes:\n\n" + "\n\n".join(notes),
+            raise_on_error=True
+        )
+
+    async def _complete(self, prompt: str, raise_on_error: bool = False, profile: Optional[str] = None) -> Optional[str]:
+        # Small steps (query expansion, notes) use faster profiles than the final answer
+        result = await self.agent.execute(prompt, use_tools=False, profile=profile)
+        if result.success:
+            return result.content
+        if raise_on_error:
+            raise RuntimeError(result.error)
+        logger.warning(f"Search pipeline step failed: {result.error}")
+        return None
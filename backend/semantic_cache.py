@@ -0,0 +1,140 @@
+"""
+Semantic Cache - Reuse answers for paraphrased requests
+Texts are embedded locally as hashed word and character n-gram vectors (no model download,
+no network) and kept in a fixed-size NumPy matrix. A lookup is one matrix-vector product:
+the most similar earlier text above the threshold, with the same variant, is a near hit.
+Entries are evicted least recently used first.
+"""
+
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "for", "with", "who", "that", "which", "is", "are", "be",
+    "to", "in", "on", "at", "by", "from", "about", "my", "our", "i", "we", "me", "us", "some", "something", "like", "loves",
+    "love", "really", "very", "please", "name", "names", "want", "looking",
+    # Words nearly every name request uses
+    "kid", "kids", "child", "children", "baby", "babies", "inspired", "sounding", "feel", "vibe", "style",
+}
+# Domain synonyms folded together before hashing
+_SYNONYMS = {
+    "ocean": "sea", "oceans": "sea", "marine": "sea", "happy": "cheerful", "joyful": "cheerful",
+    "smiley": "smile", "smiling": "smile", "nature": "outdoors", "outdoorsy": "outdoors",
+    "adventurous": "adventure", "brave": "courage", "courageous": "courage", "peaceful": "calm",
+    "serene": "calm", "tranquil": "calm", "daughter": "girl", "son": "boy", "timeless": "classic",
+    "traditional": "classic", "uncommon": "unique", "rare": "unique", "unusual": "unique",
+}
+_SUFFIXES = ("ing", "ed", "ly", "s", "y", "e")
+
+
+def _stem(word: str) -> str:
+    # Crude, but "outdoorsy"/"outdoors" and "smiled"/"smile" land on the same stem
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            word = word[:-len(suffix)]
+    return word
+
+
+def embed(text: str, dim: int = 1024) -> np.ndarray:
+    """Unit-length signed feature-hashing vector of word stems and their character trigrams"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in _WORD.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        stem = _stem(_SYNONYMS.get(word, word))
+        features = [("w:" + stem, 1.0)]
+        padded = f" {stem} "
+        trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+        # Trigrams share the word's weight so long words don't dominate
+        features += [("c:" + gram, 1.0 / len(trigrams)) for gram in trigrams]
+        for feature, weight in features:
+            h = zlib.crc32(feature.encode())
+            vector[h % dim] += weight if h & 0x80000000 else -weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """Bounded nearest-neighbour cache over text embeddings"""
+
+    def __init__(self, threshold: float = 0.85, max_entries: int = 2000, ttl_seconds: float = 3600, dim: int = 1024):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.dim = dim
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        # Variant id per slot, -1 for free slots, so masked-out rows never match
+        self._variants = np.full(max_entries, -1, dtype=np.int32)
+        self._variant_ids: Dict[str, int] = {}
+        # slot -> (text, value, stored_at), least recently used first
+        self._entries: "OrderedDict[int, Tuple[str, Any, float]]" = OrderedDict()
+        self._slots: Dict[Tuple[int, str], int] = {}
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._stats = {"lookups": 0, "exact_hits": 0, "near_hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, text: str, variant: str = "") -> Optional[Tuple[Any, float]]:
+        """(value, similarity) of the closest earlier text above the threshold, else None"""
+        self._stats["lookups"] += 1
+        variant_id = self._variant_ids.get(variant)
+        if variant_id is None or not self._entries:
+            self._stats["misses"] += 1
+            return None
+
+        similarities = self._vectors @ embed(text, self.dim)
+        similarities[self._variants != variant_id] = -1
+        slot = int(np.argmax(similarities))
+        similarity = float(similarities[slot])
+        if similarity < self.threshold:
+            self._stats["misses"] += 1
+            return None
+
+        stored_text, value, stored_at = self._entries[slot]
+        if time.time() - stored_at > self.ttl_seconds:
+            self._release(slot)
+            self._stats["misses"] += 1
+            return None
+        self._entries.move_to_end(slot)
+        self._stats["exact_hits" if stored_text == text else "near_hits"] += 1
+        return value, similarity
+
+    def put(self, text: str, value: Any, variant: str = ""):
+        variant_id = self._variant_ids.setdefault(variant, len(self._variant_ids))
+        vector = embed(text, self.dim)
+
+        # A repeat of a stored text replaces it instead of taking a second slot
+        if (variant_id, text) in self._slots:
+            self._release(self._slots[variant_id, text])
+        if not self._free:
+            oldest = next(iter(self._entries))
+            self._release(oldest)
+            self._stats["evictions"] += 1
+
+        slot = self._free.pop()
+        self._vectors[slot] = vector
+        self._variants[slot] = variant_id
+        self._entries[slot] = (text, value, time.time())
+        self._slots[variant_id, text] = slot
+
+    def stats(self) -> dict:
+        hits = self._stats["exact_hits"] + self._stats["near_hits"]
+        lookups = self._stats["lookups"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "near_hit_rate": self._stats["near_hits"] / lookups if lookups else 0.0,
+        }
+
+    def _release(self, slot: int):
+        text = self._entries.pop(slot)[0]
+        del self._slots[int(self._variants[slot]), text]
+        self._vectors[slot] = 0
+        self._variants[slot] = -1
+        self._free.append(slot)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Production server entrypoint - pre-fork multi-process uvicorn
+The app is imported once in the master and forked into workers; each worker drops
+inherited connection pools (see server._reinit_after_fork) and is recycled after
+a number of requests or once it grows past a memory threshold
+
+Usage: python serve.py --workers 4 --port 8001
+"""
+
+import argparse
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional
+
+import uvicorn
+
+logger = logging.getLogger("serve")
+
+
+def _module_available(name: str) -> bool:
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
+
+
+def _rss_bytes() -> Optional[int]:
+    # Current resident set size; None where /proc isn't available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def worker_max_requests(max_requests: int, jitter: int) -> Optional[int]:
+    """Requests a worker serves before recycling, None for no limit"""
+    if max_requests <= 0:
+        return None
+    # Jitter so workers started together don't all recycle together
+    return max_requests + random.randint(0, max(jitter, 0))
+
+
+class RecyclingServer(uvicorn.Server):
+    """uvicorn server that shuts down gracefully once RSS passes max_memory_bytes"""
+
+    def __init__(self, config: uvicorn.Config, max_memory_bytes: Optional[int] = None):
+        super().__init__(config)
+        self.max_memory_bytes = max_memory_bytes
+
+    def over_memory_limit(self, counter: int) -> Optional[int]:
+        """RSS in bytes when it's time to recycle, else None"""
+        # Ticks are 100ms apart, check memory every 5s
+        if not self.max_memory_bytes or counter % 50 != 0 or self.should_exit:
+            return None
+        rss = _rss_bytes()
+        return rss if rss is not None and rss > self.max_memory_bytes else None
+
+    async def on_tick(self, counter: int) -> bool:
+        rss = self.over_memory_limit(counter)
+        if rss is not None:
+            logger.info(f"Worker {os.getpid()} RSS {rss // 2**20}MB over limit, recycling")
+            self.should_exit = True
+        return await super().on_tick(counter)
+
+
+class Master:
+    """Pre-fork process manager: spawns, replaces and drains workers"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.workers: Dict[int, float] = {}
+        self.sock: Optional[socket.socket] = None
+        self.app = None
+        self.shutting_down = False
+
+    def run(self):
+        self.sock = self._bind()
+
+        # Preload the app and its heavy dependencies once so workers share them copy-on-write
+        import server
+        server.preload()
+        self.app = server.app
+
+        signal.signal(signal.SIGTERM, self._handle_shutdown)
+        signal.signal(signal.SIGINT, self._handle_shutdown)
+
+        loop_impl = "uvloop" if self.args.uvloop and _module_available("uvloop") else "asyncio"
+        http_impl = "httptools" if self.args.httptools and _module_available("httptools") else "h11"
+        logger.info(
+            f"Master {os.getpid()} listening on {self.args.host}:{self.args.port} "
+            f"with {self.args.workers} workers ({loop_impl}, {http_impl})"
+        )
+        self.loop_impl, self.http_impl = loop_impl, http_impl
+
+        for _ in range(self.args.workers):
+            self._spawn()
+        self._supervise()
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET6 if ":" in self.args.host else socket.AF_INET)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.args.host, self.args.port))
+        sock.listen(self.args.backlog)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self.workers[pid] = time.monotonic()
+
+    def _run_worker(self):
+        # Child process: never returns
+        exit_code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            random.seed()
+
+            config = uvicorn.Config(
+                self.app,
+                loop=self.loop_impl,
+                http=self.http_impl,
+                lifespan="on",
+                limit_max_requests=worker_max_requests(self.args.max_requests, self.args.max_requests_jitter),
+                timeout_graceful_shutdown=self.args.graceful_timeout,
+                timeout_keep_alive=self.args.keep_alive,
+                access_log=self.args.access_log,
+            )
+            max_memory = self.args.max_memory_mb * 2**20 if self.args.max_memory_mb > 0 else None
+            RecyclingServer(config, max_memory_bytes=max_memory).run(sockets=[self.sock])
+        except Exception:
+            logger.exception(f"Worker {os.getpid()} crashed")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def _supervise(self):
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            if self.shutting_down:
+                continue
+
+            exit_code = os.waitstatus_to_exitcode(status)
+            logger.info(f"Worker {pid} exited ({exit_code}) after {time.monotonic() - started:.0f}s, replacing")
+            if exit_code != 0 and time.monotonic() - started < 1:
+                # Crashing on boot: back off instead of fork-bombing
+                time.sleep(1)
+            self._spawn()
+
+        logger.info("All workers stopped")
+
+    def _handle_shutdown(self, signum, frame):
+        if self.shutting_down:
+            return
+        self.shutting_down = True
+        logger.info(f"Received {signal.Signals(signum).name}, draining {len(self.workers)} workers")
+        # Workers stop accepting, finish in-flight requests and run shutdown hooks
+        for pid in list(self.workers):
+            self._signal_worker(pid, signal.SIGTERM)
+
+        # Hard stop for anything still running after the graceful timeout
+        def force_kill(signum, frame):
+            for pid in list(self.workers):
+                logger.warning(f"Worker {pid} did not drain in time, killing")
+                self._signal_worker(pid, signal.SIGKILL)
+
+        signal.signal(signal.SIGALRM, force_kill)
+        signal.alarm(self.args.graceful_timeout + 5)
+
+    @staticmethod
+    def _signal_worker(pid: int, sig: int):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description="Run the API with multiple pre-forked uvicorn workers")
+    parser.add_argument("--host", default=env("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(env("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(env("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--uvloop", action=argparse.BooleanOptionalAction, default=True,
+                        help="Use uvloop when installed")
+    parser.add_argument("--httptools", action=argparse.BooleanOptionalAction, default=True,
+                        help="Use httptools when installed")
+    parser.add_argument("--max-requests", type=int, default=int(env("MAX_REQUESTS", "0")),
+                        help="Recycle a worker after this many requests (0 = never)")
+    parser.add_argument("--max-requests-jitter", type=int, default=int(env("MAX_REQUESTS_JITTER", "0")))
+    parser.add_argument("--max-memory-mb", type=int, default=int(env("MAX_WORKER_MEMORY_MB", "0")),
+                        help="Recycle a worker once its RSS passes this (0 = never)")
+    parser.add_argument("--graceful-timeout", type=int, default=int(env("GRACEFUL_TIMEOUT", "30")),
+                        help="Seconds a worker gets to drain in-flight requests on shutdown")
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--access-log", action=argparse.BooleanOptionalAction, default=False)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    args = parse_args(argv)
+    if args.workers < 1:
+        sys.exit("--workers must be at least 1")
+    Master(args).run()
+
+
+if __name__ == "__main__":
+    main()
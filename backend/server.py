@@ -1,37 +1,149 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from dotenv import load_dotenv
+from fastapi import FastAPI, APIRouter, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional
+import asyncio
+import time
 import uuid
-from datetime import datetime
-
-# AI agents
-from ai_agents.agents import AgentConfig, SearchAgent, ChatAgent, ImageAgent
-import httpx
+from datetime import datetime, timezone
+
+# AI agents (cheap to import, LangChain loads on first use or during warmup)
+from ai_agents.agents import AgentConfig, AgentResponse, SearchAgent, ChatAgent, ImageAgent, get_response_cache, load_env, warmup as warmup_agents
+from image_jobs import ImageJobStore
+from speculative_images import SpeculativeImagePrefetcher
+from image_store import ImageStore, FORMATS, VARIANTS
+from image_serving import image_file_response
+from image_grid import build_grid_prompt, slice_grid
+from fast_json import FastJSONResponse, fast_response
+from compression import CompressionMiddleware
+from shared_cache import SharedCache, default_cache_path
+from cache_snapshot import CacheSnapshotter
+from chat_memory import ChatMemory
+from search_cache import SearchCache
+from search_pipeline import SearchPipeline
+from request_deadline import DeadlineMiddleware
+from name_batcher import NameBatcher, name_prompt
+from idempotency import IdempotencyConflict, IdempotencyStore
+from generation_history import GenerationHistory, KINDS as HISTORY_KINDS
+from portrait_gallery import DEFAULT_CHECKPOINT_PATH as GALLERY_CHECKPOINT_PATH, GALLERY_CACHE_TTL_SECONDS, GalleryIndex
+from ai_agents.deadlines import bounded, clear_deadline
+from ai_agents.usage import GROUP_FIELDS, UsageRecorder, totals_by_key
+from request_usage import MAX_CLIENT_ID_LENGTH, UsageScopeMiddleware
 import json
 
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+    from name_corpus import NameCandidate, NameQuery
+    from semantic_cache import SemanticCache
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+ROOT_DIR = Path(__file__).parent
+load_env()
+
+# MongoDB, the client is created on first use
+client: Optional["AsyncIOMotorClient"] = None
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "true").lower() == "true"
+MONGO_TIMEOUT_SECONDS = float(os.environ.get("MONGO_TIMEOUT_SECONDS", "5"))
+
+# Tokens, latency and estimated cost of every model call, per endpoint and client
+usage_recorder = UsageRecorder(
+    lambda: get_db().llm_usage,
+    flush_seconds=float(os.environ.get("USAGE_FLUSH_SECONDS", "5")),
+    max_batch=int(os.environ.get("USAGE_BATCH_SIZE", "500")),
+    max_queue=int(os.environ.get("USAGE_MAX_QUEUED", "10000")),
+    retention_days=float(os.environ.get("USAGE_RETENTION_DAYS", "30")),
+    timeout=MONGO_TIMEOUT_SECONDS
+)
 
 # AI agents init
-agent_config = AgentConfig()
+agent_config = AgentConfig(usage_recorder=usage_recorder)
 search_agent: Optional[SearchAgent] = None
 chat_agent: Optional[ChatAgent] = None
 image_agent: Optional[ImageAgent] = None
 
+# Image generation
+DEFAULT_IMAGE_LATENCY_BUDGET_MS = int(os.environ.get("IMAGE_LATENCY_BUDGET_MS", "0"))  # 0 = wait for completion
+image_jobs = ImageJobStore(
+    ttl_seconds=int(os.environ.get("IMAGE_JOB_TTL_SECONDS", "900")),
+    max_pending=int(os.environ.get("IMAGE_JOB_MAX_PENDING", "100"))
+)
+speculative_images = SpeculativeImagePrefetcher(
+    image_jobs,
+    top_k=int(os.environ.get("SPECULATIVE_IMAGE_TOP_K", "0")),  # 0 = speculative prefetch disabled
+    ttl_seconds=int(os.environ.get("SPECULATIVE_IMAGE_TTL_SECONDS", "300"))
+)
+image_store = ImageStore(Path(os.environ.get("IMAGE_STORE_DIR", ROOT_DIR / "image_store")))
+# Images the off-peak portrait gallery job finished, looked up when the shared cache misses
+gallery_index = GalleryIndex(Path(GALLERY_CHECKPOINT_PATH))
+PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL", "")  # Prefix for locally served image URLs, relative if unset
+SERVE_IMAGES_LOCALLY = os.environ.get("SERVE_IMAGES_LOCALLY", "true").lower() == "true"
+# Bundled placeholder portrait, copied into the image store the first time it's needed
+FALLBACK_IMAGE_PATH = ROOT_DIR / "static" / "fallback_portrait.png"
+fallback_image_url: Optional[str] = None
+AGE_PROGRESSION_GRID = os.environ.get("AGE_PROGRESSION_GRID", "false").lower() == "true"
+CHAT_SUMMARY_MAX_WORDS = int(os.environ.get("CHAT_SUMMARY_MAX_WORDS", "200"))
+SEARCH_SUBQUERIES = int(os.environ.get("SEARCH_SUBQUERIES", "3"))
+SEARCH_CALL_TIMEOUT_SECONDS = float(os.environ.get("SEARCH_CALL_TIMEOUT_SECONDS", "10"))
+SEARCH_SUMMARY_CHUNK_SIZE = int(os.environ.get("SEARCH_SUMMARY_CHUNK_SIZE", "4"))
+
+# Name suggestions: "llm" generates freely, "index" answers from the bundled corpus, "rerank" lets
+# the LLM pick from the corpus' best candidates, "auto" picks per description (index modes are opt-in)
+NAME_GENERATION_MODES = ("auto", "index", "rerank", "llm")
+NAME_GENERATION_MODE = os.environ.get("NAME_GENERATION_MODE", "llm")
+NAME_RERANK_CANDIDATES = int(os.environ.get("NAME_RERANK_CANDIDATES", "15"))
+# Micro-batch concurrent LLM name requests into one call (0 ms = one call per request)
+NAME_BATCH_WINDOW_MS = float(os.environ.get("NAME_BATCH_WINDOW_MS", "0"))
+NAME_BATCH_MAX_ITEMS = int(os.environ.get("NAME_BATCH_MAX_ITEMS", "8"))
+
+# Request deadlines: X-Request-Timeout header, else the longest matching route prefix, else the default
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("REQUEST_TIMEOUT_SECONDS", "120"))
+ROUTE_TIMEOUT_SECONDS = {
+    "/api/chat": 60,
+    "/api/search": 60,
+    "/api/generate-name": 45,
+    "/api/generate-image": 90,
+    "/api/generate-age-progression": 180,
+    "/api/generate-pipeline": 300,
+    "/api/images": 30,
+    "/api/names": 5,
+    "/api/usage": 30,
+    "/api/history": 30,
+}
+
+# Generation results shared by every worker on this host
+NAME_CACHE_TTL_SECONDS = int(os.environ.get("NAME_CACHE_TTL_SECONDS", "3600"))
+# Paraphrased name requests, per worker (0 entries disables)
+NAME_SEMANTIC_CACHE_SIZE = int(os.environ.get("NAME_SEMANTIC_CACHE_SIZE", "2000"))
+NAME_SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("NAME_SEMANTIC_CACHE_THRESHOLD", "0.85"))
+name_semantic_cache: Optional["SemanticCache"] = None
+IMAGE_CACHE_TTL_SECONDS = int(os.environ.get("IMAGE_CACHE_TTL_SECONDS", "86400"))
+CAPABILITIES_CACHE_TTL_SECONDS = int(os.environ.get("CAPABILITIES_CACHE_TTL_SECONDS", "3600"))
+try:
+    shared_cache: Optional[SharedCache] = SharedCache(
+        Path(os.environ.get("SHARED_CACHE_PATH", default_cache_path())),
+        slots=int(os.environ.get("SHARED_CACHE_SLOTS", "16384"))
+    )
+except OSError as e:
+    logging.getLogger(__name__).error(f"Shared cache unavailable, caching disabled: {e}")
+    shared_cache = None
+
+# Snapshot the shared cache to disk so a deploy doesn't start cold (0 = only on shutdown)
+CACHE_SNAPSHOT_PATH = os.environ.get("CACHE_SNAPSHOT_PATH", str(ROOT_DIR / "cache_snapshots" / "shared_cache.snap.gz"))
+cache_snapshotter = CacheSnapshotter(
+    shared_cache, Path(CACHE_SNAPSHOT_PATH),
+    interval_seconds=int(os.environ.get("CACHE_SNAPSHOT_INTERVAL_SECONDS", "300"))
+) if shared_cache is not None and CACHE_SNAPSHOT_PATH else None
+
 # Main app
-app = FastAPI(title="AI Agents API", description="Minimal AI Agents API with LangGraph and MCP support")
+app = FastAPI(
+    title="AI Agents API",
+    description="Minimal AI Agents API with LangGraph and MCP support",
+    default_response_class=FastJSONResponse
+)
 
 # API router
 api_router = APIRouter(prefix="/api")
@@ -52,6 +164,7 @@ class ChatRequest(BaseModel):
     message: str
     agent_type: str = "chat"  # "chat" or "search"
     context: Optional[dict] = None
+    session_id: Optional[str] = None  # Keep conversation history server-side under this id, per X-Client-Id
 
 
 class ChatResponse(BaseModel):
@@ -60,12 +173,14 @@ class ChatResponse(BaseModel):
     agent_type: str
     capabilities: List[str]
     metadata: dict = Field(default_factory=dict)
+    session_id: Optional[str] = None
     error: Optional[str] = None
 
 
 class SearchRequest(BaseModel):
     query: str
     max_results: int = 5
+    max_age_seconds: Optional[int] = None  # Refetch cached results older than this (0 = always fetch)
 
 
 class SearchResponse(BaseModel):
@@ -74,38 +189,85 @@ class SearchResponse(BaseModel):
     summary: str
     search_results: Optional[dict] = None
     sources_count: int
+    cache_status: Optional[str] = None  # "hit", "stale" or "miss"
     error: Optional[str] = None
 
 
 # Child Name Generator Models
 class NameGenerationRequest(BaseModel):
     description: str  # Free-form text describing the kind of name they want
+    use_cache: bool = True  # False asks for a fresh set of names
+    mode: Optional[str] = None  # "llm", "auto", "index" or "rerank", NAME_GENERATION_MODE if unset
+    session_id: Optional[str] = None  # Groups results in the caller's generation history
 
 class NameGenerationResponse(BaseModel):
     success: bool
     suggested_names: List[str]
     explanation: str
+    source: Optional[str] = None  # "index", "rerank" or "llm"
+    error: Optional[str] = None
+
+class NameSuggestion(BaseModel):
+    name: str
+    gender: str  # "F", "M" or "U"
+    origins: List[str]
+    meaning: str
+    popularity: float
+    syllables: int
+
+class NameSuggestionResponse(BaseModel):
+    success: bool
+    suggestions: List[NameSuggestion]
     error: Optional[str] = None
 
 class ImageGenerationRequest(BaseModel):
     child_name: str
     description: Optional[str] = None
+    latency_budget_ms: Optional[int] = None  # Return a placeholder if generation takes longer
+    session_id: Optional[str] = None
 
 class ImageGenerationResponse(BaseModel):
     success: bool
     image_url: str
+    pending: bool = False  # True when image_url is a placeholder and job_token can fetch the real image
+    job_token: Optional[str] = None
+    error: Optional[str] = None
+
+class ImageJobResponse(BaseModel):
+    success: bool
+    token: str
+    status: str  # "pending", "done" or "failed"
+    image_url: Optional[str] = None
     error: Optional[str] = None
 
 class AgeProgressionRequest(BaseModel):
     base_image_prompt: str
     child_name: str
     ages: List[int] = [3, 6, 10, 15, 18]
+    grid: Optional[bool] = None  # One composite generation sliced per age, defaults to AGE_PROGRESSION_GRID
+    session_id: Optional[str] = None
 
 class AgeProgressionResponse(BaseModel):
     success: bool
     age_progression_images: List[dict]  # [{age: int, image_url: str}]
     error: Optional[str] = None
 
+class PipelineRequest(BaseModel):
+    description: str
+    child_name: Optional[str] = None  # Skip name generation and use this name
+    name_index: int = 0  # Which suggested name to visualize when child_name is not given
+    ages: List[int] = [3, 6, 10, 15, 18]
+    include_age_progression: bool = True
+    grid: Optional[bool] = None  # Age progression as one composite generation, defaults to AGE_PROGRESSION_GRID
+    latency_budget_ms: Optional[int] = None  # Passed to the portrait stage
+    session_id: Optional[str] = None
+
+class HistoryResponse(BaseModel):
+    success: bool
+    items: List[dict]  # {id, kind, created_at, ...requested fields}, newest first
+    next_cursor: Optional[str] = None  # Pass back as cursor for the next page, None on the last one
+    error: Optional[str] = None
+
 # Routes
 @api_router.get("/")
 async def root():
@@ -115,20 +277,52 @@ async def root():
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
-    return status_obj
+    _ = await bounded(get_db().status_checks.insert_one(status_obj.dict()), MONGO_TIMEOUT_SECONDS)
+    return fast_response(status_obj)
 
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+    # Documents are written by create_status_check, so project and serialize them as-is
+    status_checks = await bounded(get_db().status_checks.find(
+        {}, {"_id": 0, "id": 1, "client_name": 1, "timestamp": 1}
+    ).to_list(1000), MONGO_TIMEOUT_SECONDS)
+    return FastJSONResponse(status_checks)
+
+
+async def _summarize_chat(summary: str, turns: List[dict]) -> str:
+    # Fold older chat turns into the session's running summary
+    global chat_agent
+    if chat_agent is None:
+        chat_agent = ChatAgent(agent_config)
+    transcript = "\n".join(f"{turn['role'].capitalize()}: {turn['content']}" for turn in turns)
+    prompt = (
+        "Update the running summary of a conversation with the new turns below. Keep names, facts, "
+        "preferences, decisions and open questions; drop small talk. Reply with the summary only, "
+        f"under {CHAT_SUMMARY_MAX_WORDS} words.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"
+    )
+    result = await chat_agent.execute(prompt, use_tools=False, profile="chat_summary")
+    if not result.success:
+        raise RuntimeError(result.error)
+    return result.content
+
+
+# Chat history per session_id, Mongo-backed with a hot tier in each worker
+chat_memory = ChatMemory(
+    lambda: get_db().chat_sessions,
+    _summarize_chat,
+    token_budget=int(os.environ.get("CHAT_HISTORY_TOKEN_BUDGET", "2000")),
+    max_hot_sessions=int(os.environ.get("CHAT_HOT_SESSIONS", "1000")),
+    timeout=MONGO_TIMEOUT_SECONDS
+)
 
 
 # AI agent routes
 @api_router.post("/chat", response_model=ChatResponse)
-async def chat_with_agent(request: ChatRequest):
+async def chat_with_agent(request: ChatRequest, x_client_id: Optional[str] = Header(None)):
     # Chat with AI agent
     global search_agent, chat_agent
+    session_key = _chat_session_key(x_client_id, request.session_id) if request.session_id else None
     
     try:
         # Init agents if needed
@@ -144,79 +338,135 @@ async def chat_with_agent(request: ChatRequest):
         if agent is None:
             raise HTTPException(status_code=500, detail="Failed to initialize agent")
         
-        # Execute agent
-        response = await agent.execute(request.message)
-        
-        return ChatResponse(
+        # Execute agent, with the session's history if there is one
+        session = await chat_memory.load(session_key) if session_key else None
+        history = session.history() if session else None
+        response = await agent.execute(request.message, history=history)
+
+        metadata = response.metadata
+        if session and response.success:
+            session = await chat_memory.append(session_key, request.message, response.content)
+            metadata = {**metadata, "history_tokens": session.tokens(), "summarized_turns": session.summarized_turns}
+
+        return fast_response(ChatResponse(
             success=response.success,
             response=response.content,
             agent_type=request.agent_type,
             capabilities=agent.get_capabilities(),
-            metadata=response.metadata,
+            metadata=metadata,
+            session_id=request.session_id,
             error=response.error
-        )
+        ))
         
     except Exception as e:
         logger.error(f"Error in chat endpoint: {e}")
-        return ChatResponse(
+        return fast_response(ChatResponse(
             success=False,
             response="",
             agent_type=request.agent_type,
             capabilities=[],
             error=str(e)
-        )
+        ))
+
+
+@api_router.delete("/chat/sessions/{session_id}")
+async def delete_chat_session(session_id: str, x_client_id: Optional[str] = Header(None)):
+    """Forget one of this client's chat sessions"""
+    await chat_memory.delete(_chat_session_key(x_client_id, session_id))
+    return {"success": True}
+
+
+def _chat_session_key(header: Optional[str], session_id: str) -> str:
+    # Sessions belong to the client that started them, like generation history
+    client = _history_client(header)
+    if client is None:
+        raise HTTPException(status_code=400, detail="X-Client-Id header is required for chat sessions")
+    return f"{client}:{session_id}"
+
+
+# Idempotency-Key records for the generation endpoints; the lease outlasts the longest route deadline
+idempotency_store = IdempotencyStore(
+    lambda: get_db().idempotency_keys,
+    ttl_seconds=int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400")),
+    lease_seconds=int(os.environ.get("IDEMPOTENCY_LEASE_SECONDS", "300")),
+    timeout=MONGO_TIMEOUT_SECONDS
+)
+
+# Generation results per X-Client-Id, written in batches off the request path
+generation_history = GenerationHistory(
+    lambda: get_db().generation_history,
+    flush_seconds=float(os.environ.get("GENERATION_HISTORY_FLUSH_SECONDS", "1")),
+    max_batch=int(os.environ.get("GENERATION_HISTORY_BATCH_SIZE", "200")),
+    retention_days=float(os.environ.get("GENERATION_HISTORY_RETENTION_DAYS", "90")),
+    timeout=MONGO_TIMEOUT_SECONDS
+)
+# Portraits finishing in the background, saved to the history when done
+_history_tasks = set()
+
+# Search results shared by every worker through Mongo, served stale while they refresh
+search_cache = SearchCache(
+    lambda: get_db().search_cache,
+    ttl_seconds=int(os.environ.get("SEARCH_CACHE_TTL_SECONDS", "600")),
+    stale_seconds=int(os.environ.get("SEARCH_CACHE_STALE_SECONDS", "3600")),
+    max_entries=int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "1000")),
+    timeout=MONGO_TIMEOUT_SECONDS
+)
+
+
+async def _run_search(query: str, max_results: int) -> dict:
+    # Fan out sub-queries, rank the sources and summarize; failures raise so they are never cached
+    global search_agent
+    if search_agent is None:
+        search_agent = SearchAgent(agent_config)
+
+    pipeline = SearchPipeline(
+        search_agent,
+        subqueries=SEARCH_SUBQUERIES,
+        call_timeout=SEARCH_CALL_TIMEOUT_SECONDS,
+        chunk_size=SEARCH_SUMMARY_CHUNK_SIZE
+    )
+    return await pipeline.run(query, max_results)
 
 
 @api_router.post("/search", response_model=SearchResponse)
 async def search_and_summarize(request: SearchRequest):
     # Web search with AI summary
-    global search_agent
-    
     try:
-        # Init search agent if needed
-        if search_agent is None:
-            search_agent = SearchAgent(agent_config)
-        
-        # Search with agent
-        search_prompt = f"Search for information about: {request.query}. Provide a comprehensive summary with key findings."
-        result = await search_agent.execute(search_prompt, use_tools=True)
-        
-        if result.success:
-            return SearchResponse(
-                success=True,
-                query=request.query,
-                summary=result.content,
-                search_results=result.metadata,
-                sources_count=result.metadata.get("tools_used", 0)
-            )
-        else:
-            return SearchResponse(
-                success=False,
-                query=request.query,
-                summary="",
-                sources_count=0,
-                error=result.error
-            )
-            
+        result, cache_status = await search_cache.get(
+            request.query, str(request.max_results), lambda: _run_search(request.query, request.max_results),
+            max_age_seconds=request.max_age_seconds
+        )
+        return fast_response(SearchResponse(
+            success=True,
+            query=request.query,
+            cache_status=cache_status,
+            **result
+        ))
+
     except Exception as e:
         logger.error(f"Error in search endpoint: {e}")
-        return SearchResponse(
+        return fast_response(SearchResponse(
             success=False,
             query=request.query,
             summary="",
             sources_count=0,
             error=str(e)
-        )
+        ))
 
 
 @api_router.get("/agents/capabilities")
 async def get_agent_capabilities():
     # Get agent capabilities
     try:
-        capabilities = {
-            "search_agent": SearchAgent(agent_config).get_capabilities(),
-            "chat_agent": ChatAgent(agent_config).get_capabilities()
-        }
+        capabilities = shared_cache.get_json("capabilities") if shared_cache is not None else None
+        if capabilities is None:
+            # Building agents is slow, and capabilities only change with configuration
+            capabilities = {
+                "search_agent": SearchAgent(agent_config).get_capabilities(),
+                "chat_agent": ChatAgent(agent_config).get_capabilities()
+            }
+            if shared_cache is not None:
+                shared_cache.set_json("capabilities", capabilities, CAPABILITIES_CACHE_TTL_SECONDS)
         return {
             "success": True,
             "capabilities": capabilities
@@ -231,39 +481,136 @@ async def get_agent_capabilities():
 
 # Child Name Generator Routes
 @api_router.post("/generate-name", response_model=NameGenerationResponse)
-async def generate_child_name(request: NameGenerationRequest):
+async def generate_child_name(
+    request: NameGenerationRequest, idempotency_key: Optional[str] = Header(None), x_client_id: Optional[str] = Header(None)
+):
     """Generate child name suggestions based on free-form description"""
+    return await _idempotent("generate-name", idempotency_key, request, _with_history("name", x_client_id, _generate_names))
+
+
+async def _generate_names(request: NameGenerationRequest) -> NameGenerationResponse:
+    # NumPy loads on first use (or during warmup), not at import
+    from name_corpus import get_name_corpus, parse_description
+
+    mode = (request.mode or NAME_GENERATION_MODE).lower()
+    if mode not in NAME_GENERATION_MODES:
+        mode = "llm"
+    if mode == "llm":
+        return await _llm_names(request)
+
+    query = parse_description(request.description)
+    if mode == "auto":
+        # Fully understood descriptions need no LLM; if nothing was understood the index can't help
+        mode = "index" if query.fully_understood() else "rerank" if query.has_constraints() else "llm"
+        if mode == "llm":
+            return await _llm_names(request)
+    if mode == "index" and not request.use_cache:
+        # The index alone always answers with the same five: a fresh set needs the LLM to pick
+        mode = "rerank"
+
+    candidates, relaxed = get_name_corpus().search(query, NAME_RERANK_CANDIDATES if mode == "rerank" else 5)
+    if len(candidates) < 5:
+        return await _llm_names(request)
+    if mode == "rerank":
+        response = await _rerank_names(request, candidates)
+        if response is not None:
+            return response
+
+    response = NameGenerationResponse(
+        success=True,
+        suggested_names=[candidate.name for candidate in candidates[:5]],
+        explanation=_index_explanation(query, candidates[:5], relaxed),
+        source="index",
+    )
+    _prefetch_portraits(request.description, response.suggested_names)
+    return response
+
+
+async def _rerank_names(request: NameGenerationRequest, candidates: List["NameCandidate"]) -> Optional[NameGenerationResponse]:
+    """Let the LLM pick and explain 5 of the corpus candidates, None if it can't"""
     global chat_agent
+    from name_corpus import GENDER_LABELS
 
-    try:
-        # Initialize chat agent if needed
-        if chat_agent is None:
-            chat_agent = ChatAgent(agent_config)
+    cached = _cached_names(request, "|rerank")
+    if cached is not None:
+        return cached
 
-        # Create prompt for name generation
-        name_prompt = f"""
-        Generate 5 unique child names based on this description: "{request.description}"
+    listing = "\n".join(
+        f"- {c.name} ({GENDER_LABELS[c.gender]}, {'/'.join(c.origins)}): {c.meaning}" for c in candidates
+    )
+    rerank_prompt = f"""
+        Pick the 5 names from this list that best fit this description: "{request.description}"
 
-        Please consider:
-        - The style and characteristics requested
-        - Cultural backgrounds if mentioned
-        - Gender preferences if specified
-        - Modern vs traditional preferences
-        - Any specific letters or sounds mentioned
+        {listing}
 
         Provide your response as a JSON object with:
-        - "names": array of 5 suggested names
+        - "names": array of 5 names from the list, best fit first
         - "explanation": brief explanation of why these names fit the description
-
-        Example format:
-        {{
-            "names": ["Emma", "Oliver", "Sophia", "Liam", "Ava"],
-            "explanation": "These are popular modern names that are classic yet contemporary..."
-        }}
         """
 
-        # Execute agent
-        result = await chat_agent.execute(name_prompt)
+    try:
+        if chat_agent is None:
+            chat_agent = ChatAgent(agent_config)
+        result = await chat_agent.execute(rerank_prompt, use_tools=False, cache=request.use_cache, profile="names_rerank")
+        if not result.success:
+            raise RuntimeError(result.error)
+        response_text = result.content.strip()
+        if response_text.startswith("```json"):
+            response_text = response_text.replace("```json", "").replace("```", "").strip()
+        parsed_response = json.loads(response_text)
+
+        # Only names that really came from the candidates, topped up from the index ranking
+        by_name = {c.name.lower(): c.name for c in candidates}
+        picked = [by_name[name.strip().lower()] for name in parsed_response.get("names", []) if name.strip().lower() in by_name]
+        picked = list(dict.fromkeys(picked))
+        picked += [c.name for c in candidates if c.name not in picked][:5 - len(picked)]
+        suggested_names = picked[:5]
+    except Exception as e:
+        logger.warning(f"Name rerank failed, answering from the index: {e}")
+        return None
+
+    _prefetch_portraits(request.description, suggested_names)
+    response = NameGenerationResponse(
+        success=True,
+        suggested_names=suggested_names,
+        explanation=parsed_response.get("explanation", ""),
+        source="rerank",
+    )
+    _remember_names(request, "|rerank", response)
+    return response
+
+
+def _index_explanation(query: "NameQuery", candidates: List["NameCandidate"], relaxed: List[str]) -> str:
+    explanation = f"Matching {query.describe()} from our name index: " + "; ".join(
+        f"{c.name} ({'/'.join(c.origins)}, \"{c.meaning}\")" for c in candidates
+    ) + "."
+    if relaxed:
+        explanation += " Few names matched every detail, so the " + " and ".join(
+            name.replace("_", " ") for name in relaxed
+        ) + (" requirement was" if len(relaxed) == 1 else " requirements were") + " loosened."
+    return explanation
+
+
+async def _llm_names(request: NameGenerationRequest) -> NameGenerationResponse:
+    global chat_agent
+
+    cached = _cached_names(request, "")
+    if cached is not None:
+        return cached
+
+    try:
+        # Initialize chat agent if needed
+        if chat_agent is None:
+            chat_agent = ChatAgent(agent_config)
+
+        # Execute agent, in a combined call with concurrent requests when batching is on
+        if name_batcher is not None:
+            try:
+                result = AgentResponse(success=True, content=await name_batcher.submit(request.description, cache=request.use_cache))
+            except Exception as e:
+                result = AgentResponse(success=False, content="", error=str(e))
+        else:
+            result = await chat_agent.execute(name_prompt(request.description), cache=request.use_cache, profile="names")
 
         if result.success:
             try:
@@ -274,11 +621,18 @@ async def generate_child_name(request: NameGenerationRequest):
 
                 parsed_response = json.loads(response_text)
 
-                return NameGenerationResponse(
+                suggested_names = parsed_response.get("names", [])
+                _prefetch_portraits(request.description, suggested_names)
+                response = NameGenerationResponse(
                     success=True,
-                    suggested_names=parsed_response.get("names", []),
+                    suggested_names=suggested_names,
                     explanation=parsed_response.get("explanation", ""),
+                    source="llm",
                 )
+                # Only well-formed answers are worth sharing with other requests
+                if suggested_names:
+                    _remember_names(request, "", response)
+                return response
             except json.JSONDecodeError:
                 # Fallback: extract names from text response
                 lines = result.content.split('\n')
@@ -289,10 +643,13 @@ async def generate_child_name(request: NameGenerationRequest):
                         if clean_line and len(clean_line.split()) <= 2:
                             names.append(clean_line)
 
+                suggested_names = names[:5] if names else ["Alex", "Jordan", "Casey", "Taylor", "Morgan"]
+                _prefetch_portraits(request.description, suggested_names)
                 return NameGenerationResponse(
                     success=True,
-                    suggested_names=names[:5] if names else ["Alex", "Jordan", "Casey", "Taylor", "Morgan"],
+                    suggested_names=suggested_names,
                     explanation=result.content[:200] + "..." if len(result.content) > 200 else result.content,
+                    source="llm",
                 )
         else:
             return NameGenerationResponse(
@@ -312,30 +669,77 @@ async def generate_child_name(request: NameGenerationRequest):
         )
 
 
+@api_router.get("/names/suggest", response_model=NameSuggestionResponse)
+async def suggest_names(q: str = "", gender: Optional[str] = None, origin: Optional[str] = None, limit: int = 10):
+    """Typeahead over the bundled name corpus, most popular first"""
+    from name_corpus import get_name_corpus
+
+    try:
+        candidates = get_name_corpus().suggest(q, gender=gender, origin=origin, k=max(1, min(limit, 50)))
+        return fast_response(NameSuggestionResponse(
+            success=True,
+            suggestions=[NameSuggestion(**candidate.to_dict()) for candidate in candidates],
+        ))
+    except Exception as e:
+        logger.error(f"Error suggesting names: {e}")
+        return NameSuggestionResponse(success=False, suggestions=[], error=str(e))
+
+
 @api_router.post("/generate-image", response_model=ImageGenerationResponse)
-async def generate_child_image(request: ImageGenerationRequest):
+async def generate_child_image(
+    request: ImageGenerationRequest, idempotency_key: Optional[str] = Header(None), x_client_id: Optional[str] = Header(None)
+):
     """Generate an image of a child based on the selected name"""
+    return await _idempotent("generate-image", idempotency_key, request, _with_history("image", x_client_id, _generate_child_image))
+
 
+async def _generate_child_image(request: ImageGenerationRequest) -> ImageGenerationResponse:
     try:
         # Create image prompt
-        if request.description:
-            image_prompt = f"A portrait of a happy, adorable child named {request.child_name}. {request.description}. High quality, professional portrait, soft lighting, warm and friendly expression."
-        else:
-            image_prompt = f"A portrait of a happy, adorable child named {request.child_name}. High quality, professional portrait, soft lighting, warm and friendly expression, realistic style."
+        image_prompt = _build_portrait_prompt(request.child_name, request.description)
 
-        # Use MCP image generation service (assuming it's available)
-        async with httpx.AsyncClient() as client:
-            # This would connect to the MCP image generation service
-            # For now, we'll use a placeholder implementation
+        budget_ms = request.latency_budget_ms
+        if budget_ms is None:
+            budget_ms = DEFAULT_IMAGE_LATENCY_BUDGET_MS
 
-            # Generate image using available service
-            image_url = await _generate_image_with_mcp(image_prompt)
+        # Reuse a speculative portrait started by name generation, if there is one
+        job = speculative_images.claim(request.description or "", image_prompt)
 
+        if job is None and budget_ms <= 0:
+            image_url = await _generate_image_with_mcp(image_prompt)
             return ImageGenerationResponse(
                 success=True,
                 image_url=image_url
             )
 
+        if job is None and image_jobs.full:
+            # Too many generations already outlived their budget: don't leave another one behind
+            logger.warning(f"Image job limit reached, generating within the {budget_ms}ms budget only")
+            try:
+                image_url = await asyncio.wait_for(_generate_real_image(image_prompt), budget_ms / 1000)
+            except asyncio.TimeoutError:
+                image_url = None
+            return ImageGenerationResponse(success=True, image_url=image_url or _fallback_image_url())
+
+        # Generate in the background and only wait as long as the budget allows
+        if job is None:
+            job = image_jobs.submit(image_prompt, _generate_real_image)
+        await image_jobs.wait(job, budget_ms / 1000 if budget_ms > 0 else None)
+
+        if job.status == "done":
+            return ImageGenerationResponse(success=True, image_url=job.image_url)
+        if job.status == "failed":
+            logger.info("Using fallback image due to MCP generation failure")
+            return ImageGenerationResponse(success=True, image_url=_fallback_image_url())
+
+        logger.info(f"Image generation exceeded {budget_ms}ms budget, returning job {job.token}")
+        return ImageGenerationResponse(
+            success=True,
+            image_url=_fallback_image_url(),
+            pending=True,
+            job_token=job.token
+        )
+
     except Exception as e:
         logger.error(f"Error in image generation endpoint: {e}")
         return ImageGenerationResponse(
@@ -345,27 +749,111 @@ async def generate_child_image(request: ImageGenerationRequest):
         )
 
 
+@api_router.get("/generate-image/{token}", response_model=ImageJobResponse)
+async def get_image_job(token: str, wait_ms: int = 0):
+    """Fetch the result of an image generation that exceeded its latency budget"""
+    job = image_jobs.get(token)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired image job")
+
+    # Long-poll: hold the request until the image is ready or wait_ms elapses
+    if wait_ms > 0:
+        await image_jobs.wait(job, min(wait_ms, 30000) / 1000)
+
+    return ImageJobResponse(
+        success=job.status != "failed",
+        token=job.token,
+        status=job.status,
+        image_url=job.image_url if job.status == "done" else None,
+        error=job.error
+    )
+
+
+@api_router.get("/names/batch/stats")
+async def get_name_batch_stats():
+    """How many LLM name requests were combined, used to tune NAME_BATCH_WINDOW_MS"""
+    return {
+        "success": True,
+        "stats": name_batcher.stats() if name_batcher is not None else None
+    }
+
+
+@api_router.get("/speculative/stats")
+async def get_speculative_stats():
+    """Speculative portrait prefetch hit rate, used to tune SPECULATIVE_IMAGE_TOP_K"""
+    return {
+        "success": True,
+        "stats": speculative_images.stats()
+    }
+
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit rate and occupancy of the generation and search caches"""
+    return {
+        "success": True,
+        "stats": shared_cache.stats() if shared_cache is not None else None,
+        "snapshot": cache_snapshotter.stats() if cache_snapshotter is not None else None,
+        "search": search_cache.stats(),
+        "semantic_names": name_semantic_cache.stats() if name_semantic_cache is not None else None,
+        "llm": get_response_cache().stats(),
+        "idempotency": idempotency_store.stats()
+    }
+
+
+@api_router.get("/usage/summary")
+async def get_usage_summary(
+    hours: float = 24,
+    bucket_minutes: int = 60,
+    group_by: str = "endpoint",
+    endpoint: Optional[str] = None,
+    client: Optional[str] = None,
+    model: Optional[str] = None
+):
+    """Model tokens, latency and estimated cost per time bucket, grouped by endpoint, client, model, profile or agent"""
+    if group_by not in GROUP_FIELDS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUP_FIELDS)}")
+    if hours <= 0 or bucket_minutes <= 0:
+        raise HTTPException(status_code=400, detail="hours and bucket_minutes must be positive")
+    until = time.time()
+    since = until - min(hours, usage_recorder.retention_days * 24) * 3600
+    try:
+        buckets = await usage_recorder.summary(
+            since, until, bucket_seconds=bucket_minutes * 60, group_by=group_by,
+            filters={"endpoint": endpoint, "client": client, "model": model}
+        )
+    except Exception as e:
+        logger.error(f"Usage summary failed: {e}")
+        return {"success": False, "error": str(e), "recorder": usage_recorder.stats()}
+    return {
+        "success": True,
+        "since": datetime.fromtimestamp(since, timezone.utc).isoformat(),
+        "until": datetime.fromtimestamp(until, timezone.utc).isoformat(),
+        "bucket_minutes": bucket_minutes,
+        "group_by": group_by,
+        "totals": totals_by_key(buckets),
+        "buckets": buckets,
+        "recorder": usage_recorder.stats()
+    }
+
+
 @api_router.post("/generate-age-progression", response_model=AgeProgressionResponse)
-async def generate_age_progression(request: AgeProgressionRequest):
+async def generate_age_progression(
+    request: AgeProgressionRequest, idempotency_key: Optional[str] = Header(None), x_client_id: Optional[str] = Header(None)
+):
     """Generate age progression images showing the child at different ages"""
+    return await _idempotent(
+        "generate-age-progression", idempotency_key, request, _with_history("age_progression", x_client_id, _generate_age_progression)
+    )
 
-    try:
-        age_images = []
-
-        # Generate images for each age
-        for age in request.ages:
-            age_prompt = f"{request.base_image_prompt} The child named {request.child_name} is now {age} years old. Show appropriate physical development for age {age}. High quality, professional portrait."
 
-            try:
-                image_url = await _generate_image_with_mcp(age_prompt)
-                age_images.append({
-                    "age": age,
-                    "image_url": image_url
-                })
-            except Exception as e:
-                logger.error(f"Error generating image for age {age}: {e}")
-                # Continue with other ages even if one fails
-                continue
+async def _generate_age_progression(request: AgeProgressionRequest) -> AgeProgressionResponse:
+    try:
+        age_images = [
+            age_image async for age_image in
+            _age_progression_images(request.base_image_prompt, request.child_name, request.ages, request.grid)
+        ]
+        age_images.sort(key=lambda age_image: request.ages.index(age_image["age"]))
 
         return AgeProgressionResponse(
             success=True,
@@ -381,8 +869,441 @@ async def generate_age_progression(request: AgeProgressionRequest):
         )
 
 
+async def _age_progression_images(
+    base_prompt: str, child_name: str, ages: List[int], grid: Optional[bool] = None
+) -> AsyncIterator[dict]:
+    """Age images as one composite (grid mode, defaults to AGE_PROGRESSION_GRID) or one generation per age"""
+    use_grid = grid if grid is not None else AGE_PROGRESSION_GRID
+    if use_grid and len(ages) > 1:
+        # Every age already generated one by one (e.g. by the portrait gallery job): no composite needed
+        cached = [_cached_image(_build_age_prompt(base_prompt, child_name, age)) for age in ages]
+        if all(cached):
+            age_images = [{"age": age, "image_url": url} for age, url in zip(ages, cached)]
+        else:
+            age_images = await _generate_age_grid(base_prompt, child_name, ages)
+        if age_images is not None:
+            for age_image in age_images:
+                yield age_image
+            return
+        logger.warning("Grid age progression failed, falling back to one image per age")
+
+    async for age_image in _generate_age_images(base_prompt, child_name, ages):
+        yield age_image
+
+
+@api_router.post("/generate-pipeline")
+async def generate_pipeline(request: PipelineRequest, x_client_id: Optional[str] = Header(None)):
+    """Names, portrait and age progression in one request, streamed as NDJSON stage events"""
+    return StreamingResponse(_run_pipeline(request, _history_client(x_client_id)), media_type="application/x-ndjson")
+
+
+async def _run_pipeline(request: PipelineRequest, client: Optional[str] = None) -> AsyncIterator[str]:
+    # Stages push events onto a queue so each one is sent as soon as it's ready
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def portrait_stage(child_name: str):
+        image_request = ImageGenerationRequest(
+            child_name=child_name,
+            description=request.description,
+            latency_budget_ms=request.latency_budget_ms,
+            session_id=request.session_id
+        )
+        response = await _generate_child_image(image_request)
+        _remember_generation(client, "image", image_request, response)
+        await events.put({"stage": "image", "child_name": child_name, **response.dict()})
+
+    async def age_stage(child_name: str):
+        base_prompt = _build_age_base_prompt(child_name, request.description)
+        age_images = []
+        try:
+            async for age_image in _age_progression_images(base_prompt, child_name, request.ages, request.grid):
+                age_images.append(age_image)
+                await events.put({"stage": "age_image", "child_name": child_name, **age_image})
+            age_images.sort(key=lambda age_image: request.ages.index(age_image["age"]))
+            response = AgeProgressionResponse(success=True, age_progression_images=age_images)
+            _remember_generation(client, "age_progression", AgeProgressionRequest(
+                base_image_prompt=base_prompt, child_name=child_name, ages=request.ages, grid=request.grid,
+                session_id=request.session_id
+            ), response)
+        except Exception as e:
+            logger.error(f"Error in pipeline age progression: {e}")
+            response = AgeProgressionResponse(success=False, age_progression_images=age_images, error=str(e))
+        await events.put({"stage": "age_progression", "child_name": child_name, **response.dict()})
+
+    def start_image_stages(child_name: str) -> List[asyncio.Task]:
+        tasks = [asyncio.create_task(portrait_stage(child_name))]
+        if request.include_age_progression:
+            tasks.append(asyncio.create_task(age_stage(child_name)))
+        return tasks
+
+    async def run_stages():
+        tasks: List[asyncio.Task] = []
+        try:
+            # A known name means image stages don't have to wait for name generation
+            if request.child_name:
+                tasks = start_image_stages(request.child_name)
+            else:
+                names_request = NameGenerationRequest(description=request.description, session_id=request.session_id)
+                names = await _generate_names(names_request)
+                _remember_generation(client, "name", names_request, names)
+                await events.put({"stage": "names", **names.dict()})
+                if names.success and names.suggested_names:
+                    index = min(max(request.name_index, 0), len(names.suggested_names) - 1)
+                    tasks = start_image_stages(names.suggested_names[index])
+            await asyncio.gather(*tasks)
+        except Exception as e:
+            logger.error(f"Error in pipeline endpoint: {e}")
+            await events.put({"stage": "error", "error": str(e)})
+        finally:
+            for task in tasks:
+                task.cancel()
+            await events.put(None)
+
+    runner = asyncio.create_task(run_stages())
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield json.dumps(event, default=str) + "\n"
+        yield json.dumps({"stage": "done"}) + "\n"
+    finally:
+        # Client went away mid-stream: stop generating
+        runner.cancel()
+
+
+@api_router.get("/images/{key}")
+async def get_stored_image(key: str, http_request: Request):
+    """Serve an original image from the local image store"""
+    path = image_store.path(key)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return image_file_response(http_request, path, image_store.media_type(key))
+
+
+@api_router.get("/images/{key}/{variant}.{fmt}")
+async def get_image_variant(key: str, variant: str, fmt: str, http_request: Request):
+    """Serve a resized/transcoded variant (thumbnail, card, full) of a stored image"""
+    if variant not in VARIANTS or fmt not in FORMATS:
+        raise HTTPException(status_code=404, detail="Unknown image variant")
+
+    # Rendering a missing variant is CPU bound, keep it off the event loop
+    path = await asyncio.to_thread(image_store.variant, key, variant, fmt)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return image_file_response(http_request, path, image_store.media_type(path.name))
+
+
+async def _generate_age_grid(base_prompt: str, child_name: str, ages: List[int]) -> Optional[List[dict]]:
+    """Generate all ages as one composite image and serve each slice from the image store"""
+    grid_prompt = build_grid_prompt(base_prompt, child_name, ages)
+    composite_url = await _generate_remote_image(grid_prompt)
+    if not composite_url:
+        return None
+
+    try:
+        composite_key = await image_store.fetch(composite_url)
+
+        def slice_and_store() -> List[str]:
+            # Decoding and re-encoding tiles is CPU bound, keep it off the event loop
+            tiles = slice_grid(image_store.path(composite_key).read_bytes(), len(ages))
+            return [image_store.put(tile, ".webp") for tile in tiles]
+
+        keys = await asyncio.to_thread(slice_and_store)
+    except Exception as e:
+        logger.error(f"Error slicing age progression grid: {e}")
+        return None
+
+    return [{"age": age, "image_url": _image_url(key)} for age, key in zip(ages, keys)]
+
+
+def _image_url(key: str) -> str:
+    """URL of an image served from the local image store"""
+    return f"{PUBLIC_BASE_URL.rstrip('/')}/api/images/{key}"
+
+
+def _fallback_image_url() -> str:
+    """URL of the placeholder portrait, storing it on first use rather than at import"""
+    global fallback_image_url
+    if fallback_image_url is None:
+        fallback_image_url = _image_url(image_store.put(FALLBACK_IMAGE_PATH.read_bytes(), ".png"))
+    return fallback_image_url
+
+
+async def _generate_age_images(base_prompt: str, child_name: str, ages: List[int]) -> AsyncIterator[dict]:
+    """Generate one image per age concurrently, yielding each as it completes"""
+
+    async def generate_for_age(age: int) -> Optional[dict]:
+        age_prompt = _build_age_prompt(base_prompt, child_name, age)
+        try:
+            image_url = await _generate_image_with_mcp(age_prompt)
+            return {"age": age, "image_url": image_url}
+        except Exception as e:
+            logger.error(f"Error generating image for age {age}: {e}")
+            # Continue with other ages even if one fails
+            return None
+
+    tasks = [asyncio.create_task(generate_for_age(age)) for age in ages]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            age_image = await next_done
+            if age_image is not None:
+                yield age_image
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _build_age_base_prompt(child_name: str, description: Optional[str] = None) -> str:
+    """Base portrait prompt the age progression builds on"""
+    return f"A portrait of a happy child named {child_name}. {description or ''}. High quality, professional portrait, soft lighting, warm and friendly expression."
+
+
+def _build_age_prompt(base_prompt: str, child_name: str, age: int) -> str:
+    """Image prompt for the child at a specific age"""
+    return f"{base_prompt} The child named {child_name} is now {age} years old. Show appropriate physical development for age {age}. High quality, professional portrait."
+
+
+def _build_portrait_prompt(child_name: str, description: Optional[str] = None) -> str:
+    """Image prompt for a child's portrait"""
+    if description:
+        return f"A portrait of a happy, adorable child named {child_name}. {description}. High quality, professional portrait, soft lighting, warm and friendly expression."
+    return f"A portrait of a happy, adorable child named {child_name}. High quality, professional portrait, soft lighting, warm and friendly expression, realistic style."
+
+
+def _prefetch_portraits(description: str, names: List[str]):
+    """Speculatively start portraits for the top suggested names"""
+    if not speculative_images.enabled:
+        return
+    prompts = [_build_portrait_prompt(name, description) for name in names]
+    speculative_images.prefetch(description, prompts, _generate_real_image)
+
+
 async def _generate_image_with_mcp(prompt: str) -> str:
     """Generate image using actual MCP image generation service"""
+    image_url = await _generate_real_image(prompt)
+    if image_url:
+        return image_url
+
+    # Fallback: use the bundled placeholder image
+    logger.info("Using fallback image due to MCP generation failure")
+    return _fallback_image_url()
+
+
+async def _complete_names(prompt: str, cache: bool, items: int) -> str:
+    # One model call for the name batcher, with room for every item's answer
+    global chat_agent
+    if chat_agent is None:
+        chat_agent = ChatAgent(agent_config)
+    result = await chat_agent.execute(prompt, cache=cache, profile="names" if items == 1 else "names_batch")
+    if not result.success:
+        raise RuntimeError(result.error)
+    return result.content
+
+
+async def _idempotent(route: str, key: Optional[str], request: BaseModel, handler) -> FastJSONResponse:
+    """handler(request), run once per Idempotency-Key: retries get the first request's response"""
+    if not key:
+        return fast_response(await handler(request))
+    if len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be at most 255 characters")
+
+    async def run() -> dict:
+        return (await handler(request)).model_dump()
+
+    try:
+        body, outcome = await idempotency_store.run(route, key, request.model_dump(), run, _replayable)
+    except IdempotencyConflict as e:
+        return FastJSONResponse({"detail": str(e)}, status_code=422)
+    response = FastJSONResponse(body)
+    if outcome != "new":
+        response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _replayable(body: dict) -> bool:
+    """Whether a response is final and may be replayed to retries"""
+    # A placeholder's job token only resolves in this process, and only for a while; a fallback
+    # image is a failed generation, which a retry should get another go at
+    if not body.get("success", True) or body.get("pending"):
+        return False
+    image_urls = [body.get("image_url")] + [image.get("image_url") for image in body.get("age_progression_images", [])]
+    return fallback_image_url is None or fallback_image_url not in image_urls
+
+
+def _history_client(header: Optional[str]) -> Optional[str]:
+    # History is only kept for callers that identify themselves, never by address
+    header = (header or "").strip()
+    return header[:MAX_CLIENT_ID_LENGTH] or None
+
+
+def _with_history(kind: str, client: Optional[str], handler):
+    """handler, with its successful results saved to the client's generation history"""
+    client = _history_client(client)
+    if client is None:
+        return handler
+
+    async def run(request: BaseModel):
+        response = await handler(request)
+        _remember_generation(client, kind, request, response)
+        return response
+    return run
+
+
+def _remember_generation(client: Optional[str], kind: str, request: BaseModel, response: BaseModel):
+    if client is None or not response.success:
+        return
+    if getattr(response, "pending", False) and response.job_token:
+        # A placeholder isn't worth reloading: save the portrait once its job finishes
+        job = image_jobs.get(response.job_token)
+        if job is not None:
+            task = asyncio.create_task(_remember_image_job(client, request, job))
+            _history_tasks.add(task)
+            task.add_done_callback(_history_tasks.discard)
+        return
+    generation_history.record(
+        client, kind, request.model_dump(exclude={"session_id"}), response.model_dump(), session_id=request.session_id
+    )
+
+
+async def _remember_image_job(client: str, request: ImageGenerationRequest, job):
+    # Outlives the request, like the job itself
+    clear_deadline()
+    await image_jobs.wait(job, None)
+    if job.status == "done":
+        _remember_generation(client, "image", request, ImageGenerationResponse(success=True, image_url=job.image_url))
+
+
+@api_router.get("/history", response_model=HistoryResponse)
+async def get_generation_history(
+    x_client_id: Optional[str] = Header(None),
+    session_id: Optional[str] = None,
+    kind: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """This client's earlier generation results, newest first, e.g. ?kind=name&fields=request.description,response.suggested_names"""
+    client = _history_client(x_client_id)
+    if client is None:
+        raise HTTPException(status_code=400, detail="X-Client-Id header is required")
+    if kind is not None and kind not in HISTORY_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(HISTORY_KINDS)}")
+    try:
+        items, next_cursor = await generation_history.page(
+            client, session_id=session_id, kind=kind, limit=limit, cursor=cursor,
+            fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reading generation history: {e}")
+        return fast_response(HistoryResponse(success=False, items=[], error=str(e)))
+    return fast_response(HistoryResponse(success=True, items=items, next_cursor=next_cursor))
+
+
+name_batcher = NameBatcher(
+    _complete_names, window_ms=NAME_BATCH_WINDOW_MS, max_batch=NAME_BATCH_MAX_ITEMS
+) if NAME_BATCH_WINDOW_MS > 0 else None
+
+
+def _names_cache_key(description: str) -> str:
+    return "names:" + " ".join(description.lower().split())
+
+
+def _cached_names(request: NameGenerationRequest, variant: str) -> Optional[NameGenerationResponse]:
+    """Earlier answer for this description from the shared cache, or for a paraphrase of it"""
+    if not request.use_cache:
+        return None
+    cached = shared_cache.get_json(_names_cache_key(request.description) + variant) if shared_cache is not None else None
+    semantic_cache = _name_semantic_cache()
+    if cached is None and semantic_cache is not None:
+        near = semantic_cache.get(request.description, variant + _names_signature(request.description))
+        if near is not None:
+            cached = near[0]
+    if cached is None:
+        return None
+    _prefetch_portraits(request.description, cached["suggested_names"])
+    return NameGenerationResponse(**cached)
+
+
+def _remember_names(request: NameGenerationRequest, variant: str, response: NameGenerationResponse):
+    # Exact repeats are shared by every worker, paraphrases are matched by this one
+    if shared_cache is not None:
+        shared_cache.set_json(_names_cache_key(request.description) + variant, response.dict(), NAME_CACHE_TTL_SECONDS)
+    semantic_cache = _name_semantic_cache()
+    if semantic_cache is not None:
+        semantic_cache.put(request.description, response.dict(), variant + _names_signature(request.description))
+
+
+def _name_semantic_cache() -> Optional["SemanticCache"]:
+    global name_semantic_cache
+    if name_semantic_cache is None and NAME_SEMANTIC_CACHE_SIZE > 0:
+        from semantic_cache import SemanticCache
+        name_semantic_cache = SemanticCache(
+            threshold=NAME_SEMANTIC_CACHE_THRESHOLD,
+            max_entries=NAME_SEMANTIC_CACHE_SIZE,
+            ttl_seconds=NAME_CACHE_TTL_SECONDS
+        )
+    return name_semantic_cache
+
+
+def _names_signature(description: str) -> str:
+    # Paraphrases only match when their hard constraints agree: gender, origin, letters, length
+    from name_corpus import parse_description
+
+    query = parse_description(description)
+    return "|" + repr((
+        sorted(query.genders), sorted(query.origins), sorted(query.starts_with), sorted(query.ends_with),
+        query.min_length, query.max_length, query.syllables,
+    ))
+
+
+def _cached_image(prompt: str) -> Optional[str]:
+    """URL of an image already generated for this exact prompt"""
+    cached = shared_cache.get("image:" + prompt) if shared_cache is not None else None
+    if cached is not None:
+        return cached.decode()
+    # Gallery images outlive their cache entries: put one back if the cache evicted it
+    image_url = gallery_index.get(prompt)
+    if image_url is None or not _image_available(image_url):
+        return None
+    _cache_image(prompt, image_url, GALLERY_CACHE_TTL_SECONDS)
+    return image_url
+
+
+def _image_available(image_url: str) -> bool:
+    """Whether a locally served image is still in the store; remote URLs are taken on trust"""
+    marker = "/api/images/"
+    return marker not in image_url or image_store.path(image_url.split(marker, 1)[1]) is not None
+
+
+def _cache_image(prompt: str, image_url: str, ttl_seconds: float = IMAGE_CACHE_TTL_SECONDS):
+    if shared_cache is not None:
+        shared_cache.set("image:" + prompt, image_url.encode(), ttl_seconds)
+
+
+async def _generate_real_image(prompt: str) -> Optional[str]:
+    """Generate image via MCP without falling back, returns None on failure"""
+    cached = _cached_image(prompt)
+    if cached is not None:
+        return cached
+
+    image_url = await _generate_remote_image(prompt)
+    if image_url and SERVE_IMAGES_LOCALLY:
+        # Fetch once into the local store so clients never hit the backend bucket
+        try:
+            image_url = _image_url(await image_store.fetch(image_url))
+        except Exception as e:
+            logger.error(f"Error storing generated image locally, serving remote URL: {e}")
+
+    if image_url:
+        _cache_image(prompt, image_url)
+    return image_url
+
+
+async def _generate_remote_image(prompt: str) -> Optional[str]:
+    """Generate image via MCP and return the backend's URL, None on failure"""
     try:
         logger.info(f"Generating REAL AI image via MCP for: {prompt[:100]}...")
 
@@ -401,13 +1322,67 @@ async def _generate_image_with_mcp(prompt: str) -> str:
     except Exception as e:
         logger.error(f"Error calling real MCP image generation: {e}")
 
-    # Fallback: use high-quality stock image
-    logger.info("Using fallback image due to MCP generation failure")
-    return "https://images.unsplash.com/photo-1544005313-94ddf0286df2?w=512&h=512&fit=crop&crop=face&auto=format&q=80"
+    return None
+
+def get_db() -> "AsyncIOMotorDatabase":
+    """Database handle, connecting the Motor client on first use"""
+    global client
+    if client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    return client[os.environ['DB_NAME']]
+
+
+def _reinit_after_fork():
+    # Forked workers (serve.py preloads the app) must not share the parent's connections
+    global client, search_agent, chat_agent, image_agent
+    client = None
+    search_agent = chat_agent = image_agent = None
+    image_store.reset_after_fork()
+    get_response_cache().reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+def preload():
+    """Import every lazily loaded dependency now (warmup thread, or a pre-fork master)"""
+    warmup_agents()
+    from name_corpus import get_name_corpus
+    get_name_corpus()
+    import httpx  # noqa: F401
+    import motor.motor_asyncio  # noqa: F401
+    import PIL.Image  # noqa: F401
+
+
+async def _warmup():
+    # Load heavy dependencies in a thread so the first real request finds them imported
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(preload)
+        logger.info(f"Warmup finished in {(time.perf_counter() - started) * 1000:.0f}ms")
+    except Exception as e:
+        logger.error(f"Warmup failed, dependencies will load on first use: {e}")
+
 
 # Include router
 app.include_router(api_router)
 
+app.add_middleware(
+    DeadlineMiddleware,
+    default_seconds=REQUEST_TIMEOUT_SECONDS,
+    route_seconds=ROUTE_TIMEOUT_SECONDS
+)
+
+# Outside the deadline middleware, so the handler task it creates inherits the usage scope
+app.add_middleware(UsageScopeMiddleware)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -429,7 +1404,14 @@ async def startup_event():
     global search_agent, chat_agent, image_agent
     logger.info("Starting AI Agents API...")
 
-    # Lazy agent init for faster startup
+    # Lazy agent init for faster startup, heavy imports warm up in the background
+    if WARMUP_ON_STARTUP:
+        asyncio.create_task(_warmup())
+    # Cache entries from the previous deploy stream back in the background
+    if cache_snapshotter is not None:
+        cache_snapshotter.start()
+    usage_recorder.start()
+    generation_history.start()
     logger.info("AI Agents API ready!")
 
 
@@ -446,5 +1428,13 @@ async def shutdown_db_client():
         # MCP cleanup automatic
         pass
 
-    client.close()
+    if cache_snapshotter is not None:
+        await cache_snapshotter.stop()
+    await image_store.aclose()
+    get_response_cache().close()
+    # Before the Mongo client closes: the last usage events still need writing
+    await usage_recorder.stop()
+    await generation_history.stop()
+    if client is not None:
+        client.close()
     logger.info("AI Agents API shutdown complete.")
@@ -0,0 +1,226 @@
+"""
+Shared Cache - Cross-process cache in an mmap'd file
+Every worker on a host maps the same file, so a result cached by one worker is a hit in all of them.
+The file is a set-associative hash table: a key hashes to one set of `ways` slots, and inserting
+into a full set evicts its least recently used (or expired) slot. Every operation holds an
+fcntl lock on the file, so inserts are atomic and LRU/stat updates exact across processes.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple
+
+import orjson
+
+_MAGIC = b"FFCACHE1"
+# magic, slots, ways, value size, hits, misses, sets, evictions
+_HEADER = struct.Struct("<8sIIIQQQQ")
+_HEADER_SIZE = 64
+# key digest, expires at, last access, value length
+_SLOT = struct.Struct("<16sddI")
+_SLOT_HEADER_SIZE = 40
+_EMPTY_DIGEST = bytes(16)
+
+
+def default_cache_path() -> Path:
+    # Prefer RAM-backed /dev/shm so the mapping never hits disk
+    base = Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+    return base / "future-faces-cache"
+
+
+class SharedCache:
+    """Fixed-size key/value cache shared by every process that opens the same path and geometry"""
+
+    def __init__(self, path: Path, slots: int = 16384, ways: int = 8, value_size: int = 2048):
+        self.ways = ways
+        self.sets = max(1, slots // ways)
+        self.slots = self.sets * ways
+        self.value_size = value_size
+        self.slot_size = _SLOT_HEADER_SIZE + value_size
+        self.size = _HEADER_SIZE + self.slots * self.slot_size
+        # The geometry is part of the file name, so a process configured differently maps its own
+        # file instead of resizing one that other processes have mapped (they would get SIGBUS)
+        path = Path(path)
+        self.path = path.with_name(f"{path.name}.{self.slots}x{self.ways}x{self.value_size}")
+        # fcntl locks are per process; this serializes threads within one process
+        self._thread_lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            with self._locked():
+                size = os.fstat(self._fd).st_size
+                if size == 0:
+                    # New file: size it and write the header before anyone maps it
+                    os.ftruncate(self._fd, self.size)
+                    os.pwrite(self._fd, _HEADER.pack(_MAGIC, self.slots, self.ways, self.value_size, 0, 0, 0, 0), 0)
+                elif size != self.size or not self._header_matches(os.pread(self._fd, _HEADER.size, 0)):
+                    # Another process may have it mapped, so it's never truncated or rewritten here
+                    raise OSError(f"{self.path} is not a cache file with this layout, remove it to start over")
+            self._map = mmap.mmap(self._fd, self.size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def get(self, key: str) -> Optional[bytes]:
+        digest = self._digest(key)
+        now = time.time()
+        with self._locked():
+            for offset in self._set_offsets(digest):
+                slot_digest, expires_at, _, length = _SLOT.unpack_from(self._map, offset)
+                if slot_digest == digest and expires_at > now:
+                    # Touch for LRU
+                    struct.pack_into("<d", self._map, offset + 24, now)
+                    value = bytes(self._map[offset + _SLOT_HEADER_SIZE:offset + _SLOT_HEADER_SIZE + length])
+                    self._bump_counter(4)
+                    return value
+            self._bump_counter(5)
+        return None
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> bool:
+        """Insert or replace a value; values larger than a slot are not cached"""
+        if len(value) > self.value_size:
+            return False
+        digest = self._digest(key)
+        now = time.time()
+        with self._locked():
+            # Same key, else a free or expired slot, else the least recently used one
+            victim, evicting = None, False
+            lru_offset, lru_access = None, None
+            for offset in self._set_offsets(digest):
+                slot_digest, expires_at, last_access, _ = _SLOT.unpack_from(self._map, offset)
+                if slot_digest == digest:
+                    victim = offset
+                    break
+                if victim is None and (slot_digest == _EMPTY_DIGEST or expires_at <= now):
+                    victim = offset
+                if lru_access is None or last_access < lru_access:
+                    lru_offset, lru_access = offset, last_access
+            if victim is None:
+                victim, evicting = lru_offset, True
+
+            self._map[victim + _SLOT_HEADER_SIZE:victim + _SLOT_HEADER_SIZE + len(value)] = value
+            _SLOT.pack_into(self._map, victim, digest, now + ttl_seconds, now, len(value))
+            self._bump_counter(6)
+            if evicting:
+                self._bump_counter(7)
+        return True
+
+    def delete(self, key: str):
+        digest = self._digest(key)
+        with self._locked():
+            for offset in self._set_offsets(digest):
+                if _SLOT.unpack_from(self._map, offset)[0] == digest:
+                    _SLOT.pack_into(self._map, offset, _EMPTY_DIGEST, 0.0, 0.0, 0)
+
+    def entries(self) -> Iterator[Tuple[bytes, float, bytes]]:
+        """Live (key digest, expires_at, value) entries, locking one set at a time"""
+        for first in range(0, self.slots, self.ways):
+            now = time.time()
+            rows = []
+            with self._locked():
+                for index in range(first, first + self.ways):
+                    offset = _HEADER_SIZE + index * self.slot_size
+                    digest, expires_at, _, length = _SLOT.unpack_from(self._map, offset)
+                    if digest != _EMPTY_DIGEST and expires_at > now:
+                        value = bytes(self._map[offset + _SLOT_HEADER_SIZE:offset + _SLOT_HEADER_SIZE + length])
+                        rows.append((digest, expires_at, value))
+            yield from rows
+
+    def restore(self, digest: bytes, value: bytes, expires_at: float) -> bool:
+        """Re-insert an entry from entries(); never replaces or evicts a live entry"""
+        now = time.time()
+        if expires_at <= now or len(value) > self.value_size or digest == _EMPTY_DIGEST:
+            return False
+        with self._locked():
+            free = None
+            for offset in self._set_offsets(digest):
+                slot_digest, slot_expires_at, _, _ = _SLOT.unpack_from(self._map, offset)
+                if slot_digest == digest and slot_expires_at > now:
+                    # Already set since the snapshot was taken, which is newer
+                    return False
+                if free is None and (slot_digest == _EMPTY_DIGEST or slot_expires_at <= now):
+                    free = offset
+            if free is None:
+                return False
+            self._map[free + _SLOT_HEADER_SIZE:free + _SLOT_HEADER_SIZE + len(value)] = value
+            _SLOT.pack_into(self._map, free, digest, expires_at, now, len(value))
+        return True
+
+    def get_json(self, key: str) -> Optional[Any]:
+        value = self.get(key)
+        return orjson.loads(value) if value is not None else None
+
+    def set_json(self, key: str, value: Any, ttl_seconds: float) -> bool:
+        return self.set(key, orjson.dumps(value), ttl_seconds)
+
+    def stats(self) -> dict:
+        with self._locked():
+            _, slots, ways, value_size, hits, misses, sets, evictions = _HEADER.unpack_from(self._map, 0)
+            now = time.time()
+            live = sum(
+                1 for index in range(self.slots)
+                if _SLOT.unpack_from(self._map, _HEADER_SIZE + index * self.slot_size)[1] > now
+            )
+        lookups = hits + misses
+        return {
+            "path": str(self.path),
+            "slots": slots,
+            "ways": ways,
+            "value_size": value_size,
+            "entries": live,
+            "hits": hits,
+            "misses": misses,
+            "sets": sets,
+            "evictions": evictions,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._locked():
+            self._map[_HEADER_SIZE:] = bytes(self.size - _HEADER_SIZE)
+            _HEADER.pack_into(self._map, 0, _MAGIC, self.slots, self.ways, self.value_size, 0, 0, 0, 0)
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    def _header_matches(self, header: bytes) -> bool:
+        if len(header) < _HEADER.size:
+            return False
+        magic, slots, ways, value_size = _HEADER.unpack(header)[:4]
+        return (magic, slots, ways, value_size) == (_MAGIC, self.slots, self.ways, self.value_size)
+
+    def _set_offsets(self, digest: bytes):
+        first = (int.from_bytes(digest[:8], "little") % self.sets) * self.ways
+        for index in range(first, first + self.ways):
+            yield _HEADER_SIZE + index * self.slot_size
+
+    def _bump_counter(self, field: int):
+        # Counters are header fields 4..7, 8 bytes each after the 20-byte prefix
+        offset = 20 + (field - 4) * 8
+        value = struct.unpack_from("<Q", self._map, offset)[0]
+        struct.pack_into("<Q", self._map, offset, value + 1)
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        # The all-zero digest marks an empty slot
+        return digest if digest != _EMPTY_DIGEST else b"\x01" + digest[1:]
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
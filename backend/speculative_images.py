@@ -0,0 +1,131 @@
+"""
+Speculative Images - Prefetch portraits for the top suggested names
+Name generation starts low-priority portrait jobs so the follow-up image request is a cache hit
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from image_jobs import ImageJob, ImageJobStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Prefetch:
+    job: ImageJob
+    group: str
+    rank: int
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class SpeculativeImagePrefetcher:
+    """Short-lived cache of speculative portrait jobs grouped by the description that produced them"""
+
+    def __init__(self, jobs: ImageJobStore, top_k: int = 0, ttl_seconds: float = 300, max_concurrency: int = 2):
+        self.jobs = jobs
+        self.top_k = top_k
+        self.ttl_seconds = ttl_seconds
+        # Speculative work never takes more than a couple of generation slots
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._entries: Dict[str, _Prefetch] = {}
+        self._groups: Dict[str, List[str]] = {}
+        self._stats = {
+            "groups": 0,
+            "prefetched": 0,
+            "claims": 0,
+            "hits": 0,
+            "misses": 0,
+            "cancelled": 0,
+            "expired": 0,
+        }
+        self._hits_by_rank: Dict[int, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.top_k > 0
+
+    def prefetch(self, group: str, prompts: List[str], generate: Callable[[str], Awaitable[Optional[str]]]):
+        """Start background generation for the first top_k prompts of a group"""
+        if not self.enabled:
+            return
+        self._prune()
+        self._cancel_group(group)
+
+        async def low_priority(prompt: str) -> Optional[str]:
+            async with self._slots:
+                return await generate(prompt)
+
+        keys = []
+        for rank, prompt in enumerate(prompts[:self.top_k]):
+            if prompt in self._entries:
+                continue
+            if self.jobs.full:
+                # Leave the remaining job slots to requests that were actually made
+                break
+            job = self.jobs.submit(prompt, low_priority)
+            self._entries[prompt] = _Prefetch(job=job, group=group, rank=rank)
+            keys.append(prompt)
+
+        if keys:
+            self._groups[group] = keys
+            self._stats["groups"] += 1
+            self._stats["prefetched"] += len(keys)
+            logger.info(f"Speculatively generating {len(keys)} portraits")
+
+    def claim(self, group: str, prompt: str) -> Optional[ImageJob]:
+        """Take the speculative job for a prompt, if any, and cancel the rest of its group"""
+        self._prune()
+        entry = self._entries.pop(prompt, None)
+        if entry is not None and entry.job.status == "failed":
+            entry = None
+
+        if group in self._groups or entry is not None:
+            self._stats["claims"] += 1
+            if entry is not None:
+                self._stats["hits"] += 1
+                self._hits_by_rank[entry.rank] = self._hits_by_rank.get(entry.rank, 0) + 1
+            else:
+                self._stats["misses"] += 1
+
+        self._cancel_group(group)
+        return entry.job if entry else None
+
+    def stats(self) -> dict:
+        claims = self._stats["claims"]
+        return {
+            **self._stats,
+            "top_k": self.top_k,
+            "in_flight": sum(1 for e in self._entries.values() if e.job.status == "pending"),
+            "hit_rate": self._stats["hits"] / claims if claims else 0.0,
+            "hits_by_rank": dict(sorted(self._hits_by_rank.items())),
+        }
+
+    def _cancel_group(self, group: str):
+        for prompt in self._groups.pop(group, []):
+            entry = self._entries.pop(prompt, None)
+            if entry is not None:
+                self._discard(entry, "cancelled")
+
+    def _discard(self, entry: _Prefetch, reason: str):
+        if entry.job.task is not None and not entry.job.task.done():
+            entry.job.task.cancel()
+        self._stats[reason] += 1
+
+    def _prune(self):
+        now = time.monotonic()
+        expired: List[Tuple[str, _Prefetch]] = [
+            (prompt, entry) for prompt, entry in self._entries.items()
+            if now - entry.created_at > self.ttl_seconds
+        ]
+        for prompt, entry in expired:
+            del self._entries[prompt]
+            group = self._groups.get(entry.group)
+            if group is not None:
+                group.remove(prompt)
+                if not group:
+                    del self._groups[entry.group]
+            self._discard(entry, "expired")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Startup Report - Where does process start-up time go?
+Runs `python -X importtime` against server.py in a fresh interpreter and measures
+time to the first /api/ response
+
+Usage: python startup_report.py [--top 25]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).parent
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+# Runs in a fresh interpreter; the test client is loaded first so only server start-up is timed
+_FIRST_RESPONSE_SCRIPT = """
+import json, time
+from fastapi.testclient import TestClient
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+with TestClient(server.app) as client:
+    response = client.get("/api/")
+responded = time.perf_counter()
+print(json.dumps({
+    "status": response.status_code,
+    "import_ms": (imported - started) * 1000,
+    "first_response_ms": (responded - started) * 1000,
+}))
+"""
+
+
+def _child_env() -> dict:
+    env = dict(os.environ)
+    # Background warmup competes for the GIL and makes timings noisy
+    env.setdefault("WARMUP_ON_STARTUP", "false")
+    return env
+
+
+def import_times() -> List[Tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) for every import made by `import server`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=_child_env(), capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def measure_first_response() -> Dict[str, float]:
+    """Time from `import server` to the first /api/ response in a cold interpreter"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", _FIRST_RESPONSE_SCRIPT],
+        cwd=BACKEND_DIR, env=_child_env(), capture_output=True, text=True, check=True
+    )
+    process_ms = (time.perf_counter() - started) * 1000
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process_ms"] = process_ms
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report server start-up cost")
+    parser.add_argument("--top", type=int, default=25, help="Number of modules and packages to list")
+    args = parser.parse_args()
+
+    rows = import_times()
+
+    by_package: Dict[str, int] = defaultdict(int)
+    for module, self_us, _, _ in rows:
+        by_package[module.split(".")[0]] += self_us
+
+    print("Slowest imports (cumulative) for `import server`")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for module, self_us, cumulative_us, depth in sorted(rows, key=lambda row: -row[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {'  ' * depth}{module}")
+
+    print("\nSelf time by top-level package")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{self_us / 1000:>14.1f}  {package}")
+
+    timings = measure_first_response()
+    print(f"\nimport server:          {timings['import_ms']:.0f}ms")
+    print(f"first /api/ response:   {timings['first_response_ms']:.0f}ms")
+    print(f"whole process:          {timings['process_ms']:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
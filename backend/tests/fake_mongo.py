@@ -0,0 +1,123 @@
+# In-memory stand-in for the parts of a Motor collection the backend uses, shared by the tests
+
+import copy
+import itertools
+
+
+class DuplicateKeyError(Exception):
+    # Matched by name, like pymongo's, so stores don't need pymongo to recognise it
+    pass
+
+
+class _FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.documents.sort(key=lambda document: document[field], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length):
+        return self.documents[:length]
+
+
+class FakeCollection:
+    """Documents by _id, with just enough of Mongo's query language for the stores under test
+
+    fail=True makes every write raise, as when Mongo is unreachable.
+    """
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.documents = {}
+        self.batches = []
+        self.indexes = []
+        self.reads = []
+        self._ids = itertools.count(1)
+
+    async def create_index(self, keys, **kwargs):
+        self.indexes.append(keys)
+        return str(keys)
+
+    async def insert_one(self, document):
+        self._check()
+        if document.get("_id") in self.documents:
+            raise DuplicateKeyError(document["_id"])
+        self._insert(document)
+
+    async def insert_many(self, documents, ordered=True):
+        self._check()
+        self.batches.append(copy.deepcopy(list(documents)))
+        for document in documents:
+            self._insert(document)
+
+    async def find_one(self, query, projection=None):
+        self.reads.append(projection)
+        for document in self.documents.values():
+            if self._matches(document, query):
+                return self._project(document, projection) if projection else copy.deepcopy(document)
+        return None
+
+    def find(self, query, projection=None):
+        matches = [document for document in self.documents.values() if self._matches(document, query)]
+        return _FakeCursor([self._project(document, projection) if projection else copy.deepcopy(document) for document in matches])
+
+    async def replace_one(self, query, document):
+        self._check()
+        matched = [stored for stored in self.documents.values() if self._matches(stored, query)][:1]
+        if matched:
+            self.documents[matched[0]["_id"]] = copy.deepcopy(document)
+        return type("Result", (), {"matched_count": len(matched)})()
+
+    async def update_one(self, query, update):
+        self._check()
+        for document in self.documents.values():
+            if self._matches(document, query):
+                document.update(copy.deepcopy(update["$set"]))
+                break
+
+    async def delete_one(self, query):
+        self._check()
+        for key, document in list(self.documents.items()):
+            if self._matches(document, query):
+                del self.documents[key]
+                break
+
+    def _check(self):
+        if self.fail:
+            raise ConnectionError("mongo down")
+
+    def _insert(self, document):
+        document = copy.deepcopy(document)
+        document.setdefault("_id", next(self._ids))
+        self.documents[document["_id"]] = document
+
+    def _matches(self, document, query):
+        for field, condition in query.items():
+            if field == "$or":
+                if not any(self._matches(document, option) for option in condition):
+                    return False
+            elif isinstance(condition, dict):
+                if field not in document or not document[field] < condition["$lt"]:
+                    return False
+            elif document.get(field) != condition:
+                return False
+        return True
+
+    @staticmethod
+    def _project(document, fields):
+        projected = {"_id": document["_id"]}
+        for path in fields:
+            source, target = document, projected
+            *parents, leaf = path.split(".")
+            for parent in parents:
+                source = source.get(parent, {})
+                target = target.setdefault(parent, {})
+            if leaf in source:
+                target[leaf] = copy.deepcopy(source[leaf])
+        return projected
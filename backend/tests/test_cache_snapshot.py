@@ -0,0 +1,88 @@
+# Test snapshot and restore of the shared cache
+
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from cache_snapshot import CacheSnapshotter, restore_snapshot, write_snapshot
+from shared_cache import SharedCache
+
+
+def test_round_trip_honors_ttl():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        cache = SharedCache(tmp / "old", slots=64, ways=4, value_size=256)
+        cache.set_json("names:cheerful", {"suggested_names": ["Emma"]}, ttl_seconds=60)
+        cache.set("image:portrait", b"https://example.com/a.webp", ttl_seconds=60)
+        cache.set("short", b"gone soon", ttl_seconds=0.05)
+        assert write_snapshot(cache, tmp / "snap.gz") == 3
+
+        time.sleep(0.1)
+        restarted = SharedCache(tmp / "new", slots=64, ways=4, value_size=256)
+        # Set after startup, so the snapshot must not overwrite it
+        restarted.set("image:portrait", b"https://example.com/b.webp", ttl_seconds=60)
+        counts = restore_snapshot(restarted, tmp / "snap.gz")
+
+        assert counts == {"restored": 1, "expired": 1, "skipped": 1}
+        assert restarted.get_json("names:cheerful") == {"suggested_names": ["Emma"]}
+        assert restarted.get("image:portrait") == b"https://example.com/b.webp"
+        assert restarted.get("short") is None
+
+
+def test_truncated_snapshot_restores_readable_prefix():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        cache = SharedCache(tmp / "old", slots=1024, ways=8, value_size=256)
+        for index in range(500):
+            cache.set(f"key:{index}", f"value {index} ".encode() * 10, ttl_seconds=60)
+        write_snapshot(cache, tmp / "snap.gz")
+        data = (tmp / "snap.gz").read_bytes()
+        (tmp / "snap.gz").write_bytes(data[:len(data) // 2])
+
+        restarted = SharedCache(tmp / "new", slots=1024, ways=8, value_size=256)
+        counts = restore_snapshot(restarted, tmp / "snap.gz")
+        assert 0 < counts["restored"] < 500
+
+
+def test_workers_restore_a_snapshot_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        old = SharedCache(tmp / "old", slots=1024, ways=8, value_size=256)
+        for index in range(200):
+            old.set(f"key:{index}", b"value", ttl_seconds=60)
+        write_snapshot(old, tmp / "snap.gz")
+
+        # Four workers starting together, each with its own mapping of the same cache
+        workers = [CacheSnapshotter(SharedCache(tmp / "new", slots=1024, ways=8, value_size=256), tmp / "snap.gz") for _ in range(4)]
+        results = [None] * len(workers)
+
+        def start(index):
+            results[index] = workers[index].restore()
+
+        threads = [threading.Thread(target=start, args=(index,)) for index in range(len(workers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        restored = [result for result in results if result is not None]
+        assert len(restored) == 1 and restored[0]["restored"] == 200
+        assert workers[0].cache.get("key:199") == b"value"
+
+        # A newer snapshot (the next deploy's) is read again, though here everything is already set
+        workers[0].snapshot()
+        again = workers[1].restore()
+        assert again is not None and again["restored"] == 0 and again["skipped"] >= 200
+
+
+if __name__ == "__main__":
+    test_round_trip_honors_ttl()
+    test_truncated_snapshot_restores_readable_prefix()
+    test_workers_restore_a_snapshot_once()
+    print("✅ Cache snapshot tests passed")
@@ -0,0 +1,158 @@
+# Test chat session memory and token-budgeted summarization
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from fastapi.testclient import TestClient
+
+import server
+from ai_agents.agents import AgentResponse
+from chat_memory import ChatMemory
+from tests.fake_mongo import FakeCollection
+
+
+async def _summarize(summary, turns):
+    return (summary + " " + " ".join(turn["content"][:5] for turn in turns)).strip()
+
+
+def test_history_stays_within_budget():
+    async def run():
+        memory = ChatMemory(lambda: None, _summarize, token_budget=100, keep_recent_turns=4)
+        for index in range(20):
+            session = await memory.append("s1", f"question {index} " + "x" * 80, f"answer {index} " + "y" * 80)
+            assert session.tokens() <= 100 or len(session.turns) <= 4
+        return await memory.load("s1")
+
+    session = asyncio.run(run())
+    history = session.history()
+    assert history[0]["role"] == "system" and "Summary of the earlier conversation" in history[0]["content"]
+    assert [turn["role"] for turn in history[1:]] == ["user", "assistant", "user", "assistant"]
+    assert history[-1]["content"].startswith("answer 19")
+    assert session.summarized_turns == 40 - len(session.turns)
+
+
+def test_prefix_is_stable_between_folds():
+    async def run():
+        memory = ChatMemory(lambda: None, _summarize, token_budget=200, keep_recent_turns=2)
+        prefixes = []
+        for index in range(10):
+            session = await memory.append("s1", "q" * 100, "a" * 100)
+            prefixes.append(session.history()[0]["content"] if session.summary else None)
+        return prefixes
+
+    prefixes = asyncio.run(run())
+    # The summary only changes when turns are folded, not on every exchange
+    assert len(set(prefixes)) < len(prefixes)
+
+
+def test_concurrent_workers_do_not_lose_turns():
+    async def run():
+        collection = FakeCollection()
+        worker_a = ChatMemory(lambda: collection, _summarize, token_budget=10000)
+        worker_b = ChatMemory(lambda: collection, _summarize, token_budget=10000)
+        await worker_a.append("s1", "hello from a", "hi a")
+        await worker_b.append("s1", "hello from b", "hi b")
+        # worker_a's hot copy is stale now; its write must land on top of b's
+        await worker_a.append("s1", "again from a", "hi again a")
+        return collection.documents["s1"]
+
+    document = asyncio.run(run())
+    assert [turn["content"] for turn in document["turns"] if turn["role"] == "user"] == [
+        "hello from a", "hello from b", "again from a"
+    ]
+
+
+def test_prompt_history_includes_turns_from_other_workers():
+    async def run():
+        collection = FakeCollection()
+        worker_a = ChatMemory(lambda: collection, _summarize, token_budget=10000)
+        worker_b = ChatMemory(lambda: collection, _summarize, token_budget=10000)
+        await worker_a.append("s1", "hello from a", "hi a")
+        await worker_b.append("s1", "hello from b", "hi b")
+
+        # worker_a's next prompt is built from the stored session, not its stale hot copy
+        stale = await worker_a.load("s1")
+        collection.reads.clear()
+        # Unchanged since: the hot copy is used after a version-only read
+        current = await worker_a.load("s1")
+        return stale, current, collection.reads
+
+    stale, current, reads = asyncio.run(run())
+    assert [turn["content"] for turn in stale.history()] == ["hello from a", "hi a", "hello from b", "hi b"]
+    assert current is stale and reads == [{"version": 1}]
+
+
+def test_turns_written_during_an_outage_are_kept():
+    async def run():
+        collection = FakeCollection()
+        worker_a = ChatMemory(lambda: collection, _summarize, token_budget=10000)
+        worker_b = ChatMemory(lambda: collection, _summarize, token_budget=10000)
+        await worker_a.append("s1", "one", "1")
+        collection.fail = True
+        await worker_a.append("s1", "two", "2")
+        collection.fail = False
+        await worker_a.append("s1", "three", "3")
+        after_outage = [turn["content"] for turn in collection.documents["s1"]["turns"]]
+
+        # Another worker writes while this one can't: its unsaved turn lands on top of theirs
+        collection.fail = True
+        await worker_a.append("s1", "four", "4")
+        collection.fail = False
+        await worker_b.append("s1", "from b", "b")
+        loaded = [turn["content"] for turn in (await worker_a.load("s1")).turns]
+        await worker_a.append("s1", "five", "5")
+        return after_outage, loaded, collection.documents["s1"]
+
+    after_outage, loaded, document = asyncio.run(run())
+    assert after_outage == ["one", "1", "two", "2", "three", "3"]
+    assert loaded[-4:] == ["from b", "b", "four", "4"]
+    assert [turn["content"] for turn in document["turns"] if turn["role"] == "user"] == [
+        "one", "two", "three", "from b", "four", "five"
+    ]
+
+
+class _EchoAgent:
+    # Answers with how many history messages it was given
+    async def execute(self, message, history=None):
+        return AgentResponse(success=True, content=f"{len(history or [])} earlier")
+
+    def get_capabilities(self):
+        return []
+
+
+def test_sessions_belong_to_their_client():
+    originals = server.chat_memory, server.chat_agent
+    server.chat_memory = ChatMemory(lambda: None, _summarize)
+    server.chat_agent = _EchoAgent()
+    try:
+        client = TestClient(server.app)
+
+        def chat(client_id=None):
+            headers = {"X-Client-Id": client_id} if client_id else {}
+            return client.post("/api/chat", json={"message": "hi", "session_id": "s1"}, headers=headers)
+
+        assert chat("alice").json()["response"] == "0 earlier"
+        assert chat("alice").json()["response"] == "2 earlier"
+        # The same session id under another client is another conversation, and can't be deleted by it
+        assert chat("mallory").json()["response"] == "0 earlier"
+        client.delete("/api/chat/sessions/s1", headers={"X-Client-Id": "mallory"})
+        assert chat("alice").json()["response"] == "4 earlier"
+        assert chat().status_code == 400
+        assert client.delete("/api/chat/sessions/s1").status_code == 400
+    finally:
+        server.chat_memory, server.chat_agent = originals
+
+
+if __name__ == "__main__":
+    test_history_stays_within_budget()
+    test_prefix_is_stable_between_folds()
+    test_concurrent_workers_do_not_lose_turns()
+    test_prompt_history_includes_turns_from_other_workers()
+    test_turns_written_during_an_outage_are_kept()
+    test_sessions_belong_to_their_client()
+    print("✅ Chat memory tests passed")
@@ -0,0 +1,35 @@
+# Cold-start regression test: eager heavy imports in server.py should fail this.
+# Wall-clock timing depends on the machine, so it only runs with RUN_BENCHMARKS=1 (or directly)
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from startup_report import measure_first_response
+
+# Time from `import server` to the first /api/ response in a fresh interpreter
+COLD_START_BUDGET_MS = float(os.environ.get("COLD_START_BUDGET_MS", "1000"))
+RUN_BENCHMARKS = os.environ.get("RUN_BENCHMARKS", "") == "1"
+
+
+@pytest.mark.skipif(not RUN_BENCHMARKS, reason="benchmark, set RUN_BENCHMARKS=1 to run")
+def test_first_response_within_budget():
+    timings = measure_first_response()
+    print(f"⏱️  import {timings['import_ms']:.0f}ms, first response {timings['first_response_ms']:.0f}ms")
+
+    assert timings["status"] == 200
+    assert timings["first_response_ms"] < COLD_START_BUDGET_MS, (
+        f"First /api/ response took {timings['first_response_ms']:.0f}ms, "
+        f"budget is {COLD_START_BUDGET_MS:.0f}ms (run startup_report.py to see why)"
+    )
+
+
+if __name__ == "__main__":
+    test_first_response_within_budget()
+    print("✅ Cold start within budget")
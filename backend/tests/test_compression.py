@@ -0,0 +1,125 @@
+# Test negotiated response compression: encoding choice, skipped responses and streamed gzip
+
+import asyncio
+import gzip
+import json
+import sys
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+import compression
+from compression import CompressionMiddleware, choose_encoding
+
+BODY = {"names": [f"Name{index}" for index in range(200)]}
+
+
+def _run(app, accept_encoding="gzip", minimum_size=1024):
+    # Call the middleware as a server would and collect what it sends
+    scope = {
+        "type": "http", "method": "GET", "path": "/", "query_string": b"",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+    }
+    messages, received = [], []
+
+    async def receive():
+        # The request body, then nothing until the response is done (no disconnect)
+        if received:
+            await asyncio.Event().wait()
+        received.append(1)
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(CompressionMiddleware(app, minimum_size=minimum_size)(scope, receive, send))
+    start, *bodies = messages
+    headers = {key.decode(): value.decode() for key, value in start["headers"]}
+    return start["status"], headers, [message.get("body", b"") for message in bodies]
+
+
+def _streamed(chunks, media_type="text/plain"):
+    async def body():
+        for chunk in chunks:
+            yield chunk
+    return StreamingResponse(body(), media_type=media_type)
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("*;q=0.5") in ("br", "gzip")
+    assert choose_encoding("*, gzip;q=0") == ("br" if compression.brotli is not None else None)
+    assert choose_encoding("") is None
+    if compression.brotli is not None:
+        assert choose_encoding("gzip, br") == "br"
+        assert choose_encoding("gzip, br;q=0.5") == "gzip"
+
+
+def test_json_is_gzipped():
+    status, headers, bodies = _run(JSONResponse(BODY))
+    assert status == 200 and headers["content-encoding"] == "gzip" and headers["vary"] == "Accept-Encoding"
+    assert headers["content-length"] == str(len(bodies[0]))
+    assert json.loads(gzip.decompress(b"".join(bodies))) == BODY
+
+
+def test_refused_encoding_is_not_used():
+    status, headers, bodies = _run(JSONResponse(BODY), accept_encoding="gzip;q=0")
+    assert "content-encoding" not in headers and json.loads(b"".join(bodies)) == BODY
+
+
+def test_small_responses_pass_through():
+    status, headers, bodies = _run(JSONResponse({"ok": True}))
+    assert "content-encoding" not in headers and b"".join(bodies) == b'{"ok":true}'
+    # The threshold is inclusive
+    body = b"x" * 64
+    _, headers, _ = _run(Response(body, media_type="text/plain"), minimum_size=64)
+    assert headers["content-encoding"] == "gzip"
+
+
+def test_skipped_statuses_and_content_types():
+    large = b"x" * 4096
+    for status_code in (204, 304):
+        status, headers, bodies = _run(Response(status_code=status_code))
+        assert status == status_code and "content-encoding" not in headers
+    partial = Response(large, status_code=206, media_type="text/plain", headers={"Content-Range": "bytes 0-4095/8192"})
+    status, headers, bodies = _run(partial)
+    assert status == 206 and "content-encoding" not in headers and b"".join(bodies) == large
+
+    _, headers, bodies = _run(Response(large, media_type="image/png"))
+    assert "content-encoding" not in headers and b"".join(bodies) == large
+    _, headers, bodies = _run(Response(large, media_type="text/plain", headers={"Content-Encoding": "br"}))
+    assert headers["content-encoding"] == "br" and b"".join(bodies) == large
+
+    # NDJSON events go out as they're produced, one message each, uncompressed
+    events = [json.dumps({"stage": stage}).encode() + b"\n" for stage in ("names", "image", "done")]
+    _, headers, bodies = _run(_streamed(events, media_type="application/x-ndjson"))
+    assert "content-encoding" not in headers and [body for body in bodies if body] == events
+
+
+def test_streamed_gzip_decompresses_to_the_original():
+    chunks = [f"chunk {index} ".encode() * 50 for index in range(20)]
+    status, headers, bodies = _run(_streamed(chunks))
+    assert headers["content-encoding"] == "gzip" and "content-length" not in headers
+    # Every chunk is flushed as it arrives rather than buffered until the end
+    assert len([body for body in bodies if body]) >= len(chunks)
+    assert gzip.decompress(b"".join(bodies)) == b"".join(chunks)
+
+    # Even a short stream is compressed: its size isn't known when the first chunk arrives
+    _, headers, bodies = _run(_streamed([b"a", b"b"]))
+    assert headers["content-encoding"] == "gzip" and gzip.decompress(b"".join(bodies)) == b"ab"
+
+
+if __name__ == "__main__":
+    test_choose_encoding()
+    test_json_is_gzipped()
+    test_refused_encoding_is_not_used()
+    test_small_responses_pass_through()
+    test_skipped_statuses_and_content_types()
+    test_streamed_gzip_decompresses_to_the_original()
+    print("✅ Compression tests passed")
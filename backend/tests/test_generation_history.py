@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test generation history: batched writes, cursor pagination and field projection
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from generation_history import GenerationHistory, decode_cursor, encode_cursor, projection
+from tests.fake_mongo import FakeCollection
+
+
+def _record(history, client="c1", kind="name", index=0, session_id=None):
+    return history.record(
+        client, kind, {"description": f"request {index}"}, {"success": True, "suggested_names": [f"Name{index}"]},
+        session_id=session_id
+    )
+
+
+def test_records_are_written_in_batches():
+    async def run():
+        collection = FakeCollection()
+        history = GenerationHistory(lambda: collection, flush_seconds=0.05, max_batch=4)
+        history.start()
+        for index in range(10):
+            _record(history, index=index)
+        await asyncio.sleep(0.2)
+        await history.stop()
+        return collection, history.stats()
+
+    collection, stats = asyncio.run(run())
+    assert len(collection.documents) == 10 and len(collection.batches) == 3
+    assert stats["written"] == 10 and stats["queued"] == 0
+    assert [("client", 1), ("ts", -1), ("_id", -1)] in collection.indexes
+
+
+def test_pages_cover_every_record_once_newest_first():
+    async def run():
+        collection = FakeCollection()
+        history = GenerationHistory(lambda: collection)
+        for index in range(25):
+            _record(history, index=index)
+        _record(history, client="someone-else")
+        await history.flush()
+        # Records created in the same instant are ordered by id
+        documents = list(collection.documents.values())
+        for document in documents[10:14]:
+            document["ts"] = documents[10]["ts"]
+
+        pages, cursor = [], None
+        while True:
+            items, cursor = await history.page("c1", limit=10, cursor=cursor)
+            pages.append(items)
+            if cursor is None:
+                return collection, pages
+
+    collection, pages = asyncio.run(run())
+    assert [len(page) for page in pages] == [10, 10, 5]
+    ids = [item["id"] for page in pages for item in page]
+    expected = sorted((d for d in collection.documents.values() if d["client"] == "c1"), key=lambda d: (d["ts"], d["_id"]), reverse=True)
+    assert ids == [document["_id"] for document in expected]
+
+
+def test_projection_and_filters():
+    async def run():
+        collection = FakeCollection()
+        history = GenerationHistory(lambda: collection)
+        _record(history, index=1, session_id="s1")
+        _record(history, kind="image", index=2, session_id="s1")
+        _record(history, index=3, session_id="s2")
+        # Not flushed yet: reading flushes this client's records first
+        names, _ = await history.page("c1", kind="name", fields=["request.description"])
+        session, _ = await history.page("c1", session_id="s1", fields=["kind"])
+        return names, session
+
+    names, session = asyncio.run(run())
+    assert [item["request"] for item in names] == [{"description": "request 3"}, {"description": "request 1"}]
+    assert set(names[0]) == {"id", "kind", "created_at", "request"}
+    assert [item["kind"] for item in session] == ["image", "name"]
+
+
+def test_invalid_cursor_and_fields_are_rejected():
+    assert decode_cursor(encode_cursor(1234.5, "abc")) == (1234.5, "abc")
+    for bad in (lambda: decode_cursor("not-a-cursor"), lambda: projection(["password"]), lambda: projection(["response."])):
+        try:
+            bad()
+        except ValueError:
+            continue
+        raise AssertionError("expected ValueError")
+    # A path under a requested field is folded into it
+    assert projection(["response", "response.suggested_names"])["response"] == 1
+    assert "response.suggested_names" not in projection(["response", "response.suggested_names"])
+
+
+def test_records_survive_a_mongo_outage():
+    async def run():
+        collection = FakeCollection()
+        available = {"up": False}
+
+        def get_collection():
+            if not available["up"]:
+                raise RuntimeError("MONGO_URL is not set")
+            return collection
+
+        history = GenerationHistory(get_collection, max_queue=3)
+        for index in range(4):
+            _record(history, index=index)
+        assert await history.flush() == 0
+        available["up"] = True
+        await history.stop()
+        return collection, history.stats()
+
+    collection, stats = asyncio.run(run())
+    assert [document["request"]["description"] for document in collection.documents.values()] == ["request 1", "request 2", "request 3"]
+    assert stats["dropped"] == 1 and stats["failed_flushes"] == 1
+
+
+if __name__ == "__main__":
+    test_records_are_written_in_batches()
+    test_pages_cover_every_record_once_newest_first()
+    test_projection_and_filters()
+    test_invalid_cursor_and_fields_are_rejected()
+    test_records_survive_a_mongo_outage()
+    print("✅ Generation history tests passed")
@@ -0,0 +1,72 @@
+# Test generation profiles: defaults, overrides and the model each agent call ends up using
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from langchain_core.messages import AIMessage
+
+from ai_agents.agents import AgentConfig, ChatAgent
+from ai_agents.profiles import GenerationProfile, load_profiles
+
+
+class _RecordingLLM:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return AIMessage(content=self.reply)
+
+
+def test_overrides_merge_onto_defaults():
+    profiles = load_profiles('{"names": {"model": "small-model", "max_tokens": 300, "colour": "red"}, '
+                             '"summaries": {"max_tokens": 100, "stop": ["END"]}}')
+    assert profiles["names"].model == "small-model" and profiles["names"].max_tokens == 300
+    # Settings that weren't overridden keep their defaults
+    assert profiles["names"].json_mode and profiles["names"].temperature == 0.9
+    assert profiles["summaries"] == GenerationProfile(max_tokens=100, stop=("END",))
+
+    # A broken override never takes the service down
+    assert load_profiles("{not json") == load_profiles("")
+
+
+def test_agents_build_one_client_per_profile():
+    config = AgentConfig(api_key="test-key", model_name="big-model", profiles=load_profiles(
+        '{"names": {"model": "fast-model", "max_tokens": 256}, "chat": {"temperature": 0.5}}'
+    ))
+    agent = ChatAgent(config)
+    assert agent.llm.model_name == "big-model" and agent.llm.temperature == 0.5
+
+    names_llm = agent._llm_for("names")
+    assert names_llm is agent._llm_for("names") and names_llm is not agent.llm
+    assert names_llm.model_name == "fast-model" and names_llm.max_tokens == 256
+    assert names_llm.model_kwargs == {"response_format": {"type": "json_object"}}
+
+
+def test_execute_uses_the_requested_profile():
+    config = AgentConfig(api_key="test-key", model_name="big-model", profiles=load_profiles(
+        '{"names": {"model": "fast-model"}}'
+    ))
+    agent = ChatAgent(config)
+    agent.llm = _RecordingLLM("long answer")
+    agent._profile_llms["names"] = _RecordingLLM('{"names": []}')
+
+    async def run():
+        return await agent.execute("Hello"), await agent.execute("Five names", profile="names")
+
+    chat, names = asyncio.run(run())
+    assert (chat.content, chat.metadata["model"], chat.metadata["profile"]) == ("long answer", "big-model", "chat")
+    assert (names.content, names.metadata["model"], names.metadata["profile"]) == ('{"names": []}', "fast-model", "names")
+
+
+if __name__ == "__main__":
+    test_overrides_merge_onto_defaults()
+    test_agents_build_one_client_per_profile()
+    test_execute_uses_the_requested_profile()
+    print("✅ Generation profile tests passed")
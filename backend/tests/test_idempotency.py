@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Test Idempotency-Key handling: replay, joining in-flight work, conflicts and takeover
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import server
+from idempotency import IdempotencyConflict, IdempotencyStore, fingerprint
+from image_jobs import ImageJobStore
+from image_store import ImageStore
+from tests.fake_mongo import FakeCollection
+
+
+def _handler(calls, response=None, delay=0.0):
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return response or {"success": True, "names": ["Ada"], "call": len(calls)}
+    return handler
+
+
+def test_retry_replays_stored_response():
+    async def run():
+        collection = FakeCollection()
+        calls = []
+        worker_a = IdempotencyStore(lambda: collection)
+        worker_b = IdempotencyStore(lambda: collection)
+        first = await worker_a.run("names", "k1", {"description": "sea"}, _handler(calls))
+        # A retry landing on another worker still gets the stored response
+        second = await worker_b.run("names", "k1", {"description": "sea"}, _handler(calls))
+        return first, second, calls
+
+    first, second, calls = asyncio.run(run())
+    assert first == (second[0], "new")
+    assert second[1] == "replayed"
+    assert len(calls) == 1
+
+
+def test_concurrent_retries_join_in_flight_work():
+    async def run():
+        collection = FakeCollection()
+        calls = []
+        worker_a = IdempotencyStore(lambda: collection, poll_seconds=0.01)
+        worker_b = IdempotencyStore(lambda: collection, poll_seconds=0.01)
+        body = {"description": "sea"}
+        results = await asyncio.gather(
+            worker_a.run("names", "k1", body, _handler(calls, delay=0.1)),
+            worker_a.run("names", "k1", body, _handler(calls, delay=0.1)),
+            worker_b.run("names", "k1", body, _handler(calls, delay=0.1)),
+        )
+        return results, calls
+
+    results, calls = asyncio.run(run())
+    assert len(calls) == 1
+    assert [outcome for _, outcome in results] == ["new", "joined", "joined"]
+    assert results[0][0] == results[1][0] == results[2][0]
+
+
+def test_key_reused_with_different_body_conflicts():
+    async def run():
+        collection = FakeCollection()
+        store = IdempotencyStore(lambda: collection)
+        await store.run("names", "k1", {"description": "sea"}, _handler([]))
+        try:
+            await store.run("names", "k1", {"description": "mountains"}, _handler([]))
+        except IdempotencyConflict:
+            return store.stats()
+        raise AssertionError("expected IdempotencyConflict")
+
+    assert asyncio.run(run())["conflicts"] == 1
+
+
+def test_failures_are_not_replayed():
+    async def run():
+        collection = FakeCollection()
+        calls = []
+        store = IdempotencyStore(lambda: collection)
+        failed, _ = await store.run("names", "k1", {}, _handler(calls, {"success": False, "error": "busy"}))
+        retried, outcome = await store.run("names", "k1", {}, _handler(calls))
+        return failed, retried, outcome, calls
+
+    failed, retried, outcome, calls = asyncio.run(run())
+    assert failed["success"] is False
+    assert retried["success"] is True and outcome == "new"
+    assert len(calls) == 2
+
+
+def test_lapsed_lease_is_taken_over():
+    async def run():
+        collection = FakeCollection()
+        dead_worker = IdempotencyStore(lambda: collection, lease_seconds=-1)
+        calls = []
+        # The first request claims the key, then its process dies before finishing
+        await dead_worker._claim(collection, "names:k1", fingerprint({"description": "sea"}), "dead")
+        retry = IdempotencyStore(lambda: collection)
+        response, outcome = await retry.run("names", "k1", {"description": "sea"}, _handler(calls))
+        return response, outcome, collection.documents["names:k1"], calls
+
+    response, outcome, document, calls = asyncio.run(run())
+    assert outcome == "new" and len(calls) == 1
+    assert document["state"] == "done" and document["response"] == response
+
+
+def test_work_continues_after_client_disconnects():
+    async def run():
+        collection = FakeCollection()
+        calls = []
+        store = IdempotencyStore(lambda: collection)
+        request = asyncio.create_task(store.run("names", "k1", {}, _handler(calls, delay=0.05)))
+        await asyncio.sleep(0.01)
+        request.cancel()
+        await asyncio.sleep(0.1)
+        # The retry gets the answer the abandoned request went on to produce
+        return await store.run("names", "k1", {}, _handler(calls)), calls
+
+    (response, outcome), calls = asyncio.run(run())
+    assert outcome == "replayed" and response["call"] == 1
+    assert len(calls) == 1
+
+
+def test_runs_unprotected_without_mongo():
+    def unavailable():
+        raise RuntimeError("MONGO_URL is not set")
+
+    async def run():
+        calls = []
+        store = IdempotencyStore(unavailable)
+        start = time.perf_counter()
+        first = await store.run("names", "k1", {}, _handler(calls))
+        second = await store.run("names", "k1", {}, _handler(calls))
+        return first, second, calls, store.stats(), time.perf_counter() - start
+
+    first, second, calls, stats, elapsed = asyncio.run(run())
+    assert first[1] == second[1] == "new"
+    assert len(calls) == 2 and stats["unprotected"] == 2
+    assert elapsed < 1.0
+
+
+def test_placeholder_and_fallback_images_are_not_replayed():
+    # generate-image answers with a placeholder when the budget runs out, and with the fallback
+    # image when generation fails: neither may be what a retry gets for the next day
+    async def run(first_attempt):
+        collection = FakeCollection()
+        calls = []
+
+        async def generate(prompt):
+            calls.append(prompt)
+            if len(calls) == 1:
+                return await first_attempt()
+            return "https://images.example.com/ada.png"
+
+        async def request():
+            response = await server._idempotent(
+                "generate-image", "k1", server.ImageGenerationRequest(child_name="Ada", latency_budget_ms=20),
+                server._generate_child_image
+            )
+            return json.loads(response.body), response.headers.get("Idempotent-Replayed")
+
+        originals = {
+            name: getattr(server, name)
+            for name in ("idempotency_store", "image_jobs", "image_store", "fallback_image_url", "_generate_real_image")
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            server.idempotency_store = IdempotencyStore(lambda: collection)
+            server.image_jobs = ImageJobStore()
+            server.image_store = ImageStore(Path(directory))
+            server.fallback_image_url = None
+            server._generate_real_image = generate
+            try:
+                first = await request()
+                # Let the first generation finish in the background
+                await asyncio.sleep(0.15)
+                retried = await request()
+                replayed = await request()
+            finally:
+                for name, value in originals.items():
+                    setattr(server, name, value)
+        return first, retried, replayed, calls
+
+    async def slow():
+        await asyncio.sleep(0.1)
+        return "https://images.example.com/slow.png"
+
+    async def failing():
+        return None
+
+    for first_attempt in (slow, failing):
+        (first, _), retried, replayed, calls = asyncio.run(run(first_attempt))
+        assert first["pending"] is (first_attempt is slow)
+        assert first["image_url"].endswith(".png") and "example.com" not in first["image_url"]
+        # The retry generates again instead of replaying the placeholder, then that answer sticks
+        assert retried == ({**first, "pending": False, "job_token": None, "image_url": "https://images.example.com/ada.png"}, None)
+        assert replayed == (retried[0], "true")
+        assert len(calls) == 2
+
+
+if __name__ == "__main__":
+    test_retry_replays_stored_response()
+    test_concurrent_retries_join_in_flight_work()
+    test_key_reused_with_different_body_conflicts()
+    test_failures_are_not_replayed()
+    test_lapsed_lease_is_taken_over()
+    test_work_continues_after_client_disconnects()
+    test_runs_unprotected_without_mongo()
+    test_placeholder_and_fallback_images_are_not_replayed()
+    print("✅ Idempotency tests passed")
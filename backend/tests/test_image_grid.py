@@ -0,0 +1,83 @@
+# Test grid mode age progression: layout, prompt and slicing the composite into tiles
+
+import io
+import sys
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from PIL import Image, ImageDraw
+
+from image_grid import TILE_INSET, build_grid_prompt, grid_shape, slice_grid
+
+COLORS = [(220, 40, 40), (40, 200, 40), (40, 40, 220), (230, 200, 30), (200, 40, 200), (30, 200, 200)]
+
+
+def _composite(rows, cols, tile=100, gutter=(0, 0, 0)):
+    # Solid panels with a 2px gutter drawn on every panel border
+    image = Image.new("RGB", (cols * tile, rows * tile))
+    draw = ImageDraw.Draw(image)
+    for index in range(rows * cols):
+        row, col = divmod(index, cols)
+        box = (col * tile, row * tile, (col + 1) * tile - 1, (row + 1) * tile - 1)
+        draw.rectangle(box, fill=COLORS[index % len(COLORS)], outline=gutter)
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_grid_shape():
+    assert grid_shape(1) == (1, 1)
+    assert grid_shape(2) == (1, 2)
+    assert grid_shape(4) == (2, 2)
+    assert grid_shape(5) == (2, 3)
+    assert grid_shape(7) == (3, 3)
+    assert grid_shape(10) == (3, 4)
+    for count in range(1, 30):
+        rows, cols = grid_shape(count)
+        # Always room for every panel, never a whole spare row
+        assert rows * cols >= count and (rows - 1) * cols < count
+
+
+def test_build_grid_prompt():
+    prompt = build_grid_prompt("A portrait of Mia.", "Mia", [3, 6, 10, 15, 18])
+    assert prompt.startswith("A portrait of Mia.")
+    assert "2x3 grid of 5" in prompt
+    assert "panel 1: age 3, panel 2: age 6, panel 3: age 10, panel 4: age 15, panel 5: age 18" in prompt
+    assert "named Mia" in prompt
+
+
+def test_slice_grid_crops_panels_in_reading_order():
+    tiles = slice_grid(_composite(2, 3), 5, fmt="PNG")
+    assert len(tiles) == 5
+    inset = round(100 * TILE_INSET)
+    for index, data in enumerate(tiles):
+        with Image.open(io.BytesIO(data)) as tile:
+            assert tile.format == "PNG"
+            assert tile.size == (100 - 2 * inset, 100 - 2 * inset)
+            # The inset trims the gutter: every pixel belongs to this panel
+            assert set(color for _, color in tile.getcolors()) == {COLORS[index]}
+
+
+def test_slice_grid_handles_uneven_sizes():
+    # 301x201 doesn't divide into whole tiles; boxes are rounded and stay inside the image
+    composite = Image.new("RGB", (301, 201), COLORS[0])
+    out = io.BytesIO()
+    composite.save(out, format="PNG")
+    tiles = slice_grid(out.getvalue(), 6)
+    widths = []
+    for data in tiles:
+        with Image.open(io.BytesIO(data)) as tile:
+            assert tile.format == "WEBP"
+            widths.append(tile.size[0])
+    assert len(tiles) == 6 and all(97 <= width <= 99 for width in widths)
+
+
+if __name__ == "__main__":
+    test_grid_shape()
+    test_build_grid_prompt()
+    test_slice_grid_crops_panels_in_reading_order()
+    test_slice_grid_handles_uneven_sizes()
+    print("✅ Image grid tests passed")
@@ -0,0 +1,117 @@
+# Test background image jobs and speculative portrait prefetch
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from image_jobs import ImageJobStore, ImageJobsFull
+from speculative_images import SpeculativeImagePrefetcher
+
+
+async def _slow_generate(prompt: str) -> str:
+    await asyncio.sleep(0.2)
+    return f"https://example.com/{abs(hash(prompt))}.webp"
+
+
+def test_job_outlives_budget():
+    # Job keeps running after the budget expires and finishes with the real URL
+    async def run():
+        store = ImageJobStore()
+        job = store.submit("a child", _slow_generate)
+        finished = await store.wait(job, 0.01)
+        assert not finished and job.status == "pending"
+
+        finished = await store.wait(store.get(job.token), 1)
+        assert finished and job.status == "done"
+        assert job.image_url.startswith("https://example.com/")
+
+    asyncio.run(run())
+
+
+def test_failed_job_reports_error():
+    async def no_url(prompt: str):
+        return None
+
+    async def broken(prompt: str):
+        raise RuntimeError("provider down")
+
+    async def run():
+        store = ImageJobStore()
+        empty, failing = store.submit("a child", no_url), store.submit("a child", broken)
+        assert await store.wait(empty, 1) and await store.wait(failing, 1)
+        assert empty.status == failing.status == "failed"
+        assert failing.error == "provider down"
+
+    asyncio.run(run())
+
+
+def test_finished_jobs_expire():
+    async def run():
+        store = ImageJobStore(ttl_seconds=0)
+        job = store.submit("a child", _slow_generate)
+        assert store.get(job.token) is job
+        await store.wait(job, 1)
+        await asyncio.sleep(0.01)
+        assert store.get(job.token) is None
+
+    asyncio.run(run())
+
+
+def test_pending_jobs_are_capped():
+    # In-flight jobs can't be evicted, so submit refuses past max_pending until one finishes
+    async def run():
+        store = ImageJobStore(max_pending=2)
+        first, second = store.submit("a", _slow_generate), store.submit("b", _slow_generate)
+        assert store.full
+        try:
+            store.submit("c", _slow_generate)
+        except ImageJobsFull:
+            pass
+        else:
+            raise AssertionError("expected ImageJobsFull")
+
+        second.task.cancel()
+        await asyncio.gather(second.task, return_exceptions=True)
+        assert not store.full and second.status == "failed"
+        await store.wait(first, 1)
+        assert store.submit("c", _slow_generate).status == "pending"
+
+    asyncio.run(run())
+
+
+def test_speculative_hit_cancels_siblings():
+    # Claiming one prefetched prompt reuses its job and cancels the rest of the group
+    async def run():
+        store = ImageJobStore()
+        prefetcher = SpeculativeImagePrefetcher(store, top_k=2)
+        prefetcher.prefetch("cheerful", ["p-emma", "p-liam", "p-ava"], _slow_generate)
+
+        job = prefetcher.claim("cheerful", "p-liam")
+        assert job is not None
+        await store.wait(job, 1)
+        assert job.status == "done"
+
+        stats = prefetcher.stats()
+        assert stats["prefetched"] == 2
+        assert stats["hits"] == 1 and stats["cancelled"] == 1
+        assert stats["hits_by_rank"] == {1: 1}
+
+        # A name outside the top-k is a miss
+        prefetcher.prefetch("sporty", ["p-max", "p-zoe"], _slow_generate)
+        assert prefetcher.claim("sporty", "p-other") is None
+        assert prefetcher.stats()["misses"] == 1
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_job_outlives_budget()
+    test_failed_job_reports_error()
+    test_finished_jobs_expire()
+    test_pending_jobs_are_capped()
+    test_speculative_hit_cancels_siblings()
+    print("✅ Image job tests passed")
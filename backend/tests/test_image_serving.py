@@ -0,0 +1,189 @@
+# Test serving stored images: ETags, conditional GETs, byte ranges and variants
+
+import asyncio
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from image_serving import CACHE_CONTROL, _parse_range, image_file_response
+from image_store import ImageStore
+
+
+def _png(width=800, height=600):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(out, format="PNG")
+    return out.getvalue()
+
+
+def _app(store: ImageStore) -> FastAPI:
+    # The same two routes server.py mounts under /api/images
+    app = FastAPI()
+
+    @app.get("/images/{key}")
+    async def original(key: str, request: Request):
+        path = store.path(key)
+        if path is None:
+            raise HTTPException(status_code=404)
+        return image_file_response(request, path, store.media_type(key))
+
+    @app.get("/images/{key}/{variant}.{fmt}")
+    async def variant(key: str, variant: str, fmt: str, request: Request):
+        path = store.variant(key, variant, fmt)
+        if path is None:
+            raise HTTPException(status_code=404)
+        return image_file_response(request, path, store.media_type(path.name))
+
+    return app
+
+
+def test_parse_range():
+    assert _parse_range(None, 100) is None
+    assert _parse_range("bytes=0-9", 100) == (0, 9)
+    assert _parse_range("bytes=90-", 100) == (90, 99)
+    assert _parse_range("bytes=50-500", 100) == (50, 99)
+    assert _parse_range("bytes=-10", 100) == (90, 99)
+    assert _parse_range("bytes=-500", 100) == (0, 99)
+    # Unsatisfiable
+    assert _parse_range("bytes=100-", 100) == (-1, -1)
+    assert _parse_range("bytes=20-10", 100) == (-1, -1)
+    assert _parse_range("bytes=-0", 100) == (-1, -1)
+    # Multiple ranges and other units are ignored: the whole file is served
+    assert _parse_range("bytes=0-1,5-6", 100) is None
+    assert _parse_range("items=0-1", 100) is None
+    assert _parse_range("bytes=-", 100) is None
+
+
+def test_full_response_and_conditional_get():
+    with tempfile.TemporaryDirectory() as directory:
+        store = ImageStore(Path(directory))
+        data = _png()
+        key = store.put(data, ".png")
+        client = TestClient(_app(store))
+
+        response = client.get(f"/images/{key}")
+        assert response.status_code == 200 and response.content == data
+        assert response.headers["content-type"] == "image/png"
+        assert response.headers["cache-control"] == CACHE_CONTROL
+        assert response.headers["accept-ranges"] == "bytes"
+        etag = response.headers["etag"]
+        assert etag == f'"{Path(key).stem}"'
+
+        for if_none_match in (etag, f'"other", {etag}', "*"):
+            cached = client.get(f"/images/{key}", headers={"If-None-Match": if_none_match})
+            assert cached.status_code == 304 and cached.content == b"" and cached.headers["etag"] == etag
+        assert client.get(f"/images/{key}", headers={"If-None-Match": '"other"'}).status_code == 200
+        assert client.get("/images/" + "0" * 64 + ".png").status_code == 404
+
+
+def test_byte_ranges():
+    with tempfile.TemporaryDirectory() as directory:
+        store = ImageStore(Path(directory))
+        data = _png()
+        key = store.put(data, ".png")
+        client = TestClient(_app(store))
+        size = len(data)
+
+        partial = client.get(f"/images/{key}", headers={"Range": "bytes=10-109"})
+        assert partial.status_code == 206 and partial.content == data[10:110]
+        assert partial.headers["content-range"] == f"bytes 10-109/{size}"
+        assert partial.headers["content-length"] == "100"
+
+        suffix = client.get(f"/images/{key}", headers={"Range": "bytes=-16"})
+        assert suffix.status_code == 206 and suffix.content == data[-16:]
+
+        unsatisfiable = client.get(f"/images/{key}", headers={"Range": f"bytes={size}-"})
+        assert unsatisfiable.status_code == 416
+        assert unsatisfiable.headers["content-range"] == f"bytes */{size}"
+
+        # If-Range with a stale validator gets the whole, current file
+        etag = partial.headers["etag"]
+        assert client.get(f"/images/{key}", headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+        stale = client.get(f"/images/{key}", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+        assert stale.status_code == 200 and stale.content == data
+
+
+def test_variants_are_rendered_once_and_cacheable():
+    with tempfile.TemporaryDirectory() as directory:
+        store = ImageStore(Path(directory))
+        key = store.put(_png(), ".png")
+        client = TestClient(_app(store))
+
+        thumbnail = client.get(f"/images/{key}/thumbnail.webp")
+        assert thumbnail.status_code == 200 and thumbnail.headers["content-type"] == "image/webp"
+        with Image.open(io.BytesIO(thumbnail.content)) as image:
+            assert image.format == "WEBP" and max(image.size) == 256
+        path = store.variant(key, "thumbnail", "webp")
+        assert path.stat().st_mtime_ns == store.variant(key, "thumbnail", "webp").stat().st_mtime_ns
+
+        etag = thumbnail.headers["etag"]
+        assert etag == f'"{path.stem}"'
+        assert client.get(f"/images/{key}/thumbnail.webp", headers={"If-None-Match": etag}).status_code == 304
+
+        full = client.get(f"/images/{key}/full.jpeg")
+        with Image.open(io.BytesIO(full.content)) as image:
+            assert image.format == "JPEG" and image.size == (800, 600)
+        assert client.get(f"/images/{key}/poster.webp").status_code == 404
+        assert client.get(f"/images/{key}/card.gif").status_code == 404
+
+
+class _SlowDownloads:
+    # Stands in for the store's httpx client
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+
+    async def get(self, url):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return self
+
+    @property
+    def headers(self):
+        return {"content-type": "image/png"}
+
+    @property
+    def content(self):
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+
+def test_waiter_survives_the_downloading_request_being_cancelled():
+    async def run(store):
+        url = "https://images.example.com/ada.png"
+        owner = asyncio.create_task(store.fetch(url))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(store.fetch(url))
+        await asyncio.sleep(0.01)
+        # The client that started the download disconnects
+        owner.cancel()
+        key = await waiter
+        return owner.cancelled(), key
+
+    data = _png(16, 16)
+    with tempfile.TemporaryDirectory() as directory:
+        store = ImageStore(Path(directory))
+        store._http = downloads = _SlowDownloads(data)
+        cancelled, key = asyncio.run(run(store))
+        assert cancelled and store.path(key).read_bytes() == data
+        # The waiter downloads again rather than sharing the cancellation
+        assert downloads.calls == 2
+
+
+if __name__ == "__main__":
+    test_parse_range()
+    test_full_response_and_conditional_get()
+    test_byte_ranges()
+    test_variants_are_rendered_once_and_cacheable()
+    test_waiter_survives_the_downloading_request_being_cancelled()
+    print("✅ Image serving tests passed")
@@ -0,0 +1,93 @@
+# Test micro-batching of name requests: combined calls, splitting answers and per-item fallback
+
+import asyncio
+import json
+import re
+import sys
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from name_batcher import NameBatcher, parse_batch_answer
+
+
+def _descriptions(prompt):
+    return re.findall(r'^\s+\d+: "(.*)"$', prompt, re.MULTILINE)
+
+
+class _FakeModel:
+    # Answers batch prompts with a keyed object, leaving out descriptions containing "skip"
+    def __init__(self):
+        self.prompts = []
+
+    async def complete(self, prompt, cache, items):
+        self.prompts.append(prompt)
+        await asyncio.sleep(0.01)
+        descriptions = _descriptions(prompt)
+        if not descriptions:
+            description = re.search(r'description: "(.*)"', prompt).group(1)
+            return json.dumps({"names": [description.title()], "explanation": "single"})
+        return json.dumps({
+            str(index): {"names": [description.title()], "explanation": "batched"}
+            for index, description in enumerate(descriptions, 1) if "skip" not in description
+        })
+
+
+def test_concurrent_requests_share_one_call():
+    model = _FakeModel()
+
+    async def run():
+        batcher = NameBatcher(model.complete, window_ms=20, max_batch=8)
+        replies = await asyncio.gather(*(batcher.submit(d) for d in ["irish girl", "strong boy", "irish girl", "calm"]))
+        return batcher, [json.loads(reply) for reply in replies]
+
+    batcher, answers = asyncio.run(run())
+    assert len(model.prompts) == 1
+    assert [a["names"] for a in answers] == [["Irish Girl"], ["Strong Boy"], ["Irish Girl"], ["Calm"]]
+    # The long instruction block is sent once for the whole batch
+    assert model.prompts[0].count("Please consider") == 1
+    stats = batcher.stats()
+    assert stats["batches"] == 1 and stats["batched_items"] == 3 and stats["shared"] == 1
+
+
+def test_full_batch_flushes_early_and_bad_items_retry_alone():
+    model = _FakeModel()
+
+    async def run():
+        batcher = NameBatcher(model.complete, window_ms=5000, max_batch=3)
+        replies = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(d) for d in ["sunny", "skip me", "brave"])), timeout=1
+        )
+        return batcher, [json.loads(reply) for reply in replies]
+
+    batcher, answers = asyncio.run(run())
+    assert [a["explanation"] for a in answers] == ["batched", "single", "batched"]
+    assert len(model.prompts) == 2 and batcher.stats()["fallbacks"] == 1
+
+
+def test_failures_reach_every_waiter():
+    async def broken(prompt, cache, items):
+        raise RuntimeError("model unavailable")
+
+    async def run():
+        batcher = NameBatcher(broken, window_ms=10)
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_parse_batch_answer():
+    assert parse_batch_answer("not json") == {}
+    answers = parse_batch_answer('```json\n{"1": {"names": ["Ada"]}, "2": {"names": []}, "3": "Bo"}\n```')
+    assert answers == {"1": {"names": ["Ada"], "explanation": ""}}
+
+
+if __name__ == "__main__":
+    test_concurrent_requests_share_one_call()
+    test_full_batch_flushes_early_and_bad_items_retry_alone()
+    test_failures_reach_every_waiter()
+    test_parse_batch_answer()
+    print("✅ Name batcher tests passed")
@@ -0,0 +1,105 @@
+# Test the bundled name corpus: description parsing, index lookups and ranking
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from name_corpus import count_syllables, get_name_corpus, parse_description
+
+
+def test_parse_description():
+    query = parse_description("Short, modern girl names that start with A")
+    assert query.genders == {"F", "U"}
+    assert query.starts_with == {"a"}
+    assert query.max_length == 4 and query.popularity == 1
+    assert query.fully_understood()
+
+    query = parse_description("unique Irish boy names meaning strong")
+    assert query.origins == {"Irish"} and query.popularity == -1 and "strong" in query.themes
+    assert query.fully_understood()
+
+    # Words the parser can't place mean the LLM should have a say
+    query = parse_description("a name that sounds like a jazz musician")
+    assert not query.has_constraints() and query.unrecognized == ["jazz", "musician"]
+
+
+def test_search_matches_constraints():
+    corpus = get_name_corpus()
+    candidates, relaxed = corpus.search(parse_description("short modern girl names starting with A"), k=5)
+    assert len(candidates) == 5 and relaxed == []
+    for candidate in candidates:
+        assert candidate.name.lower().startswith("a")
+        assert candidate.gender in ("F", "U") and len(candidate.name) <= 4
+    # Popular first
+    assert [c.popularity for c in candidates] == sorted((c.popularity for c in candidates), reverse=True)
+
+    candidates, _ = corpus.search(parse_description("two syllable Japanese names"), k=5)
+    assert all("Japanese" in c.origins and c.syllables == 2 for c in candidates)
+
+
+def test_search_relaxes_impossible_constraints():
+    corpus = get_name_corpus()
+    candidates, relaxed = corpus.search(parse_description("one syllable Hawaiian girl names starting with Z"), k=5)
+    assert relaxed and all(c.name.startswith("Z") for c in candidates)
+
+
+def test_count_syllables():
+    assert [count_syllables(name) for name in ("Grace", "Olivia", "Mia", "James", "Isabella")] == [1, 4, 2, 1, 4]
+
+
+def test_search_is_fast():
+    corpus = get_name_corpus()
+    query = parse_description("popular Italian girl names ending in a")
+    corpus.search(query, k=5)
+    started = time.perf_counter()
+    for _ in range(100):
+        corpus.search(parse_description("popular Italian girl names ending in a"), k=5)
+    assert (time.perf_counter() - started) / 100 < 0.005
+
+
+def test_generation_modes():
+    import server
+    from server import NameGenerationRequest, NameGenerationResponse
+
+    calls = []
+
+    async def llm_names(request):
+        calls.append("llm")
+        return NameGenerationResponse(success=True, suggested_names=["Ada"] * 5, explanation="", source="llm")
+
+    async def rerank_names(request, candidates):
+        calls.append("rerank")
+        return NameGenerationResponse(success=True, suggested_names=[c.name for c in candidates[:5]], explanation="", source="rerank")
+
+    def generate(description, **fields):
+        return asyncio.run(server._generate_names(NameGenerationRequest(description=description, **fields))).source
+
+    originals = server._llm_names, server._rerank_names
+    server._llm_names, server._rerank_names = llm_names, rerank_names
+    try:
+        # The LLM is the default; the index only answers when asked to
+        assert generate("girl") == "llm"
+        assert generate("girl", mode="unknown") == "llm"
+        assert generate("girl", mode="auto") == "index"
+        assert generate("girl", mode="index") == "index"
+        # Asking for fresh names never gets the same five from the index
+        assert generate("girl", mode="auto", use_cache=False) == "rerank"
+        assert generate("girl", mode="index", use_cache=False) == "rerank"
+    finally:
+        server._llm_names, server._rerank_names = originals
+    assert calls == ["llm", "llm", "rerank", "rerank"]
+
+
+if __name__ == "__main__":
+    test_parse_description()
+    test_search_matches_constraints()
+    test_search_relaxes_impossible_constraints()
+    test_count_syllables()
+    test_search_is_fast()
+    test_generation_modes()
+    print("✅ Name corpus tests passed")
@@ -0,0 +1,136 @@
+# Test the streaming generate-pipeline endpoint with stubbed name and image generation
+
+import contextlib
+import json
+import sys
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from fastapi.testclient import TestClient
+
+import server
+from server import NameGenerationResponse
+
+NAMES = ["Ada", "Grace", "Linus", "Alan", "Barbara"]
+
+
+@contextlib.contextmanager
+def _patched(**attributes):
+    # Swap server functions for stubs, restoring them afterwards
+    originals = {name: getattr(server, name) for name in attributes}
+    for name, value in attributes.items():
+        setattr(server, name, value)
+    try:
+        yield
+    finally:
+        for name, value in originals.items():
+            setattr(server, name, value)
+
+
+def _names(calls=None, response=None, error=None):
+    async def generate_names(request):
+        if calls is not None:
+            calls.append(request.description)
+        if error is not None:
+            raise error
+        return response or NameGenerationResponse(success=True, suggested_names=NAMES, explanation="Classic names")
+    return generate_names
+
+
+def _images(fail=()):
+    async def generate_image(prompt):
+        if any(word in prompt for word in fail):
+            raise RuntimeError("image backend down")
+        return f"https://images.example.com/{abs(hash(prompt))}.png"
+    return generate_image
+
+
+def _stream(payload):
+    with TestClient(server.app).stream("POST", "/api/generate-pipeline", json=payload) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        return [json.loads(line) for line in response.iter_lines() if line]
+
+
+def test_stages_stream_in_order():
+    with _patched(_generate_names=_names(), _generate_real_image=_images()):
+        events = _stream({"description": "curious and bright", "name_index": 1, "ages": [3, 10, 18]})
+
+    stages = [event["stage"] for event in events]
+    assert stages[0] == "names" and stages[-1] == "done"
+    assert events[0]["suggested_names"] == NAMES
+    # Image stages run for the chosen name, each age image before the age progression summary
+    assert sorted(stages[1:-1]) == ["age_image"] * 3 + ["age_progression", "image"]
+    assert stages.index("age_progression") > max(i for i, stage in enumerate(stages) if stage == "age_image")
+    image = next(event for event in events if event["stage"] == "image")
+    assert image["child_name"] == "Grace" and image["success"] and image["image_url"].startswith("https://images.example.com/")
+    progression = next(event for event in events if event["stage"] == "age_progression")
+    assert progression["success"] and [age_image["age"] for age_image in progression["age_progression_images"]] == [3, 10, 18]
+
+
+def test_given_child_name_skips_name_generation():
+    calls = []
+    with _patched(_generate_names=_names(calls), _generate_real_image=_images()):
+        events = _stream({"description": "calm", "child_name": "Zoe", "include_age_progression": False})
+
+    assert calls == []
+    assert [event["stage"] for event in events] == ["image", "done"]
+    assert events[0]["child_name"] == "Zoe" and events[0]["success"]
+
+
+def test_grid_mode_generates_ages_as_one_composite():
+    grid_calls, per_age = [], []
+
+    async def age_grid(base_prompt, child_name, ages):
+        grid_calls.append((child_name, list(ages)))
+        return [{"age": age, "image_url": f"/api/images/tile-{age}.webp"} for age in ages]
+
+    async def age_images(base_prompt, child_name, ages):
+        per_age.append(child_name)
+        yield {"age": ages[0], "image_url": "/api/images/single.webp"}
+
+    with _patched(_generate_real_image=_images(), _generate_age_grid=age_grid, _generate_age_images=age_images,
+                  _cached_image=lambda prompt: None):
+        events = _stream({"description": "calm", "child_name": "Zoe", "ages": [3, 10, 18], "grid": True})
+        with _patched(AGE_PROGRESSION_GRID=True):
+            default_events = _stream({"description": "calm", "child_name": "Zoe", "ages": [3, 10]})
+
+    assert grid_calls == [("Zoe", [3, 10, 18]), ("Zoe", [3, 10])] and per_age == []
+    progression = next(event for event in events if event["stage"] == "age_progression")
+    assert [age_image["image_url"] for age_image in progression["age_progression_images"]] == [
+        "/api/images/tile-3.webp", "/api/images/tile-10.webp", "/api/images/tile-18.webp"
+    ]
+    assert [event["stage"] for event in default_events].count("age_image") == 2
+
+
+def test_stage_failures_are_reported_as_events():
+    # Name generation raising ends the stream with an error event and no image stages
+    with _patched(_generate_names=_names(error=RuntimeError("model unavailable")), _generate_real_image=_images()):
+        events = _stream({"description": "sunny"})
+    assert events == [{"stage": "error", "error": "model unavailable"}, {"stage": "done"}]
+
+    # Names that came back unsuccessful are streamed as-is, nothing to draw
+    failed = NameGenerationResponse(success=False, suggested_names=[], explanation="", error="no names")
+    with _patched(_generate_names=_names(response=failed), _generate_real_image=_images()):
+        events = _stream({"description": "sunny"})
+    assert [event["stage"] for event in events] == ["names", "done"] and events[0]["error"] == "no names"
+
+    # A failing portrait is reported on its own event; the age images still arrive
+    with _patched(_generate_names=_names(), _generate_real_image=_images(fail=["adorable"])):
+        events = _stream({"description": "sunny", "ages": [3, 6]})
+    image = next(event for event in events if event["stage"] == "image")
+    assert image["success"] is False and image["error"] == "image backend down"
+    progression = next(event for event in events if event["stage"] == "age_progression")
+    assert progression["success"] and len(progression["age_progression_images"]) == 2
+    assert events[-1] == {"stage": "done"}
+
+
+if __name__ == "__main__":
+    test_stages_stream_in_order()
+    test_given_child_name_skips_name_generation()
+    test_grid_mode_generates_ages_as_one_composite()
+    test_stage_failures_are_reported_as_events()
+    print("✅ Pipeline tests passed")
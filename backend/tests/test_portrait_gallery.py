@@ -0,0 +1,159 @@
+# Test the portrait gallery job: task building, bounded concurrency, checkpoint and resume
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import server
+from name_corpus import get_name_corpus
+from portrait_gallery import GalleryIndex, GalleryJob, PromptTemplates, gallery_tasks, load_checkpoint, ranked_names
+from shared_cache import SharedCache
+
+TEMPLATES = PromptTemplates(
+    portrait=lambda name, description: f"portrait of {name} {description}",
+    age_base=lambda name, description: f"base {name} {description}",
+    age=lambda base, name, age: f"{base} at {age}",
+)
+
+
+class _Generator:
+    # Fake image generation that tracks how many calls are in flight
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, prompt):
+        self.calls.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if prompt in self.fail:
+            return None
+        return f"/api/images/{abs(hash(prompt))}.png"
+
+
+def test_tasks_follow_the_ranking():
+    tasks = gallery_tasks(["Ava", "Leo"], TEMPLATES, ["curly hair"], ages=(3, 10))
+    assert [(task.name, task.kind) for task in tasks] == [
+        ("Ava", "portrait"), ("Ava", "age:3"), ("Ava", "age:10"), ("Leo", "portrait"), ("Leo", "age:3"), ("Leo", "age:10")
+    ]
+    assert tasks[1].prompt == "base Ava curly hair at 3"
+    # Each description adds its own prompts; repeated prompts are generated once
+    assert len(gallery_tasks(["Ava", "Ava"], TEMPLATES, ["curly hair", "in a garden"], ages=(3,))) == 4
+    # Requests always carry a description, so description-less prompts would never be hit
+    for descriptions in ([], [""]):
+        try:
+            gallery_tasks(["Ava"], TEMPLATES, descriptions)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError")
+
+
+def test_ranked_names():
+    corpus = get_name_corpus()
+    top = ranked_names(10)
+    popularity = [corpus.lookup(name).popularity for name in top]
+    assert len(top) == 10 and popularity == sorted(popularity, reverse=True)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "ranked.txt"
+        path.write_text("Mia\n# a comment\nNoah  # trailing comment\n\nMia\nZoe\n")
+        assert ranked_names(2, path) == ["Mia", "Noah"]
+        assert ranked_names(10, path) == ["Mia", "Noah", "Zoe"]
+
+
+def test_bounded_concurrency_and_checkpoint():
+    tasks = gallery_tasks(["Ava", "Leo", "Mia"], TEMPLATES, ["curly hair"])
+    generator = _Generator()
+    warmed = {}
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint = Path(directory) / "gallery.jsonl"
+        job = GalleryJob(generator, warmed.__setitem__, checkpoint, concurrency=3)
+        stats = asyncio.run(job.run(tasks))
+        records = load_checkpoint(checkpoint)
+
+    assert stats["generated"] == len(tasks) == 18 and stats["failed"] == 0
+    assert generator.max_in_flight == 3
+    assert set(records) == set(warmed) == {task.prompt for task in tasks}
+
+
+def test_resume_only_generates_what_is_missing():
+    tasks = gallery_tasks(["Ava", "Leo"], TEMPLATES, ["curly hair"])
+    failing = tasks[2].prompt
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint = Path(directory) / "gallery.jsonl"
+        first = asyncio.run(GalleryJob(_Generator(fail=[failing]), lambda prompt, url: None, checkpoint).run(tasks))
+        # An interrupted write leaves a torn last line
+        with open(checkpoint, "a") as f:
+            f.write('{"prompt": "half a rec')
+
+        gone = load_checkpoint(checkpoint)[tasks[0].prompt]["image_url"]
+        generator, warmed = _Generator(), {}
+        second = asyncio.run(GalleryJob(
+            generator, warmed.__setitem__, checkpoint, available=lambda image_url: image_url != gone
+        ).run(tasks))
+
+    assert first["failed"] == 1 and first["generated"] == len(tasks) - 1
+    # The failed image and the one missing from the store are generated again, the rest reloaded
+    assert sorted(generator.calls) == sorted([failing, tasks[0].prompt])
+    assert second["resumed"] == len(tasks) - 2 and second["generated"] == 2
+    assert set(warmed) == {task.prompt for task in tasks}
+
+
+def test_stops_starting_work_when_the_window_closes():
+    tasks = gallery_tasks(["Ava"], TEMPLATES, ["curly hair"])
+    generator = _Generator()
+    with tempfile.TemporaryDirectory() as directory:
+        job = GalleryJob(generator, lambda prompt, url: None, Path(directory) / "gallery.jsonl", stop_at=time.time() - 1)
+        stats = asyncio.run(job.run(tasks))
+    assert generator.calls == [] and stats["skipped"] == len(tasks)
+
+
+def test_evicted_gallery_images_are_found_in_the_checkpoint():
+    async def generate(prompt):
+        return f"https://images.example.com/{abs(hash(prompt))}.png"
+
+    tasks = gallery_tasks(["Ava", "Leo"], TEMPLATES, ["curly hair"])
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint = Path(directory) / "gallery.jsonl"
+        index = GalleryIndex(checkpoint)
+        assert index.get(tasks[0].prompt) is None
+        asyncio.run(GalleryJob(generate, lambda prompt, url: None, checkpoint).run(tasks[:6]))
+        image_url = index.get(tasks[0].prompt)
+        assert image_url is not None and index.get(tasks[6].prompt) is None
+        # A later run's images are picked up without a restart
+        asyncio.run(GalleryJob(generate, lambda prompt, url: None, checkpoint).run(tasks))
+        assert index.get(tasks[6].prompt) is not None
+
+        # The server finds an image the shared cache evicted, and puts it back
+        originals = server.gallery_index, server.shared_cache
+        server.gallery_index = index
+        server.shared_cache = SharedCache(Path(directory) / "cache", slots=64, ways=4, value_size=256)
+        try:
+            assert server.shared_cache.get("image:" + tasks[0].prompt) is None
+            assert server._cached_image(tasks[0].prompt) == image_url
+            assert server.shared_cache.get("image:" + tasks[0].prompt) == image_url.encode()
+            assert server._cached_image("a prompt the gallery never made") is None
+        finally:
+            server.shared_cache.close()
+            server.gallery_index, server.shared_cache = originals
+
+
+if __name__ == "__main__":
+    test_tasks_follow_the_ranking()
+    test_ranked_names()
+    test_bounded_concurrency_and_checkpoint()
+    test_resume_only_generates_what_is_missing()
+    test_stops_starting_work_when_the_window_closes()
+    test_evicted_gallery_images_are_found_in_the_checkpoint()
+    print("✅ Portrait gallery tests passed")
@@ -0,0 +1,146 @@
+# Test request deadlines, cancellation on disconnect and deadline-aware retries
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from ai_agents.deadlines import DeadlineExceeded, RetryBudget, deadline_scope, remaining, retry
+from real_mcp_client import RealMCPImageGenerator, TransientGenerationError
+from request_deadline import DeadlineMiddleware
+
+
+def _scope(headers=()):
+    return {"type": "http", "method": "GET", "path": "/api/slow", "headers": list(headers)}
+
+
+def _run_middleware(middleware, scope, disconnect_after=None):
+    sent = []
+
+    async def receive():
+        if disconnect_after is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent
+
+
+def test_deadline_from_header_cancels_with_504():
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["remaining"] = remaining()
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            seen["cancelled"] = True
+            raise
+
+    middleware = DeadlineMiddleware(app, default_seconds=60, route_seconds={"/api/slow": 30})
+    started = time.perf_counter()
+    sent = _run_middleware(middleware, _scope([(b"x-request-timeout", b"0.2")]))
+
+    assert time.perf_counter() - started < 1
+    assert 0 < seen["remaining"] <= 0.2 and seen["cancelled"]
+    assert sent[0]["type"] == "http.response.start" and sent[0]["status"] == 504
+
+
+def test_client_disconnect_cancels_handler():
+    seen = {}
+
+    async def app(scope, receive, send):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            seen["cancelled"] = True
+            raise
+
+    middleware = DeadlineMiddleware(app, route_seconds={"/api": 30})
+    assert middleware.seconds_for("/api/slow", None) == 30
+
+    started = time.perf_counter()
+    sent = _run_middleware(middleware, _scope(), disconnect_after=0.1)
+
+    assert time.perf_counter() - started < 1
+    assert seen["cancelled"] and sent == []
+
+
+def test_retry_backs_off_within_the_deadline():
+    attempts = []
+
+    async def flaky():
+        attempts.append(time.perf_counter())
+        if len(attempts) < 3:
+            raise ConnectionError("connection reset")
+        return "ok"
+
+    async def always_down():
+        attempts.append(time.perf_counter())
+        raise ConnectionError("connection refused")
+
+    assert asyncio.run(retry(flaky, base_delay=0.01, budget=RetryBudget())) == "ok"
+    assert len(attempts) == 3
+
+    async def with_deadline():
+        with deadline_scope(0.3):
+            return await retry(always_down, attempts=50, base_delay=0.05, max_delay=0.1, budget=RetryBudget())
+
+    attempts.clear()
+    started = time.perf_counter()
+    try:
+        asyncio.run(with_deadline())
+        assert False, "expected the call to give up"
+    except (ConnectionError, DeadlineExceeded):
+        pass
+    # Stops retrying once the next attempt would start past the deadline
+    assert time.perf_counter() - started < 0.4
+    assert 1 < len(attempts) < 50
+
+
+def test_image_generation_only_retries_transient_failures():
+    failure = RealMCPImageGenerator._failure
+    assert isinstance(failure(-9, ""), TransientGenerationError)
+    assert isinstance(failure(1, '{"error": "overloaded", "status": 503}'), TransientGenerationError)
+    for returncode, stderr in [(0, ""), (1, '{"error": "prompt rejected", "status": 400}'), (1, "Traceback ...")]:
+        assert type(failure(returncode, stderr)) is RuntimeError
+
+    original = RealMCPImageGenerator._generate_once
+    attempts = []
+
+    def failing(*errors):
+        async def generate_once(prompt):
+            attempts.append(prompt)
+            if len(attempts) <= len(errors):
+                raise errors[len(attempts) - 1]
+            return "https://images.example.com/ada.png"
+        return staticmethod(generate_once)
+
+    try:
+        RealMCPImageGenerator._generate_once = failing(TransientGenerationError("crashed"))
+        assert asyncio.run(RealMCPImageGenerator.generate_image("Ada")) == "https://images.example.com/ada.png"
+        assert len(attempts) == 2
+
+        # A deterministic failure is given up on at once
+        attempts.clear()
+        RealMCPImageGenerator._generate_once = failing(RuntimeError("no image URL returned"))
+        assert asyncio.run(RealMCPImageGenerator.generate_image("Ada")) is None
+        assert len(attempts) == 1
+    finally:
+        RealMCPImageGenerator._generate_once = original
+
+
+if __name__ == "__main__":
+    test_deadline_from_header_cancels_with_504()
+    test_client_disconnect_cancels_handler()
+    test_retry_backs_off_within_the_deadline()
+    test_image_generation_only_retries_transient_failures()
+    print("✅ Request deadline tests passed")
@@ -0,0 +1,94 @@
+# Test the model response cache: memory and disk tiers, TTLs and bypasses in BaseAgent.execute
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from langchain_core.messages import AIMessage
+
+from ai_agents.agents import AgentConfig, BaseAgent
+from ai_agents.response_cache import ResponseCache, response_key
+
+
+class _CountingLLM:
+    temperature = 0
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return AIMessage(content=f"answer {self.calls}")
+
+
+def _make_agent(ttls):
+    agent = BaseAgent(AgentConfig(api_key="test-key", response_cache_ttls=ttls))
+    agent.llm = _CountingLLM()
+    return agent
+
+
+def test_disk_tier_survives_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "responses.sqlite3"
+        key = response_key("model", [{"role": "user", "content": "hi"}], {"temperature": 0})
+
+        async def first():
+            cache = ResponseCache(path)
+            await cache.put(key, "chat", {"content": "hello", "metadata": {}}, ttl_seconds=60)
+            await cache.put("short-lived", "chat", {"content": "gone", "metadata": {}}, ttl_seconds=0.05)
+            assert (await cache.get(key))[1] == "memory"
+            cache.close()
+
+        async def after_restart():
+            cache = ResponseCache(path)
+            payload, tier = await cache.get(key)
+            assert payload["content"] == "hello" and tier == "disk"
+            assert (await cache.get(key))[1] == "memory"
+            await asyncio.sleep(0.1)
+            assert await cache.get("short-lived") is None
+            assert cache.stats()["disk_hits"] == 1 and cache.stats()["misses"] == 1
+            cache.close()
+
+        asyncio.run(first())
+        asyncio.run(after_restart())
+
+
+def test_execute_reuses_deterministic_calls():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(Path(tmp) / "responses.sqlite3")
+        with patch("ai_agents.agents.get_response_cache", return_value=cache):
+            agent = _make_agent({"base": 60})
+
+            async def run():
+                first = await agent.execute("Suggest a name")
+                second = await agent.execute("Suggest a name")
+                assert first.content == second.content == "answer 1"
+                assert second.metadata["cached"] == "memory" and "cached" not in first.metadata
+
+                # Different history, or an explicit bypass, goes to the model
+                other = await agent.execute("Suggest a name", history=[{"role": "user", "content": "For a girl"}])
+                fresh = await agent.execute("Suggest a name", cache=False)
+                assert (other.content, fresh.content) == ("answer 2", "answer 3")
+                assert agent.llm.calls == 3
+
+                # Agents without a TTL never touch the cache
+                uncached = _make_agent({"chat": 60})
+                await uncached.execute("Suggest a name")
+                await uncached.execute("Suggest a name")
+                assert uncached.llm.calls == 2
+                cache.close()
+
+            asyncio.run(run())
+            assert cache.stats()["stores"] == 2 and cache.stats()["memory_hits"] == 1
+
+
+if __name__ == "__main__":
+    test_disk_tier_survives_restart()
+    test_execute_reuses_deterministic_calls()
+    print("✅ Response cache tests passed")
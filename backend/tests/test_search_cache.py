@@ -0,0 +1,68 @@
+# Test the search result cache
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from search_cache import SearchCache, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  What's  NEW in AI? ") == normalize_query("what's new in ai") == "what's new in ai"
+
+
+def test_hit_stale_and_miss():
+    calls = []
+
+    async def fetch():
+        calls.append(time.time())
+        await asyncio.sleep(0.01)
+        return {"summary": f"result {len(calls)}"}
+
+    async def run():
+        cache = SearchCache(lambda: None, ttl_seconds=0.1, stale_seconds=10)
+        # Concurrent misses share one fetch
+        first = await asyncio.gather(*(cache.get("Cats?", "5", fetch) for _ in range(5)))
+        assert all(status == "miss" for _, status in first) and len(calls) == 1
+
+        assert await cache.get("cats", "5", fetch) == ({"summary": "result 1"}, "hit")
+
+        # Past the TTL: served stale right away, refreshed in the background
+        await asyncio.sleep(0.15)
+        assert await cache.get("cats", "5", fetch) == ({"summary": "result 1"}, "stale")
+        await asyncio.sleep(0.05)
+        assert await cache.get("cats", "5", fetch) == ({"summary": "result 2"}, "hit")
+
+        # A per-request freshness limit refetches inline instead
+        assert await cache.get("cats", "5", fetch, max_age_seconds=0) == ({"summary": "result 3"}, "miss")
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    assert stats["revalidations"] == 1 and stats["stale_hits"] == 1 and stats["misses"] == 6
+
+
+def test_failures_are_not_cached():
+    async def fail():
+        raise RuntimeError("search backend down")
+
+    async def run():
+        cache = SearchCache(lambda: None)
+        try:
+            await cache.get("dogs", "5", fail)
+        except RuntimeError:
+            pass
+        return cache.stats()["entries"]
+
+    assert asyncio.run(run()) == 0
+
+
+if __name__ == "__main__":
+    test_normalize_query()
+    test_hit_stale_and_miss()
+    test_failures_are_not_cached()
+    print("✅ Search cache tests passed")
@@ -0,0 +1,72 @@
+# Test the search fan-out pipeline with a stand-in agent
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from ai_agents.agents import AgentResponse
+from search_pipeline import SearchPipeline, normalize_url, parse_search_results
+
+
+class _FakeSearchAgent:
+    def __init__(self):
+        self.prompts = []
+
+    async def search_tool(self):
+        return object()
+
+    async def web_search(self, query, max_results=5):
+        await asyncio.sleep(0.2)
+        if query == "slow one":
+            await asyncio.sleep(5)
+        results = [
+            {"url": "https://www.example.com/shared/?utm_source=x", "title": "Shared", "snippet": "on every query"},
+            {"url": f"https://example.org/{query.replace(' ', '-')}", "title": query, "snippet": "only here"},
+        ]
+        return json.dumps({"results": results})
+
+    async def execute(self, prompt, use_tools=True, history=None, profile=None):
+        self.prompts.append(prompt)
+        if prompt.startswith("Write 3 different web search queries"):
+            return AgentResponse(success=True, content="1. first angle\n2. second angle\n3. slow one")
+        return AgentResponse(success=True, content=f"answer {len(self.prompts)}")
+
+
+def test_fan_out_dedupes_and_runs_concurrently():
+    agent = _FakeSearchAgent()
+    pipeline = SearchPipeline(agent, subqueries=3, call_timeout=0.5, chunk_size=2)
+
+    started = time.perf_counter()
+    result = asyncio.run(pipeline.run("original question", max_results=5))
+    elapsed = time.perf_counter() - started
+
+    # Four searches of 0.2s each plus one timing out at 0.5s, run concurrently
+    assert elapsed < 1.0
+    sources = result["search_results"]["sources"]
+    urls = [source["url"] for source in sources]
+    assert result["sources_count"] == len(sources) == 4
+    # The page every query found ranks first and appears once
+    assert normalize_url(urls[0]) == "example.com/shared"
+    assert len(sources[0]["queries"]) == 3
+    # Two chunks of two sources summarized, then reduced
+    assert sum(prompt.startswith("Extract the facts") for prompt in agent.prompts) == 2
+    assert agent.prompts[-1].startswith("Write a comprehensive answer")
+
+
+def test_parse_plain_text_results():
+    raw = "Cats sleep a lot https://example.com/cats.\n\nDogs too https://example.com/dogs"
+    results = parse_search_results(raw)
+    assert [result["url"] for result in results] == ["https://example.com/cats", "https://example.com/dogs"]
+    assert results[0]["snippet"] == "Cats sleep a lot"
+
+
+if __name__ == "__main__":
+    test_fan_out_dedupes_and_runs_concurrently()
+    test_parse_plain_text_results()
+    print("✅ Search pipeline tests passed")
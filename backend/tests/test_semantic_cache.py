@@ -0,0 +1,65 @@
+# Test the semantic cache: paraphrase matching, variants, LRU eviction and stats
+
+import sys
+import time
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from semantic_cache import SemanticCache, embed
+
+
+def test_paraphrases_are_near_hits():
+    cache = SemanticCache(threshold=0.85)
+    cache.put("a cheerful outdoorsy kid with a bright smile", {"names": ["Sunny"]})
+
+    value, similarity = cache.get("bright-smiled, cheerful child who loves the outdoors")
+    assert value == {"names": ["Sunny"]} and similarity >= 0.85
+    assert cache.get("a shy bookish kid with a quiet smile") is None
+
+    stats = cache.stats()
+    assert stats["near_hits"] == 1 and stats["misses"] == 1 and stats["near_hit_rate"] == 0.5
+
+
+def test_variants_never_mix():
+    cache = SemanticCache(threshold=0.85)
+    cache.put("classic elegant names", "girls", variant="F")
+    assert cache.get("classic elegant names", variant="M") is None
+    assert cache.get("timeless elegant names", variant="F")[0] == "girls"
+
+
+def test_lru_eviction_and_ttl():
+    cache = SemanticCache(threshold=0.85, max_entries=2)
+    cache.put("names inspired by the sea", 1)
+    cache.put("names inspired by mountains", 2)
+    cache.get("names inspired by the ocean")  # touches the first entry
+    cache.put("names inspired by the desert", 3)
+
+    assert cache.get("names inspired by the sea")[0] == 1
+    assert cache.get("names inspired by mountains") is None
+    assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 2
+
+    # A repeat replaces the entry instead of using another slot
+    cache.put("names inspired by the sea", 4)
+    assert cache.stats()["entries"] == 2 and cache.get("names inspired by the sea")[0] == 4
+
+    expiring = SemanticCache(ttl_seconds=0.05)
+    expiring.put("strong boy names", 1)
+    time.sleep(0.1)
+    assert expiring.get("strong boy names") is None and expiring.stats()["entries"] == 0
+
+
+def test_embedding_is_local_and_normalized():
+    vector = embed("Bright, cheerful and outdoorsy!")
+    assert abs(float(vector @ vector) - 1.0) < 1e-5
+    assert not embed("the a of").any()
+
+
+if __name__ == "__main__":
+    test_paraphrases_are_near_hits()
+    test_variants_never_mix()
+    test_lru_eviction_and_ttl()
+    test_embedding_is_local_and_normalized()
+    print("✅ Semantic cache tests passed")
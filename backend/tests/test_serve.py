@@ -0,0 +1,127 @@
+# Test the pre-fork entrypoint: recycling decisions, worker replacement and draining on shutdown
+
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import uvicorn
+
+import serve
+from serve import Master, RecyclingServer, parse_args, worker_max_requests
+
+
+def test_max_requests_jitter():
+    assert worker_max_requests(0, 50) is None
+    assert worker_max_requests(-1, 50) is None
+    assert worker_max_requests(1000, 0) == 1000
+    limits = {worker_max_requests(1000, 50) for _ in range(500)}
+    assert min(limits) >= 1000 and max(limits) <= 1050
+    # Workers started together get spread out
+    assert len(limits) > 10
+
+
+def test_recycle_on_memory():
+    original = serve._rss_bytes
+    try:
+        serve._rss_bytes = lambda: 600 * 2**20
+        server = RecyclingServer(uvicorn.Config(app=None), max_memory_bytes=512 * 2**20)
+        # Only checked every 50th tick
+        assert server.over_memory_limit(49) is None
+        assert server.over_memory_limit(50) == 600 * 2**20
+
+        serve._rss_bytes = lambda: 100 * 2**20
+        assert server.over_memory_limit(100) is None
+        serve._rss_bytes = lambda: None
+        assert server.over_memory_limit(100) is None
+
+        serve._rss_bytes = lambda: 600 * 2**20
+        assert RecyclingServer(uvicorn.Config(app=None)).over_memory_limit(50) is None
+        server.should_exit = True
+        assert server.over_memory_limit(50) is None
+    finally:
+        serve._rss_bytes = original
+    assert serve._rss_bytes() > 0
+
+
+class _ExitingMaster(Master):
+    # Workers exit straight away; the master stops replacing them after a few spawns
+    def __init__(self, spawns):
+        super().__init__(parse_args(["--workers", "2"]))
+        self.remaining = spawns
+        self.spawned = []
+
+    def _spawn(self):
+        super()._spawn()
+        self.spawned.append(list(self.workers)[-1])
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.shutting_down = True
+
+    def _run_worker(self):
+        os._exit(0)
+
+
+def test_exited_workers_are_replaced():
+    master = _ExitingMaster(spawns=5)
+    master._spawn()
+    master._spawn()
+    master._supervise()
+    assert len(master.spawned) == 5 and len(set(master.spawned)) == 5
+    assert master.workers == {}
+
+
+def _worker(ignore_sigterm: bool) -> int:
+    # A child that only stops when signalled, reporting once its handlers are set
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        if ignore_sigterm:
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        os.write(write_fd, b"1")
+        time.sleep(30)
+        os._exit(0)
+    os.read(read_fd, 1)
+    os.close(read_fd)
+    os.close(write_fd)
+    return pid
+
+
+def test_shutdown_drains_then_force_kills():
+    master = Master(parse_args(["--graceful-timeout", "1"]))
+    draining, stuck = _worker(False), _worker(True)
+    master.workers = {draining: time.monotonic(), stuck: time.monotonic()}
+    alive = {draining, stuck}
+    previous_alarm = signal.getsignal(signal.SIGALRM)
+    try:
+        master._handle_shutdown(signal.SIGTERM, None)
+        # SIGTERM asks workers to drain; the force kill is scheduled past the graceful timeout
+        assert os.waitpid(draining, 0)[1] == signal.SIGTERM
+        alive.discard(draining)
+        del master.workers[draining]
+        assert 0 < signal.alarm(0) <= 6
+
+        force_kill = signal.getsignal(signal.SIGALRM)
+        force_kill(signal.SIGALRM, None)
+        assert os.waitpid(stuck, 0)[1] == signal.SIGKILL
+        alive.discard(stuck)
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous_alarm)
+        for pid in alive:
+            Master._signal_worker(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+    assert master.shutting_down
+
+
+if __name__ == "__main__":
+    test_max_requests_jitter()
+    test_recycle_on_memory()
+    test_exited_workers_are_replaced()
+    test_shutdown_drains_then_force_kills()
+    print("✅ Serve tests passed")
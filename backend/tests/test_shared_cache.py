@@ -0,0 +1,88 @@
+# Test the cross-process mmap cache
+
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from shared_cache import SharedCache
+
+
+def _write_from_other_process(path: str):
+    cache = SharedCache(Path(path), slots=64, ways=4, value_size=256)
+    cache.set_json("names:cheerful", {"suggested_names": ["Emma", "Liam"]}, ttl_seconds=60)
+    cache.close()
+
+
+def test_value_visible_across_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cache"
+        cache = SharedCache(path, slots=64, ways=4, value_size=256)
+
+        worker = multiprocessing.get_context("fork").Process(target=_write_from_other_process, args=(str(path),))
+        worker.start()
+        worker.join()
+
+        assert cache.get_json("names:cheerful") == {"suggested_names": ["Emma", "Liam"]}
+        assert cache.get("names:unknown") is None
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entries"] == 1
+
+
+def test_ttl_and_lru_eviction():
+    with tempfile.TemporaryDirectory() as tmp:
+        # One set of two slots, so the third insert must evict
+        cache = SharedCache(Path(tmp) / "cache", slots=2, ways=2, value_size=64)
+
+        cache.set("short", b"1", ttl_seconds=0.05)
+        time.sleep(0.1)
+        assert cache.get("short") is None
+
+        cache.set("a", b"A", ttl_seconds=60)
+        cache.set("b", b"B", ttl_seconds=60)
+        cache.get("a")  # b is now least recently used
+        cache.set("c", b"C", ttl_seconds=60)
+
+        assert cache.get("a") == b"A"
+        assert cache.get("b") is None
+        assert cache.get("c") == b"C"
+        assert cache.stats()["evictions"] == 1
+        assert not cache.set("big", b"x" * 65, ttl_seconds=60)
+
+
+def test_other_geometry_never_touches_a_mapped_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cache"
+        cache = SharedCache(path, slots=64, ways=4, value_size=256)
+        cache.set("kept", b"value", ttl_seconds=60)
+        size = cache.path.stat().st_size
+
+        # A process started with different settings gets a file of its own
+        other = SharedCache(path, slots=128, ways=4, value_size=256)
+        assert other.path != cache.path and other.get("kept") is None
+        assert cache.path.stat().st_size == size and cache.get("kept") == b"value"
+
+        # A file that doesn't match its name is refused, not rewritten
+        with open(other.path, "r+b") as f:
+            f.write(b"NOTCACHE")
+        try:
+            SharedCache(path, slots=128, ways=4, value_size=256)
+        except OSError:
+            pass
+        else:
+            raise AssertionError("expected OSError")
+        assert other.path.read_bytes()[:8] == b"NOTCACHE"
+        other.close()
+        cache.close()
+
+
+if __name__ == "__main__":
+    test_value_visible_across_processes()
+    test_ttl_and_lru_eviction()
+    test_other_geometry_never_touches_a_mapped_file()
+    print("✅ Shared cache tests passed")
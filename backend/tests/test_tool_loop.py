@@ -0,0 +1,98 @@
+# Test the agent tool-calling loop with a scripted model and local tools
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+
+from ai_agents.agents import AgentConfig, BaseAgent
+
+
+class _ScriptedLLM:
+    # Replies with each scripted message in turn and records what it was sent, and how tools were bound
+    def __init__(self, replies, binding=None):
+        self.replies = replies if binding is not None else list(replies)
+        self.binding = binding
+        self.calls = []
+        self.bindings = []
+
+    def bind_tools(self, tools, **kwargs):
+        bound = _ScriptedLLM(self.replies, {"tools": [tool.name for tool in tools], **kwargs})
+        bound.calls, bound.bindings = self.calls, self.bindings
+        return bound
+
+    async def ainvoke(self, messages):
+        self.calls.append(messages)
+        self.bindings.append(self.binding)
+        return self.replies.pop(0)
+
+
+def _make_agent(replies, tool_delay=0.3):
+    invocations = []
+
+    async def web_search(query: str) -> str:
+        """Search the web"""
+        invocations.append(query)
+        await asyncio.sleep(tool_delay)
+        return f"results for {query}"
+
+    agent = BaseAgent(AgentConfig(api_key="test-key", max_tool_steps=3, tool_timeout_seconds=1))
+    agent.llm = _ScriptedLLM(replies)
+    agent.mcp_client = object()
+    agent.mcp_tools = [StructuredTool.from_function(coroutine=web_search, name="web_search")]
+    return agent, invocations
+
+
+def _call(call_id, query):
+    return {"name": "web_search", "args": {"query": query}, "id": call_id, "type": "tool_call"}
+
+
+def test_parallel_tool_calls_and_request_cache():
+    agent, invocations = _make_agent([
+        AIMessage(content="", tool_calls=[_call("1", "cats"), _call("2", "dogs"), _call("3", "cats")]),
+        AIMessage(content="", tool_calls=[_call("4", "dogs")]),
+        AIMessage(content="Cats and dogs"),
+    ])
+
+    started = time.perf_counter()
+    result = asyncio.run(agent.execute("Tell me about cats and dogs"))
+    elapsed = time.perf_counter() - started
+
+    assert result.success and result.content == "Cats and dogs"
+    # Two distinct searches, run concurrently: max(latency), not the sum
+    assert sorted(invocations) == ["cats", "dogs"]
+    assert elapsed < 0.6
+    assert result.metadata["tools_used"] == 4 and result.metadata["steps"] == 3
+    assert sum(call["cached"] for call in result.metadata["tool_calls"]) == 2
+    # Every tool call was answered before the model's next turn
+    assert [message.type for message in agent.llm.calls[1][-4:]] == ["ai", "tool", "tool", "tool"]
+
+
+def test_step_limit_and_tool_timeout():
+    agent, _ = _make_agent([
+        AIMessage(content="", tool_calls=[_call(str(step), f"query {step}")]) for step in range(3)
+    ] + [AIMessage(content="Best effort answer")], tool_delay=1)
+    agent.config.tool_timeout_seconds = 0.1
+
+    result = asyncio.run(agent.execute("Keep searching"))
+
+    assert result.success and result.content == "Best effort answer"
+    assert result.metadata["steps"] == 4
+    assert all("timed out" in call["error"] for call in result.metadata["tool_calls"])
+    # The last call still carries the tool exchange, so the tools stay declared but can't be called
+    assert [message.type for message in agent.llm.calls[-1][-2:]] == ["ai", "tool"]
+    assert agent.llm.bindings[-1] == {"tools": ["web_search"], "tool_choice": "none"}
+    assert agent.llm.bindings[:-1] == [{"tools": ["web_search"]}] * 3
+
+
+if __name__ == "__main__":
+    test_parallel_tool_calls_and_request_cache()
+    test_step_limit_and_tool_timeout()
+    print("✅ Tool loop tests passed")
@@ -0,0 +1,52 @@
+# Test name typeahead: prefix lookups, filters, ranking and per-keystroke latency
+
+import os
+import sys
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from name_corpus import get_name_corpus
+from typeahead_benchmark import keystrokes, measure_lookups
+
+P99_BUDGET_MS = float(os.environ.get("TYPEAHEAD_P99_BUDGET_MS", "1.0"))
+
+
+def test_prefix_ranked_by_popularity():
+    corpus = get_name_corpus()
+    suggestions = corpus.suggest("ma", k=5)
+    assert len(suggestions) == 5
+    assert all(s.name.lower().startswith("ma") for s in suggestions)
+    assert [s.popularity for s in suggestions] == sorted((s.popularity for s in suggestions), reverse=True)
+
+    # Case and whitespace don't matter, and a full name comes back first
+    assert corpus.suggest("  AVA ")[0].name == "Ava"
+    assert corpus.suggest("zzz") == []
+
+
+def test_filters():
+    corpus = get_name_corpus()
+    girls = corpus.suggest("", gender="f", k=50)
+    assert len(girls) == 50 and all(s.gender in ("F", "U") for s in girls)
+
+    irish = corpus.suggest("", origin="Irish", k=50)
+    assert irish and all("Irish" in s.origins for s in irish)
+    # Broader words map onto the corpus' origins
+    assert {o for s in corpus.suggest("", origin="celtic", k=50) for o in s.origins} & {"Scottish", "Welsh"}
+    assert corpus.suggest("a", origin="atlantean") == []
+
+
+def test_p99_latency_within_budget():
+    corpus = get_name_corpus()
+    timings = measure_lookups(corpus, keystrokes(corpus), rounds=1)
+    print(f"⏱️  typeahead p50 {timings['p50']:.3f}ms, p99 {timings['p99']:.3f}ms")
+    assert timings["p99"] < P99_BUDGET_MS
+
+
+if __name__ == "__main__":
+    test_prefix_ranked_by_popularity()
+    test_filters()
+    test_p99_latency_within_budget()
+    print("✅ Typeahead tests passed")
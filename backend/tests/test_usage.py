@@ -0,0 +1,156 @@
+# Test token and cost accounting: per-call usage, request attribution and the batched writer
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend to Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+
+from ai_agents.agents import AgentConfig, BaseAgent
+from ai_agents.usage import (
+    UsageRecorder, current_scope, estimate_cost, load_prices, summary_row, token_counts, totals_by_key, usage_scope
+)
+from request_deadline import DeadlineMiddleware
+from request_usage import UsageScopeMiddleware
+from tests.fake_mongo import FakeCollection
+
+
+class _ScriptedLLM:
+    def __init__(self, replies):
+        self.replies = list(replies)
+
+    def bind_tools(self, tools):
+        return self
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(0.01)
+        return self.replies.pop(0)
+
+
+def _reply(content, prompt_tokens, completion_tokens, tool_calls=None):
+    return AIMessage(
+        content=content,
+        tool_calls=tool_calls or [],
+        usage_metadata={"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens}
+    )
+
+
+def test_token_counts_and_cost():
+    assert token_counts(_reply("hi", 12, 3)) == (12, 3)
+    legacy = AIMessage(content="hi", response_metadata={"token_usage": {"prompt_tokens": 7, "completion_tokens": 2}})
+    assert token_counts(legacy) == (7, 2)
+    assert token_counts(AIMessage(content="hi")) == (0, 0)
+
+    prices = load_prices('{"house-model": [1.0, 2.0]}')
+    assert estimate_cost(prices, "house-model", 1_000_000, 500_000) == 2.0
+    assert estimate_cost(prices, "gemini/gemini-2.5-flash", 1_000_000, 0) == prices["gemini-2.5-flash"][0]
+    assert estimate_cost(prices, "unknown-model", 100, 100) is None
+    # A broken override falls back to the defaults
+    assert load_prices("not json") == load_prices("")
+
+
+def test_execute_records_usage_for_the_request():
+    collection = FakeCollection()
+    recorder = UsageRecorder(lambda: collection)
+
+    async def web_search(query: str) -> str:
+        """Search the web"""
+        return f"results for {query}"
+
+    agent = BaseAgent(AgentConfig(api_key="test-key", model_name="gemini-2.5-pro", usage_recorder=recorder))
+    agent.llm = _ScriptedLLM([
+        _reply("", 100, 10, [{"name": "web_search", "args": {"query": "cats"}, "id": "1", "type": "tool_call"}]),
+        _reply("Cats", 150, 40),
+    ])
+    agent.mcp_client = object()
+    agent.mcp_tools = [StructuredTool.from_function(coroutine=web_search, name="web_search")]
+
+    async def run():
+        with usage_scope("/api/chat", "client-1"):
+            result = await agent.execute("Tell me about cats", cache=False)
+        await recorder.flush()
+        return result
+
+    result = asyncio.run(run())
+    usage = result.metadata["usage"]
+    # Both model turns of the tool loop are counted
+    assert usage["prompt_tokens"] == 250 and usage["completion_tokens"] == 50 and usage["model_calls"] == 2
+    assert usage["latency_ms"] >= 20
+    assert abs(usage["cost_usd"] - (250 * 1.25 + 50 * 10.0) / 1_000_000) < 1e-12
+
+    [batch] = collection.batches
+    [event] = batch
+    assert (event["endpoint"], event["client"], event["agent"], event["model"]) == ("/api/chat", "client-1", "base", "gemini-2.5-pro")
+    assert event["success"] is True and event["cached"] is False and event["total_tokens"] == 300
+
+
+def test_recorder_batches_and_survives_mongo_outage():
+    collection = FakeCollection(fail=True)
+    recorder = UsageRecorder(lambda: collection, max_batch=3, max_queue=5)
+
+    async def run():
+        for index in range(6):
+            recorder.record({"endpoint": "/api/search", "prompt_tokens": index})
+        failed = await recorder.flush()
+        collection.fail = False
+        await recorder.stop()
+        return failed
+
+    assert asyncio.run(run()) == 0
+    stats = recorder.stats()
+    # The oldest event was dropped at the queue limit; the rest went out in batches of 3
+    assert stats["dropped"] == 1 and stats["failed_flushes"] == 1 and stats["queued"] == 0
+    assert [len(batch) for batch in collection.batches] == [3, 2]
+    assert [event["prompt_tokens"] for batch in collection.batches for event in batch] == [1, 2, 3, 4, 5]
+
+
+def test_middleware_scopes_calls_to_endpoint_and_client():
+    app = FastAPI()
+
+    @app.get("/api/chat")
+    async def chat():
+        endpoint, client = current_scope()
+        return {"endpoint": endpoint, "client": client}
+
+    app.add_middleware(DeadlineMiddleware, default_seconds=5)
+    app.add_middleware(UsageScopeMiddleware)
+
+    with TestClient(app) as client:
+        assert client.get("/api/chat", headers={"X-Client-Id": "mobile-app"}).json() == {
+            "endpoint": "/api/chat", "client": "mobile-app"
+        }
+        # Without the header calls are pooled, the caller's address is never stored
+        assert client.get("/api/chat").json()["client"] == "anonymous"
+
+
+def test_summary_rows_and_totals():
+    def row(bucket, key, calls, cached, prompt_tokens, cost):
+        return summary_row({
+            "_id": {"bucket": bucket, "key": key}, "calls": calls, "cached": cached, "errors": 0, "model_calls": calls,
+            "prompt_tokens": prompt_tokens, "completion_tokens": 10 * calls, "cost_usd": cost, "unpriced": 0,
+            "latency_ms": 100.0 * (calls - cached), "max_latency_ms": 250.0
+        })
+
+    rows = [row(0, "/api/chat", 4, 2, 400, 0.01), row(0, "/api/generate-name", 10, 0, 3000, 0.02), row(3600, "/api/chat", 2, 0, 200, 0.03)]
+    assert rows[0]["avg_prompt_tokens"] == 200 and rows[0]["avg_latency_ms"] == 100.0
+    assert rows[2]["bucket_start"] == "1970-01-01T01:00:00+00:00"
+    totals = totals_by_key(rows)
+    assert [total["key"] for total in totals] == ["/api/chat", "/api/generate-name"]
+    assert totals[0]["calls"] == 6 and totals[0]["total_tokens"] == 660 and totals[0]["cost_usd"] == 0.04
+
+
+if __name__ == "__main__":
+    test_token_counts_and_cost()
+    test_execute_records_usage_for_the_request()
+    test_recorder_batches_and_survives_mongo_outage()
+    test_middleware_scopes_calls_to_endpoint_and_client()
+    test_summary_rows_and_totals()
+    print("✅ Usage accounting tests passed")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Typeahead Benchmark - Latency and memory of /api/names/suggest lookups
+Replays every keystroke of typing each corpus name (with and without gender/origin
+filters) against the name index and reports latency percentiles and the index footprint
+
+Usage: python typeahead_benchmark.py [--rounds 3] [--budget-ms 1.0] [--http]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+# Per keystroke, at the 99th percentile
+P99_BUDGET_MS = 1.0
+
+Keystroke = Tuple[str, Optional[str], Optional[str]]
+
+
+def keystrokes(corpus) -> List[Keystroke]:
+    """(prefix, gender, origin) for every prefix of every name, cycling through filters"""
+    filters = [(None, None), ("F", None), ("M", None), (None, "irish"), ("F", "italian"), (None, "african")]
+    strokes = []
+    for i, name in enumerate(corpus.names):
+        gender, origin = filters[i % len(filters)]
+        for end in range(1, len(name) + 1):
+            strokes.append((str(name)[:end], gender, origin))
+    return strokes
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+
+    def at(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {"p50": at(0.50), "p90": at(0.90), "p99": at(0.99), "max": ordered[-1]}
+
+
+def measure_lookups(corpus, strokes: List[Keystroke], rounds: int) -> Dict[str, float]:
+    for prefix, gender, origin in strokes[:200]:
+        corpus.suggest(prefix, gender=gender, origin=origin)  # warm up
+    samples = []
+    for _ in range(rounds):
+        for prefix, gender, origin in strokes:
+            started = time.perf_counter()
+            corpus.suggest(prefix, gender=gender, origin=origin)
+            samples.append((time.perf_counter() - started) * 1000)
+    return percentiles(samples)
+
+
+def measure_http(strokes: List[Keystroke]) -> Dict[str, float]:
+    # In-process ASGI round trip, routing and serialization included (no network)
+    from fastapi.testclient import TestClient
+    import server
+
+    samples = []
+    with TestClient(server.app) as client:
+        for prefix, gender, origin in strokes:
+            params = {"q": prefix, **({"gender": gender} if gender else {}), **({"origin": origin} if origin else {})}
+            started = time.perf_counter()
+            client.get("/api/names/suggest", params=params)
+            samples.append((time.perf_counter() - started) * 1000)
+    return percentiles(samples)
+
+
+def measure_memory() -> Tuple[int, int]:
+    """(bytes held by the index arrays, bytes allocated building the corpus)"""
+    from name_corpus import NameCorpus
+
+    tracemalloc.start()
+    corpus = NameCorpus.load()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return corpus.memory_bytes(), allocated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark name typeahead lookups")
+    parser.add_argument("--rounds", type=int, default=3, help="Times to replay every keystroke")
+    parser.add_argument("--budget-ms", type=float, default=P99_BUDGET_MS, help="p99 budget per keystroke")
+    parser.add_argument("--http", action="store_true", help="Also time the endpoint through the ASGI app")
+    args = parser.parse_args()
+
+    from name_corpus import get_name_corpus
+
+    corpus = get_name_corpus()
+    strokes = keystrokes(corpus)
+    array_bytes, allocated_bytes = measure_memory()
+    lookups = measure_lookups(corpus, strokes, args.rounds)
+
+    print(f"{len(corpus)} names, {len(strokes)} keystrokes x {args.rounds} rounds")
+    print(f"index arrays:           {array_bytes / 1024:.0f} KiB")
+    print(f"allocated on load:      {allocated_bytes / 1024:.0f} KiB")
+    print("lookup ms:              " + "  ".join(f"{name} {value:.3f}" for name, value in lookups.items()))
+    if args.http:
+        http = measure_http(strokes)
+        print("endpoint ms:            " + "  ".join(f"{name} {value:.3f}" for name, value in http.items()))
+
+    if lookups["p99"] > args.budget_ms:
+        print(f"p99 {lookups['p99']:.3f}ms is over the {args.budget_ms}ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import axios from 'axios';
 import { Card, CardContent, CardDescription, CardFooter, CardHeader, CardTitle } from './ui/card';
 import { Button } from './ui/button';
@@ -13,6 +13,32 @@ import { toast } from 'sonner';
 
 const API_BASE = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 const API = `${API_BASE}/api`;
+const IMAGE_LATENCY_BUDGET_MS = 8000;
+const IMAGE_JOB_POLL_ATTEMPTS = 12;
+const CLIENT_ID_KEY = 'childNameGenerator.clientId';
+const RECENT_SEARCHES = 5;
+
+// Stable per-browser id the API keeps generation history under
+const clientId = (() => {
+  try {
+    let id = localStorage.getItem(CLIENT_ID_KEY);
+    if (!id) {
+      id = crypto.randomUUID();
+      localStorage.setItem(CLIENT_ID_KEY, id);
+    }
+    return id;
+  } catch (error) {
+    return null;
+  }
+})();
+const clientHeaders = clientId ? { 'X-Client-Id': clientId } : {};
+
+// Images served by the API may be relative and support size/format variants
+const imageSrc = (url, variant) => {
+  if (!url || !url.includes('/api/images/')) return url;
+  const absolute = url.startsWith('/') ? `${API_BASE}${url}` : url;
+  return variant ? `${absolute}/${variant}.webp` : absolute;
+};
 
 const ChildNameGenerator = () => {
   const [step, setStep] = useState(1); // 1: Input, 2: Name Selection, 3: Image Generation, 4: Age Progression
@@ -24,9 +50,45 @@ const ChildNameGenerator = () => {
   const [childImage, setChildImage] = useState('');
   const [ageProgressionImages, setAgeProgressionImages] = useState([]);
   const [progressValue, setProgressValue] = useState(0);
+  const [nameLookup, setNameLookup] = useState('');
+  const [lookupSuggestions, setLookupSuggestions] = useState([]);
+  const lookupRequest = useRef(0);
+  const [recentSearches, setRecentSearches] = useState([]);
+
+  // Earlier name results, reloaded from the history instead of generated again
+  const loadRecentSearches = async () => {
+    if (!clientId) return;
+    try {
+      const response = await axios.get(`${API}/history`, {
+        headers: clientHeaders,
+        params: {
+          kind: 'name',
+          limit: RECENT_SEARCHES,
+          fields: 'request.description,response.suggested_names,response.explanation'
+        }
+      });
+      if (response.data.success) {
+        setRecentSearches(response.data.items);
+      }
+    } catch (error) {
+      console.error('Error loading recent searches:', error);
+    }
+  };
+
+  useEffect(() => {
+    loadRecentSearches();
+  }, []);
+
+  const handleRestoreSearch = (item) => {
+    setDescription(item.request.description);
+    setSuggestedNames(item.response.suggested_names);
+    setExplanation(item.response.explanation);
+    setStep(2);
+    setProgressValue(50);
+  };
 
   // Step 1: Generate names
-  const handleGenerateNames = async () => {
+  const handleGenerateNames = async (fresh = false) => {
     if (!description.trim()) {
       toast.error('Please enter a description for the name you want!');
       return;
@@ -37,8 +99,9 @@ const ChildNameGenerator = () => {
 
     try {
       const response = await axios.post(`${API}/generate-name`, {
-        description: description
-      });
+        description: description,
+        use_cache: !fresh
+      }, { headers: clientHeaders });
 
       if (response.data.success) {
         setSuggestedNames(response.data.suggested_names);
@@ -57,61 +120,113 @@ const ChildNameGenerator = () => {
     }
   };
 
-  // Step 2: Generate initial image
-  const handleSelectName = async (name) => {
-    setSelectedName(name);
-    setIsLoading(true);
-    setProgressValue(65);
-
+  // Typeahead over the name index; answers to older keystrokes are dropped
+  const handleNameLookup = async (value) => {
+    setNameLookup(value);
+    const request = ++lookupRequest.current;
+    if (!value.trim()) {
+      setLookupSuggestions([]);
+      return;
+    }
     try {
-      const response = await axios.post(`${API}/generate-image`, {
-        child_name: name,
-        description: description
-      });
+      const response = await axios.get(`${API}/names/suggest`, { params: { q: value, limit: 8 } });
+      if (request === lookupRequest.current && response.data.success) {
+        setLookupSuggestions(response.data.suggestions);
+      }
+    } catch (error) {
+      console.error('Error looking up names:', error);
+    }
+  };
 
-      if (response.data.success) {
-        setChildImage(response.data.image_url);
-        setStep(3);
-        setProgressValue(80);
-        toast.success(`Generated image for ${name}!`);
+  // Fetch the real portrait once a slow generation finishes in the background
+  const waitForImageJob = async (token) => {
+    for (let attempt = 0; attempt < IMAGE_JOB_POLL_ATTEMPTS; attempt++) {
+      try {
+        const response = await axios.get(`${API}/generate-image/${token}`, {
+          params: { wait_ms: 10000 }
+        });
 
-        // Automatically generate age progression
-        setTimeout(() => handleGenerateAgeProgression(name), 1500);
-      } else {
-        toast.error(response.data.error || 'Failed to generate image');
+        if (response.data.status === 'done') {
+          setChildImage(response.data.image_url);
+          return;
+        }
+        if (response.data.status === 'failed') {
+          return;
+        }
+      } catch (error) {
+        console.error('Error fetching image job:', error);
+        return;
       }
-    } catch (error) {
-      console.error('Error generating image:', error);
-      toast.error('Failed to generate image. Please try again.');
-    } finally {
-      setIsLoading(false);
     }
   };
 
-  // Step 3: Generate age progression
-  const handleGenerateAgeProgression = async (name) => {
+  // Read NDJSON stage events from the pipeline endpoint as they arrive
+  const streamPipeline = async (payload, onEvent) => {
+    const response = await fetch(`${API}/generate-pipeline`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', ...clientHeaders },
+      body: JSON.stringify(payload)
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Pipeline request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      lines.filter((line) => line.trim()).forEach((line) => onEvent(JSON.parse(line)));
+    }
+  };
+
+  // Steps 2-3: Generate the portrait and age progression together
+  const handleSelectName = async (name) => {
+    setSelectedName(name);
     setIsLoading(true);
+    setProgressValue(65);
 
     try {
-      const basePrompt = `A portrait of a happy child named ${name}. ${description}. High quality, professional portrait, soft lighting, warm and friendly expression.`;
-
-      const response = await axios.post(`${API}/generate-age-progression`, {
-        base_image_prompt: basePrompt,
+      await streamPipeline({
+        description: description,
         child_name: name,
-        ages: [3, 6, 10, 15, 18]
+        ages: [3, 6, 10, 15, 18],
+        latency_budget_ms: IMAGE_LATENCY_BUDGET_MS
+      }, (event) => {
+        if (event.stage === 'image') {
+          if (event.success) {
+            setChildImage(event.image_url);
+            setStep((current) => Math.max(current, 3));
+            setProgressValue(80);
+            toast.success(`Generated image for ${name}!`);
+            if (event.pending && event.job_token) {
+              waitForImageJob(event.job_token);
+            }
+          } else {
+            toast.error(event.error || 'Failed to generate image');
+          }
+        } else if (event.stage === 'age_image') {
+          setProgressValue((current) => Math.min(current + 3, 95));
+        } else if (event.stage === 'age_progression') {
+          if (event.success) {
+            setAgeProgressionImages(event.age_progression_images);
+            setStep(4);
+            setProgressValue(100);
+            toast.success('Age progression completed!');
+          } else {
+            toast.error(event.error || 'Failed to generate age progression');
+          }
+        } else if (event.stage === 'error') {
+          toast.error(event.error || 'Failed to generate images');
+        }
       });
-
-      if (response.data.success) {
-        setAgeProgressionImages(response.data.age_progression_images);
-        setStep(4);
-        setProgressValue(100);
-        toast.success('Age progression completed!');
-      } else {
-        toast.error(response.data.error || 'Failed to generate age progression');
-      }
     } catch (error) {
-      console.error('Error generating age progression:', error);
-      toast.error('Failed to generate age progression.');
+      console.error('Error generating images:', error);
+      toast.error('Failed to generate images. Please try again.');
     } finally {
       setIsLoading(false);
     }
@@ -122,10 +237,13 @@ const ChildNameGenerator = () => {
     setDescription('');
     setSuggestedNames([]);
     setExplanation('');
+    setNameLookup('');
+    setLookupSuggestions([]);
     setSelectedName('');
     setChildImage('');
     setAgeProgressionImages([]);
     setProgressValue(0);
+    loadRecentSearches();
   };
 
   return (
@@ -185,10 +303,27 @@ const ChildNameGenerator = () => {
                 <strong>Ideas to include:</strong> Gender preference, cultural background, meaning importance,
                 sound preferences, length, popularity level, or any special significance you want.
               </div>
+              {recentSearches.length > 0 && (
+                <div>
+                  <Label className="text-base font-medium">Recent searches</Label>
+                  <div className="flex flex-wrap gap-2 mt-2">
+                    {recentSearches.map((item) => (
+                      <Badge
+                        key={item.id}
+                        variant="secondary"
+                        className="cursor-pointer text-sm py-1"
+                        onClick={() => !isLoading && handleRestoreSearch(item)}
+                      >
+                        {item.request.description}
+                      </Badge>
+                    ))}
+                  </div>
+                </div>
+              )}
             </CardContent>
             <CardFooter>
               <Button
-                onClick={handleGenerateNames}
+                onClick={() => handleGenerateNames()}
                 disabled={isLoading || !description.trim()}
                 className="w-full text-lg py-6 bg-gradient-to-r from-purple-600 to-pink-600 hover:from-purple-700 hover:to-pink-700"
               >
@@ -231,12 +366,39 @@ const ChildNameGenerator = () => {
                     </Button>
                   ))}
                 </div>
+                <div className="mt-6 space-y-2">
+                  <Label htmlFor="name-lookup">Have a name in mind?</Label>
+                  <Input
+                    id="name-lookup"
+                    value={nameLookup}
+                    onChange={(e) => handleNameLookup(e.target.value)}
+                    placeholder="Start typing a name..."
+                    autoComplete="off"
+                    disabled={isLoading}
+                  />
+                  {lookupSuggestions.length > 0 && (
+                    <div className="flex flex-wrap gap-2">
+                      {lookupSuggestions.map((suggestion) => (
+                        <Button
+                          key={suggestion.name}
+                          onClick={() => handleSelectName(suggestion.name)}
+                          disabled={isLoading}
+                          variant="outline"
+                          size="sm"
+                          title={suggestion.meaning}
+                        >
+                          {suggestion.name}
+                        </Button>
+                      ))}
+                    </div>
+                  )}
+                </div>
               </CardContent>
               <CardFooter className="flex justify-between">
                 <Button variant="outline" onClick={handleStartOver}>
                   Start Over
                 </Button>
-                <Button variant="ghost" onClick={handleGenerateNames} disabled={isLoading}>
+                <Button variant="ghost" onClick={() => handleGenerateNames(true)} disabled={isLoading}>
                   Generate New Names
                 </Button>
               </CardFooter>
@@ -261,7 +423,7 @@ const ChildNameGenerator = () => {
                 {childImage && (
                   <div className="mb-6">
                     <img
-                      src={childImage}
+                      src={imageSrc(childImage, 'card')}
                       alt={`Portrait of ${selectedName}`}
                       className="w-80 h-80 rounded-2xl mx-auto object-cover shadow-lg"
                     />
@@ -302,7 +464,7 @@ const ChildNameGenerator = () => {
                     <div key={index} className="text-center">
                       <div className="relative group">
                         <img
-                          src={ageImage.image_url}
+                          src={imageSrc(ageImage.image_url, 'card')}
                           alt={`${selectedName} at age ${ageImage.age}`}
                           className="w-full h-64 rounded-xl object-cover shadow-lg transition-transform group-hover:scale-105"
                         />